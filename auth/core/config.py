@@ -16,9 +16,30 @@ class Settings:
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "kopuro")
     DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
-    SECRET_KEY: str = os.getenv("SECRET_KEY", "a_very_secret_key_that_should_be_in_env")
-    ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+    # RS256 private keys; see auth/core/keys.py for rotation. Public keys are served as JWKS.
+    JWT_KEYS_DIR: str = os.getenv("JWT_KEYS_DIR", "jwt_keys")
+    # Development only: create a key when JWT_KEYS_DIR has none. Replicas must share provisioned keys.
+    JWT_KEYS_AUTOGENERATE: bool = os.getenv("JWT_KEYS_AUTOGENERATE", "false").lower() in ("1", "true", "yes")
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 14))
+    # How often every process pulls revocations made by other processes.
+    REVOCATION_SYNC_SECONDS: float = float(os.getenv("REVOCATION_SYNC_SECONDS", 30))
+
+    # Strict mode re-reads the user from the database on every request (the old behaviour);
+    # otherwise signed claims plus a short-lived in-process user cache are trusted.
+    AUTH_STRICT_MODE: bool = os.getenv("AUTH_STRICT_MODE", "false").lower() in ("1", "true", "yes")
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+
+    # bcrypt runs on its own small pool so a login burst cannot starve the request threadpool.
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 32))
+
+    LOGIN_EMAIL_BURST: int = int(os.getenv("LOGIN_EMAIL_BURST", 5))
+    LOGIN_EMAIL_PER_MINUTE: float = float(os.getenv("LOGIN_EMAIL_PER_MINUTE", 10))
+    LOGIN_IP_BURST: int = int(os.getenv("LOGIN_IP_BURST", 30))
+    LOGIN_IP_PER_MINUTE: float = float(os.getenv("LOGIN_IP_PER_MINUTE", 120))
 
     FIRST_ADMIN_EMAIL: str | None = os.getenv("FIRST_ADMIN_EMAIL")
     FIRST_ADMIN_PASSWORD: str | None = os.getenv("FIRST_ADMIN_PASSWORD")
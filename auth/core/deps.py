@@ -1,43 +1,76 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from sqlalchemy.orm import Session
-from auth.db import database, models, crud
+from auth.db import database, crud
 from auth.schemas import user_schemas
 from .config import settings
+from .keys import keyring
+from .revocation import revocation_list
+from .token_verifier import InvalidToken, TokenVerifier
+from .user_cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 
+def _local_jwks():
+    # Unknown kid or stale cache: re-read the key directory, a rotation may have added a key.
+    keyring.reload()
+    return keyring.jwks()
+
+
+# The auth service verifies its own tokens with the same code other services use, minus the HTTP.
+verifier = TokenVerifier(_local_jwks, revocation_list)
+
+
 def get_current_user(
         db: Session = Depends(database.get_db), token: str = Depends(oauth2_scheme)
-) -> models.User:
+) -> user_schemas.User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = verifier.decode(token)
         email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
         token_data = user_schemas.TokenData(email=email,
                                             role=payload.get("role"),
                                             is_active=payload.get("is_active"),
                                             is_confirmed_by_admin=payload.get("is_confirmed_by_admin"))
-    except JWTError:
+    except InvalidToken:
         raise credentials_exception
 
-    user = crud.get_user_by_email(db, email=token_data.email)
+    if settings.AUTH_STRICT_MODE:
+        user = crud.get_user_by_email(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        return user
+
+    # The claims are signed by us, so a token that was issued for an inactive or unconfirmed
+    # account is rejected without touching the database.
+    _reject_inactive_claims(token_data)
+
+    user = user_cache.get(token_data.email)
     if user is None:
-        raise credentials_exception
+        generation = user_cache.generation
+        db_user = crud.get_user_by_email(db, email=token_data.email)
+        if db_user is None:
+            raise credentials_exception
+        user = user_schemas.User.model_validate(db_user)
+        user_cache.put(user, generation)
     return user
 
 
+def _reject_inactive_claims(token_data: user_schemas.TokenData):
+    if token_data.is_active is False:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    if token_data.role == user_schemas.UserRole.WORKER and token_data.is_confirmed_by_admin is False:
+        raise HTTPException(status_code=403, detail="Worker account not confirmed by admin")
+
+
 def get_current_active_user(
-        current_user: models.User = Depends(get_current_user)
-) -> models.User:
+        current_user: user_schemas.User = Depends(get_current_user)
+) -> user_schemas.User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     if current_user.role == user_schemas.UserRole.WORKER and not current_user.is_confirmed_by_admin:
@@ -46,8 +79,8 @@ def get_current_active_user(
 
 
 def get_current_active_admin_user(
-        current_user: models.User = Depends(get_current_active_user)
-) -> models.User:
+        current_user: user_schemas.User = Depends(get_current_active_user)
+) -> user_schemas.User:
     if current_user.role != user_schemas.UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,163 @@
+"""RSA key ring used to sign access and refresh tokens.
+
+Keys are PEM files in JWT_KEYS_DIR, named after their creation time down to the nanosecond so that
+names sort by age. The newest file (by name) signs new tokens and every key
+in the directory is published through the JWKS endpoint, so rotation is: generate a new key,
+keep the old file until the tokens it signed have expired (REFRESH_TOKEN_EXPIRE_DAYS), delete it.
+Restarting is not required; the ring reloads when it meets an unknown kid.
+
+Keys are provisioned with the commands below, on a directory every replica shares; the service does
+not start without one (unless JWT_KEYS_AUTOGENERATE is set, for development), since replicas
+signing with keys of their own would reject each other's tokens.
+
+    python -m auth.core.keys generate
+    python -m auth.core.keys rotate   # generate, then delete the keys retired long enough ago
+    python -m auth.core.keys list
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk
+
+from .config import settings
+
+ALGORITHM = "RS256"
+
+
+def _b64(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode("ascii")
+
+
+def _int_b64(value: int) -> str:
+    return _b64(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+def public_jwk(private_key) -> dict:
+    numbers = private_key.public_key().public_numbers()
+    fields = {"e": _int_b64(numbers.e), "kty": "RSA", "n": _int_b64(numbers.n)}
+    # RFC 7638 thumbprint: stable across restarts and identical on every replica.
+    kid = _b64(hashlib.sha256(json.dumps(fields, separators=(",", ":"), sort_keys=True).encode()).digest())
+    return {**fields, "kid": kid, "alg": ALGORITHM, "use": "sig"}
+
+
+def key_stamp(ns: int) -> str:
+    # Older keys are named with whole seconds only ("20250101T120000-<hex>"); "-" sorts before the
+    # nanosecond digits, so a key made in the same second as one of those still sorts after it.
+    return f"{datetime.fromtimestamp(ns // 10**9, timezone.utc):%Y%m%dT%H%M%S}{ns % 10**9:09d}"
+
+
+def generate_key(directory: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption())
+    name = f"{key_stamp(time.time_ns())}-{secrets.token_hex(4)}.pem"
+    path = os.path.join(directory, name)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(pem)
+    return path
+
+
+def key_names(directory: str) -> list:
+    """Key file names, oldest first."""
+    return sorted(n for n in os.listdir(directory) if n.endswith(".pem")) if os.path.isdir(directory) else []
+
+
+def _created_at(name: str) -> datetime:
+    return datetime.strptime(name[:15], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+
+
+def retire_keys(directory: str, now=None) -> list:
+    """Delete the keys replaced more than REFRESH_TOKEN_EXPIRE_DAYS ago; returns their paths."""
+    now = now or datetime.now(timezone.utc)
+    names = key_names(directory)
+    removed = []
+    # A key stops signing when the next one is created; no token it signed outlives that by more.
+    for name, successor in zip(names, names[1:]):
+        if _created_at(successor) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS) <= now:
+            path = os.path.join(directory, name)
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+class KeyRing:
+    def __init__(self, directory: str, autogenerate: bool = False):
+        self.directory = directory
+        self.autogenerate = autogenerate
+        self._lock = threading.Lock()
+        self._signing = None
+        self._public = None
+
+    def _load(self):
+        names = key_names(self.directory)
+        if not names and not self.autogenerate:
+            raise RuntimeError(f"Ключи подписи JWT не найдены в {self.directory}: создайте ключ командой "
+                               f"'python -m auth.core.keys generate' (для разработки: JWT_KEYS_AUTOGENERATE=true)")
+        if not names:
+            path = generate_key(self.directory)
+            print(f"Ключи подписи JWT не найдены, создан новый ключ: {path}")
+            names = [os.path.basename(path)]
+        public, signing = [], None
+        for name in names:
+            with open(os.path.join(self.directory, name), "rb") as fh:
+                private_key = serialization.load_pem_private_key(fh.read(), password=None)
+            jwk_dict = public_jwk(private_key)
+            public.append(jwk_dict)
+            signing = (jwk_dict["kid"], jwk.construct(private_key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+            ), ALGORITHM))
+        self._signing, self._public = signing, public
+
+    def reload(self):
+        with self._lock:
+            self._load()
+
+    def _ensure_loaded(self):
+        if self._public is None:
+            with self._lock:
+                if self._public is None:
+                    self._load()
+
+    @property
+    def signing_key(self):
+        """(kid, jose key) of the newest key."""
+        self._ensure_loaded()
+        return self._signing
+
+    def jwks(self) -> dict:
+        self._ensure_loaded()
+        return {"keys": list(self._public)}
+
+
+keyring = KeyRing(settings.JWT_KEYS_DIR, autogenerate=settings.JWT_KEYS_AUTOGENERATE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage JWT signing keys.")
+    parser.add_argument("command", choices=["generate", "rotate", "list"])
+    parser.add_argument("--dir", default=settings.JWT_KEYS_DIR)
+    args = parser.parse_args(argv)
+    if args.command in ("generate", "rotate"):
+        print(generate_key(args.dir))
+    if args.command == "rotate":
+        for path in retire_keys(args.dir):
+            print(f"removed {path}")
+    ring = KeyRing(args.dir)
+    for key in ring.jwks()["keys"]:
+        marker = "*" if key["kid"] == ring.signing_key[0] else " "
+        print(f"{marker} {key['kid']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Warm-up and health/readiness endpoints shared by the HTTP services.
+
+Nothing here touches the database at import time: the app starts serving /health right away,
+runs its warm-up steps (migrations, first admin, partitions, ...) in a background thread and
+only reports /ready once they have succeeded. Failed warm-ups are retried with backoff.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", 30))
+
+
+class WarmUp:
+    def __init__(self, steps: List[Callable]):
+        self.steps = steps
+        self.status = "starting"
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.started_at = time.monotonic()
+        self.duration: Optional[float] = None
+        self.inflight = set()
+
+    async def in_thread(self, fn, *args):
+        # Cancelling the caller does not stop the thread; keep track of it so shutdown can wait.
+        future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        self.inflight.add(future)
+        future.add_done_callback(self.inflight.discard)
+        return await asyncio.shield(future)
+
+    def _run_steps(self, app):
+        for step in self.steps:
+            step(app)
+
+    async def run(self, app):
+        delay = 1.0
+        while True:
+            self.attempts += 1
+            try:
+                await self.in_thread(self._run_steps, app)
+            except Exception as e:
+                self.status, self.error = "failed", f"{type(e).__name__}: {e}"
+                print(f"Ошибка прогрева (попытка {self.attempts}), повтор через {delay:.0f} с: {self.error}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+                continue
+            self.status, self.error = "ready", None
+            self.duration = time.monotonic() - self.started_at
+            return
+
+    def as_dict(self):
+        return {"status": self.status, "attempts": self.attempts, "warmup_seconds": self.duration,
+                "error": self.error}
+
+
+async def _every(interval: float, step: Callable, app, warmup: WarmUp):
+    while warmup.status != "ready":
+        await asyncio.sleep(min(interval, 1.0))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await warmup.in_thread(step, app)
+        except Exception as e:
+            print(f"Ошибка периодической задачи {step.__name__}: {type(e).__name__}: {e}")
+
+
+def lifespan(steps: List[Callable], periodic: Sequence[Tuple[float, Callable]] = ()):
+    """Lifespan that runs `steps(app)` in the background and keeps the result on app.state.warmup.
+
+    `periodic` holds (interval_seconds, step) pairs that start once the warm-up has succeeded.
+    """
+    @asynccontextmanager
+    async def _lifespan(app):
+        warmup = app.state.warmup = WarmUp(steps)
+        tasks = [asyncio.create_task(warmup.run(app))]
+        tasks += [asyncio.create_task(_every(interval, step, app, warmup)) for interval, step in periodic]
+        try:
+            yield
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.gather(*warmup.inflight, return_exceptions=True)
+    return _lifespan
+
+
+@contextmanager
+def app_session(app, get_db):
+    """Session from the app's get_db dependency, honouring dependency_overrides (used by the tests)."""
+    sessions = app.dependency_overrides.get(get_db, get_db)()
+    try:
+        yield next(sessions)
+    finally:
+        sessions.close()
+
+
+def health_router(get_db) -> APIRouter:
+    router = APIRouter(tags=["health"])
+
+    @router.get("/health", summary="Процесс жив")
+    def health():
+        return {"status": "ok"}
+
+    @router.get("/ready", summary="Сервис прогрет и база данных доступна")
+    def ready(request: Request):
+        warmup = getattr(request.app.state, "warmup", None)
+        if warmup is None or warmup.status != "ready":
+            body = warmup.as_dict() if warmup else {"status": "starting"}
+            return JSONResponse(status_code=503, content=body)
+        try:
+            with app_session(request.app, get_db) as db:
+                db.execute(text("SELECT 1"))
+        except Exception as e:
+            return JSONResponse(status_code=503, content={"status": "database_unavailable", "error": str(e)})
+        return warmup.as_dict()
+
+    return router
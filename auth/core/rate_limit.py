@@ -0,0 +1,73 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+
+from .config import settings
+
+
+class TokenBucketLimiter:
+    """In-process token buckets: `burst` requests at once, refilled at `per_minute` per key."""
+
+    def __init__(self, burst: int, per_minute: float, max_keys: int = 100_000):
+        self.capacity = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Take a token; returns 0 on success or the number of seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate if self.rate > 0 else math.inf
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+login_by_email = TokenBucketLimiter(settings.LOGIN_EMAIL_BURST, settings.LOGIN_EMAIL_PER_MINUTE)
+login_by_ip = TokenBucketLimiter(settings.LOGIN_IP_BURST, settings.LOGIN_IP_PER_MINUTE)
+
+
+def client_ip(request: Request) -> str:
+    # Run uvicorn with --proxy-headers behind a reverse proxy so this is the real client address.
+    return request.client.host if request.client else "unknown"
+
+
+def _reject(wait: float):
+    raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                        detail="Too many attempts, try again later",
+                        headers={"Retry-After": str(max(1, math.ceil(min(wait, 3600))))})
+
+
+def check_login(request: Request, email: str):
+    wait = login_by_ip.acquire(client_ip(request))
+    if not wait:
+        wait = login_by_email.acquire(email.strip().lower())
+    if wait:
+        _reject(wait)
+
+
+def check_register(request: Request):
+    wait = login_by_ip.acquire(client_ip(request))
+    if wait:
+        _reject(wait)
+
+
+def reset():
+    login_by_email.reset()
+    login_by_ip.reset()
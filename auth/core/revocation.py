@@ -0,0 +1,55 @@
+"""Token revocation for the auth service: persisted in revoked_tokens, checked in memory.
+
+Checking a token is a dict lookup (see token_verifier.RevocationList). The auth service loads the
+table at warm-up and re-syncs it every REVOCATION_SYNC_SECONDS; other services pull the same rows
+from GET /auth/revocations. Revocations made by this process apply immediately.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import Session
+
+from auth.db import crud, database
+from . import lifecycle
+from .config import settings
+from .token_verifier import SUBJECT_PREFIX, RevocationList
+
+revocation_list = RevocationList()
+
+
+def revoke(db: Session, token_id: str, expires_at: datetime) -> bool:
+    """False if `token_id` had already been revoked: the primary key makes this the one atomic check."""
+    added = crud.add_revoked_token(db, token_id, expires_at)
+    revocation_list.add(token_id, expires_at)
+    return added
+
+
+def _refresh_horizon() -> datetime:
+    # No token issued before now can outlive this.
+    return datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+def revoke_family(db: Session, family: str):
+    revoke(db, family, _refresh_horizon())
+
+
+def revoke_subject(db: Session, email: str):
+    """Revoke every token issued to `email` so far (deactivation); later logins are unaffected."""
+    token_id = f"{SUBJECT_PREFIX}{email}"
+    crud.delete_revoked_token(db, token_id)
+    revoke(db, token_id, _refresh_horizon())
+
+
+def sync(db: Session):
+    now = datetime.now(timezone.utc)
+    revocation_list.apply(crud.get_revoked_tokens(db, since=revocation_list.sync_since()), synced_at=now)
+
+
+def sync_revocations(app):
+    """Warm-up / periodic step of the auth service."""
+    with lifecycle.app_session(app, database.get_db) as db:
+        sync(db)
+
+
+def prune_revocations(app):
+    with lifecycle.app_session(app, database.get_db) as db:
+        crud.delete_expired_revoked_tokens(db, datetime.now(timezone.utc))
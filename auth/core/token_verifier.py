@@ -0,0 +1,201 @@
+"""Local verification of access tokens for services other than auth.
+
+Only needs the auth service's public keys (JWKS) and its revocation feed, both fetched over HTTP
+and cached in memory, so callers never import auth's database layer or read the users table:
+
+    from auth.core import token_verifier
+    current_user: token_verifier.VerifiedUser = Depends(token_verifier.get_current_active_user)
+
+Unknown key ids trigger a JWKS refetch (at most every JWKS_MIN_REFRESH_SECONDS), so a key
+rotated in the auth service is picked up without restarts.
+"""
+import json
+import os
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlencode
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwk, jwt
+
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://localhost:8001")
+AUTH_JWKS_URL = os.getenv("AUTH_JWKS_URL", f"{AUTH_SERVICE_URL}/.well-known/jwks.json")
+AUTH_REVOCATIONS_URL = os.getenv("AUTH_REVOCATIONS_URL", f"{AUTH_SERVICE_URL}/auth/revocations")
+JWKS_CACHE_SECONDS = float(os.getenv("JWKS_CACHE_SECONDS", 3600))
+JWKS_MIN_REFRESH_SECONDS = float(os.getenv("JWKS_MIN_REFRESH_SECONDS", 30))
+ALGORITHMS = ["RS256"]
+SUBJECT_PREFIX = "sub:"
+# Rows are fetched by revoked_at with some overlap, so a slow transaction that committed after
+# the previous sync with an older revoked_at is still picked up.
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands timestamps back without tzinfo.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class RevocationList:
+    """Revoked token ids (jti or family) and per-user cutoffs, checked with dict lookups.
+
+    An id of the form "sub:<email>" revokes every token of that user issued up to its revoked_at.
+    """
+
+    def __init__(self):
+        self._expires = {}
+        self._subject_cutoffs = {}
+        self._lock = threading.Lock()
+        self.synced_at: Optional[datetime] = None
+
+    def is_revoked(self, *token_ids) -> bool:
+        return any(token_id in self._expires for token_id in token_ids if token_id)
+
+    def is_claims_revoked(self, claims: dict) -> bool:
+        if self.is_revoked(claims.get("jti"), claims.get("fam")):
+            return True
+        cutoff = self._subject_cutoffs.get(claims.get("sub"))
+        return cutoff is not None and claims.get("iat", 0) <= cutoff
+
+    def add(self, token_id: str, expires_at: datetime, revoked_at: Optional[datetime] = None):
+        self.apply([(token_id, expires_at, revoked_at or datetime.now(timezone.utc))])
+
+    def apply(self, rows: Iterable, synced_at: Optional[datetime] = None):
+        """Merge (id, expires_at, revoked_at) rows and forget entries that have expired."""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for token_id, expires_at, revoked_at in rows:
+                self._expires[token_id] = _aware(expires_at)
+                if token_id.startswith(SUBJECT_PREFIX):
+                    subject = token_id[len(SUBJECT_PREFIX):]
+                    cutoff = _aware(revoked_at).timestamp()
+                    self._subject_cutoffs[subject] = max(cutoff, self._subject_cutoffs.get(subject, 0))
+            for token_id in [t for t, expires_at in self._expires.items() if expires_at < now]:
+                del self._expires[token_id]
+                if token_id.startswith(SUBJECT_PREFIX):
+                    self._subject_cutoffs.pop(token_id[len(SUBJECT_PREFIX):], None)
+            if synced_at is not None:
+                self.synced_at = synced_at
+
+    def sync_since(self) -> Optional[datetime]:
+        return self.synced_at - SYNC_OVERLAP if self.synced_at else None
+
+    def clear(self):
+        with self._lock:
+            self._expires.clear()
+            self._subject_cutoffs.clear()
+            self.synced_at = None
+
+    def __len__(self):
+        return len(self._expires)
+
+
+@dataclass(frozen=True)
+class VerifiedUser:
+    email: str
+    role: Optional[str]
+    is_active: bool
+    is_confirmed_by_admin: bool
+    claims: dict = field(repr=False, compare=False)
+
+
+class TokenVerifier:
+    def __init__(self, fetch_jwks: Callable[[], dict], revocations: RevocationList,
+                 cache_seconds: float = JWKS_CACHE_SECONDS, min_refresh_seconds: float = JWKS_MIN_REFRESH_SECONDS):
+        self.fetch_jwks = fetch_jwks
+        self.revocations = revocations
+        self.cache_seconds = cache_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def refresh_keys(self, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._fetched_at is not None and now - self._fetched_at < self.min_refresh_seconds:
+                return
+            keys = {}
+            for key in self.fetch_jwks().get("keys", []):
+                if key.get("kid") and key.get("alg", ALGORITHMS[0]) in ALGORITHMS:
+                    keys[key["kid"]] = jwk.construct(key, key.get("alg", ALGORITHMS[0]))
+            self._keys, self._fetched_at = keys, now
+
+    def _key(self, kid: Optional[str]):
+        stale = self._fetched_at is None or time.monotonic() - self._fetched_at > self.cache_seconds
+        if kid not in self._keys or stale:
+            try:
+                self.refresh_keys()
+            except Exception as e:
+                if kid not in self._keys:
+                    raise InvalidToken(f"signing keys unavailable: {e}")
+        key = self._keys.get(kid)
+        if key is None:
+            raise InvalidToken("unknown key id")
+        return key
+
+    def decode(self, token: str, token_type: str = "access", check_revoked: bool = True) -> dict:
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            claims = jwt.decode(token, self._key(kid), algorithms=ALGORITHMS)
+        except JWTError as e:
+            raise InvalidToken(str(e))
+        if not claims.get("sub") or claims.get("typ", "access") != token_type:
+            raise InvalidToken("wrong token type")
+        if check_revoked and self.revocations.is_claims_revoked(claims):
+            raise InvalidToken("token revoked")
+        return claims
+
+
+def http_json(url: str, timeout: float = 5.0) -> dict:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+remote_revocations = RevocationList()
+remote_verifier = TokenVerifier(lambda: http_json(AUTH_JWKS_URL), remote_revocations)
+
+
+def sync_remote(app=None):
+    """Warm-up / periodic step: refresh keys and pull new revocations from the auth service."""
+    remote_verifier.refresh_keys(force=True)
+    since = remote_revocations.sync_since()
+    url = AUTH_REVOCATIONS_URL + (f"?{urlencode({'since': since.isoformat()})}" if since else "")
+    feed = http_json(url)
+    remote_revocations.apply(
+        [(row["id"], datetime.fromisoformat(row["expires_at"]), datetime.fromisoformat(row["revoked_at"]))
+         for row in feed["revoked"]],
+        synced_at=datetime.fromisoformat(feed["as_of"]))
+
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+
+
+def verified_user(verifier: TokenVerifier, token: str) -> VerifiedUser:
+    try:
+        claims = verifier.decode(token)
+    except InvalidToken:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return VerifiedUser(email=claims["sub"], role=claims.get("role"), is_active=claims.get("is_active") is True,
+                        is_confirmed_by_admin=claims.get("is_confirmed_by_admin") is True, claims=claims)
+
+
+def get_current_active_user(token: str = Depends(oauth2_scheme)) -> VerifiedUser:
+    user = verified_user(remote_verifier, token)
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    if user.role == "worker" and not user.is_confirmed_by_admin:
+        raise HTTPException(status_code=403, detail="Worker account not confirmed by admin")
+    return user
@@ -1,8 +1,13 @@
+from sqlalchemy import func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
 from . import models
 from . import database
 from auth.schemas import user_schemas
 from auth.core import security
+from auth.core.user_cache import user_cache
 
 
 def get_user(db: Session, user_id: int):
@@ -13,12 +18,56 @@ def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def filter_users(db: Session, role: user_schemas.UserRole | None = None, is_active: bool | None = None,
+                 is_confirmed_by_admin: bool | None = None, search: str | None = None):
+    query = db.query(models.User)
+    if role is not None:
+        query = query.filter(models.User.role == role)
+    if is_active is not None:
+        query = query.filter(models.User.is_active == is_active)
+    if is_confirmed_by_admin is not None:
+        query = query.filter(models.User.is_confirmed_by_admin == is_confirmed_by_admin)
+    if search:
+        # Prefix match only, so the lower(...) text_pattern_ops indexes can serve it.
+        pattern = search.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = query.filter(or_(func.lower(models.User.email).like(pattern, escape="\\"),
+                                 func.lower(models.User.full_name).like(pattern, escape="\\")))
+    return query
 
 
-def create_user(db: Session, user: user_schemas.UserCreate):
-    hashed_password = security.get_password_hash(user.password)
+def get_users(db: Session, after_id: int | None = None, limit: int = 100, **filters):
+    query = filter_users(db, **filters)
+    if after_id is not None:
+        query = query.filter(models.User.id > after_id)
+    return query.order_by(models.User.id).limit(limit).all()
+
+
+def estimate_users(db: Session, **filters) -> int:
+    query = filter_users(db, **filters)
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return query.count()
+    # The planner's row estimate: no scan of the table, good enough for "about N users".
+    plan = db.execute(_ExplainJson(query.with_entities(models.User.id).statement)).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class _ExplainJson(Executable, ClauseElement):
+    # Compiled like any other statement, so the filters stay bound parameters.
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_ExplainJson, "postgresql")
+def _compile_explain_json(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def create_user(db: Session, user: user_schemas.UserCreate, hashed_password: str | None = None):
+    if hashed_password is None:
+        hashed_password = security.get_password_hash(user.password)
     db_user = models.User(
         email=user.email,
         full_name=user.full_name,
@@ -44,15 +93,37 @@ def get_unconfirmed_workers(db: Session, skip: int = 0, limit: int = 100):
         models.User.is_confirmed_by_admin == False
     ).offset(skip).limit(limit).all()
 
+def confirm_workers(db: Session, user_ids: list[int]) -> list[models.User]:
+    """Activate and confirm the given workers with one UPDATE ... RETURNING; other ids are skipped."""
+    if not user_ids:
+        return []
+    stmt = (update(models.User)
+            .where(models.User.id.in_(user_ids), models.User.role == user_schemas.UserRole.WORKER)
+            .values(is_active=True, is_confirmed_by_admin=True)
+            .returning(models.User)
+            .execution_options(synchronize_session=False))
+    users = list(db.scalars(stmt))
+    for db_user in users:
+        db.expunge(db_user)  # keep the returned values; commit would expire them
+    db.commit()
+    for db_user in users:
+        user_cache.invalidate(db_user.email)
+    return users
+
+
 def confirm_worker(db: Session, user_id: int):
+    users = confirm_workers(db, [user_id])
+    return users[0] if users else None
+
+def deactivate_user(db: Session, user_id: int):
     db_user = get_user(db, user_id=user_id)
-    if db_user and db_user.role == user_schemas.UserRole.WORKER:
-        db_user.is_active = True
-        db_user.is_confirmed_by_admin = True
-        db.commit()
-        db.refresh(db_user)
-        return db_user
-    return None
+    if db_user is None:
+        return None
+    db_user.is_active = False
+    db.commit()
+    user_cache.invalidate(db_user.email)
+    db.refresh(db_user)
+    return db_user
 
 def authenticate_user(db: Session, email: str, password: str) -> models.User | None:
     user = get_user_by_email(db, email=email)
@@ -63,6 +134,41 @@ def authenticate_user(db: Session, email: str, password: str) -> models.User | N
     return user
 
 
+def update_password_hash(db: Session, user: models.User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+
+
+def add_revoked_token(db: Session, token_id: str, expires_at) -> bool:
+    """False if the id was already revoked, by this process or any other."""
+    db.add(models.RevokedToken(id=token_id, expires_at=expires_at))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+
+def delete_revoked_token(db: Session, token_id: str):
+    db.query(models.RevokedToken).filter(models.RevokedToken.id == token_id).delete(synchronize_session=False)
+    db.commit()
+
+
+def get_revoked_tokens(db: Session, since=None):
+    query = db.query(models.RevokedToken.id, models.RevokedToken.expires_at, models.RevokedToken.revoked_at)
+    if since is not None:
+        query = query.filter(models.RevokedToken.revoked_at >= since)
+    return query.all()
+
+
+def delete_expired_revoked_tokens(db: Session, now):
+    deleted = db.query(models.RevokedToken).filter(models.RevokedToken.expires_at < now).delete(
+        synchronize_session=False)
+    db.commit()
+    return deleted
+
+
 def create_first_admin_if_not_exists(db: Session):
     from auth.core.config import settings
     if settings.FIRST_ADMIN_EMAIL and settings.FIRST_ADMIN_PASSWORD:
@@ -1,14 +1,24 @@
-from sqlalchemy import Column, Integer, String, Boolean, Enum as SAEnum
+from sqlalchemy import Column, DateTime, Integer, String, Boolean, Enum as SAEnum
+from sqlalchemy.sql import func
 from auth.db.database import Base
 from auth.schemas.user_schemas import UserRole
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String, unique=True, index=True, nullable=False)
-    full_name = Column(String, index=True, nullable=True)
+    full_name = Column(String, nullable=True)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=False) # Default to inactive until confirmed
     is_confirmed_by_admin = Column(Boolean, default=False)
-    role = Column(SAEnum(UserRole, name="user_role_enum_type"), nullable=False, default=UserRole.WORKER)
\ No newline at end of file
+    role = Column(SAEnum(UserRole, name="user_role_enum_type"), nullable=False, default=UserRole.WORKER)
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    # jti of a single token or the family id shared by all tokens of one login session.
+    id = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
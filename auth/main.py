@@ -1,36 +1,55 @@
-from fastapi import FastAPI, Depends
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Response
 
-from .db import models, database, crud
+from .db import database, crud
 from .routers import auth_router, admin_router
+from .core import keys, lifecycle, revocation
 from .core.config import settings
 
-models.Base.metadata.create_all(bind=database.engine)
 
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    version=settings.PROJECT_VERSION,
-    root_path="/auth_service"
-)
+def run_migrations(app: FastAPI):
+    from migrations import migrate_on_startup
+    with lifecycle.app_session(app, database.get_db) as db:
+        migrate_on_startup("auth", db.get_bind())
 
-@app.on_event("startup")
-def on_startup():
-    db: Session = next(database.get_db()) # Get a DB session
-    try:
+
+def ensure_first_admin(app: FastAPI):
+    with lifecycle.app_session(app, database.get_db) as db:
         crud.create_first_admin_if_not_exists(db)
-    finally:
-        db.close()
 
 
-app.include_router(auth_router.router)
-app.include_router(admin_router.router)
+def load_signing_keys(app: FastAPI):
+    keys.keyring.signing_key
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        version=settings.PROJECT_VERSION,
+        root_path="/auth_service",
+        lifespan=lifecycle.lifespan(
+            [run_migrations, ensure_first_admin, load_signing_keys, revocation.sync_revocations],
+            periodic=[(settings.REVOCATION_SYNC_SECONDS, revocation.sync_revocations),
+                      (3600, revocation.prune_revocations)]),
+    )
+    app.include_router(auth_router.router)
+    app.include_router(admin_router.router)
+    app.include_router(lifecycle.health_router(database.get_db))
+
+    @app.get("/.well-known/jwks.json", tags=["Authentication"])
+    def jwks(response: Response):
+        response.headers["Cache-Control"] = "public, max-age=300"
+        return keys.keyring.jwks()
+
+    @app.get("/")
+    async def root():
+        return {"message": f"Welcome to {settings.PROJECT_NAME} v{settings.PROJECT_VERSION}"}
+
+    return app
 
 
-@app.get("/")
-async def root():
-    return {"message": f"Welcome to {settings.PROJECT_NAME} v{settings.PROJECT_VERSION}"}
+app = create_app()
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001, log_level="info",reload=True)
\ No newline at end of file
+    uvicorn.run("auth.main:app", host="0.0.0.0", port=8001, log_level="info", reload=True)
@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from auth.db import crud, database, models
 from auth.schemas import user_schemas
-from auth.core import deps
+from auth.core import deps, revocation
 
 router = APIRouter(
     prefix="/admin",
@@ -12,10 +12,22 @@ router = APIRouter(
     dependencies=[Depends(deps.get_current_active_admin_user)]
 )
 
-@router.get("/users", response_model=List[user_schemas.User])
-def read_all_users(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    users = crud.get_users(db, skip=skip, limit=limit)
-    return users
+@router.get("/users", response_model=user_schemas.UserPage)
+def read_all_users(
+        cursor: Optional[int] = Query(None, description="next_cursor of the previous page"),
+        limit: int = Query(100, ge=1, le=500),
+        role: Optional[user_schemas.UserRole] = None,
+        is_active: Optional[bool] = None,
+        is_confirmed_by_admin: Optional[bool] = None,
+        q: Optional[str] = Query(None, min_length=1, max_length=100, description="Prefix of email or full name"),
+        db: Session = Depends(database.get_db)):
+    filters = dict(role=role, is_active=is_active, is_confirmed_by_admin=is_confirmed_by_admin, search=q)
+    users = crud.get_users(db, after_id=cursor, limit=limit, **filters)
+    return user_schemas.UserPage(
+        items=users,
+        next_cursor=users[-1].id if len(users) == limit else None,
+        total_estimate=crud.estimate_users(db, **filters),
+    )
 
 @router.get("/unconfirmed-workers", response_model=List[user_schemas.User])
 def read_unconfirmed_workers(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
@@ -27,4 +39,22 @@ def confirm_worker_registration(user_id: int, db: Session = Depends(database.get
     db_user = crud.confirm_worker(db, user_id=user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="Worker not found or not eligible for confirmation")
-    return db_user
\ No newline at end of file
+    return db_user
+
+@router.post("/confirm-workers", response_model=user_schemas.ConfirmWorkersResponse)
+def confirm_workers(request: user_schemas.ConfirmWorkersRequest, db: Session = Depends(database.get_db)):
+    confirmed = crud.confirm_workers(db, user_ids=request.user_ids)
+    confirmed_ids = {user.id for user in confirmed}
+    return user_schemas.ConfirmWorkersResponse(
+        confirmed=confirmed,
+        skipped_ids=[user_id for user_id in dict.fromkeys(request.user_ids) if user_id not in confirmed_ids],
+    )
+
+@router.patch("/deactivate-user/{user_id}", response_model=user_schemas.User)
+def deactivate_user(user_id: int, db: Session = Depends(database.get_db)):
+    db_user = crud.deactivate_user(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Tokens already handed out are verified without a DB lookup elsewhere; cut them off too.
+    revocation.revoke_subject(db, db_user.email)
+    return db_user
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from typing import Optional
+from datetime import datetime, timedelta, timezone
 
 from auth.db import crud, database
 from auth.schemas import user_schemas
-from auth.core import security, deps
+from auth.core import security, deps, rate_limit, revocation
+from auth.core.revocation import revocation_list
+from auth.core.token_verifier import InvalidToken
 from auth.core.config import settings
 
 router = APIRouter(
@@ -15,8 +19,10 @@ router = APIRouter(
 
 
 @router.post("/register", response_model=user_schemas.User)
-def register_user(user_in: user_schemas.UserRegister, db: Session = Depends(database.get_db)):
-    db_user = crud.get_user_by_email(db, email=user_in.email)
+async def register_user(request: Request, user_in: user_schemas.UserRegister,
+                        db: Session = Depends(database.get_db)):
+    rate_limit.check_register(request)
+    db_user = await run_in_threadpool(crud.get_user_by_email, db, email=user_in.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     user_create_data = user_schemas.UserCreate(
@@ -25,27 +31,40 @@ def register_user(user_in: user_schemas.UserRegister, db: Session = Depends(data
         password=user_in.password,
         role=user_schemas.UserRole.WORKER
     )
-    return crud.create_user(db=db, user=user_create_data)
+    hashed_password = await security.get_password_hash_async(user_in.password)
+    return await run_in_threadpool(crud.create_user, db=db, user=user_create_data, hashed_password=hashed_password)
 
 
 @router.post("/token", response_model=user_schemas.Token)
-def login_for_access_token(
+async def login_for_access_token(
+        request: Request,
         db: Session = Depends(database.get_db),
         form_data: OAuth2PasswordRequestForm = Depends()
 ):
-    user = crud.authenticate_user(db, email=form_data.username, password=form_data.password)
-    if not user:
+    # Buckets are checked before any hashing, so a burst against one account or from one
+    # address is turned away for the price of a dict lookup.
+    rate_limit.check_login(request, form_data.username)
+    user = await run_in_threadpool(crud.get_user_by_email, db, email=form_data.username)
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await security.verify_and_update_password(form_data.password, user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        await run_in_threadpool(crud.update_password_hash, db, user, new_hash)
     if user.role == user_schemas.UserRole.WORKER and not user.is_confirmed_by_admin:
         raise HTTPException(status_code=403, detail="Worker account not yet confirmed by admin.")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
 
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return issue_tokens(user, security.new_token_family())
+
+
+def issue_tokens(user, family: str) -> dict:
     access_token = security.create_access_token(
         data={
             "sub": user.email,
@@ -53,11 +72,73 @@ def login_for_access_token(
             "is_active": user.is_active,
             "is_confirmed_by_admin": user.is_confirmed_by_admin
         },
-        expires_delta=access_token_expires
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+        family=family,
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": security.create_refresh_token(user.email, family),
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+def decode_refresh_token(refresh_token: str) -> dict:
+    try:
+        payload = deps.verifier.decode(refresh_token, token_type="refresh", check_revoked=False)
+    except InvalidToken:
+        payload = {}
+    if not payload.get("jti") or not payload.get("fam"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    return payload
+
+
+@router.post("/refresh", response_model=user_schemas.Token)
+def refresh_access_token(body: user_schemas.RefreshRequest, db: Session = Depends(database.get_db)):
+    payload = decode_refresh_token(body.refresh_token)
+    jti, family = payload["jti"], payload["fam"]
+    if revocation_list.is_revoked(jti) and not revocation_list.is_revoked(family):
+        # A rotated token came back: someone else holds a copy, so end the whole session.
+        revocation.revoke_family(db, family)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token reuse detected")
+    if revocation_list.is_claims_revoked(payload):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
+
+    user = crud.get_user_by_email(db, email=payload["sub"])
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    if user.role == user_schemas.UserRole.WORKER and not user.is_confirmed_by_admin:
+        raise HTTPException(status_code=403, detail="Worker account not yet confirmed by admin.")
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+
+    if not revocation.revoke(db, jti, datetime.fromtimestamp(payload["exp"], timezone.utc)):
+        # Rotated by a concurrent request, or on a replica whose revocations we have not synced yet.
+        revocation.revoke_family(db, family)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token reuse detected")
+    return issue_tokens(user, family)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(body: user_schemas.RefreshRequest, db: Session = Depends(database.get_db)):
+    """Revokes the refresh token and every access token issued in the same login session."""
+    payload = decode_refresh_token(body.refresh_token)
+    if not revocation_list.is_revoked(payload["fam"]):
+        revocation.revoke_family(db, payload["fam"])
 
 
 @router.get("/users/me", response_model=user_schemas.User)
 def read_users_me(current_user: user_schemas.User = Depends(deps.get_current_active_user)):
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+@router.get("/revocations")
+def list_revocations(since: Optional[datetime] = None, db: Session = Depends(database.get_db)):
+    """Revoked token ids for services that verify tokens locally (see auth.core.token_verifier)."""
+    as_of = datetime.now(timezone.utc)
+    rows = crud.get_revoked_tokens(db, since=since)
+    return {
+        "as_of": as_of.isoformat(),
+        "revoked": [{"id": token_id, "expires_at": expires_at.isoformat(), "revoked_at": revoked_at.isoformat()}
+                    for token_id, expires_at, revoked_at in rows],
+    }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 class UserRole(str, Enum):
@@ -26,12 +26,29 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class UserPage(BaseModel):
+    items: List[User]
+    next_cursor: Optional[int] = None
+    total_estimate: int
+
+class ConfirmWorkersRequest(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+class ConfirmWorkersResponse(BaseModel):
+    confirmed: List[User]
+    skipped_ids: List[int]
+
 class UserInDB(User):
     hashed_password: str
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[EmailStr] = None
@@ -0,0 +1,124 @@
+"""Login throughput of the auth service under a burst of concurrent logins.
+
+Runs the auth app in-process on a throwaway SQLite database, fires `--logins` requests at
+/auth/token with `--concurrency` in flight, and probes /health meanwhile to show whether the
+rest of the service keeps answering while bcrypt is busy.
+
+    python -m benchmarks.login_throughput --logins 400 --concurrency 64
+    BCRYPT_ROUNDS=12 PASSWORD_HASH_WORKERS=2 python -m benchmarks.login_throughput --keep-rate-limits
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth.core import rate_limit
+from auth.core.security import get_password_hash
+from auth.db import database, models
+from auth.main import create_app
+from auth.schemas.user_schemas import UserRole
+from migrations import migrate
+
+PASSWORD = "benchmark-password"
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def seed_users(engine, count):
+    hashed = get_password_hash(PASSWORD)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all(models.User(email=f"worker{i}@bench.local", full_name=f"Worker {i}", hashed_password=hashed,
+                               role=UserRole.WORKER, is_active=True, is_confirmed_by_admin=True)
+                   for i in range(count))
+        db.commit()
+    return Session
+
+
+async def run(app, users, logins, concurrency, probe_interval):
+    login_latencies, probe_latencies, statuses = [], [], Counter()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = asyncio.Queue()
+        for i in range(logins):
+            queue.put_nowait(f"worker{i % users}@bench.local")
+        done = asyncio.Event()
+
+        async def login_worker():
+            while not queue.empty():
+                email = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post("/auth/token", data={"username": email, "password": PASSWORD})
+                login_latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/health")
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(probe_interval)
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+    return elapsed, login_latencies, probe_latencies, statuses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark /auth/token under concurrent load.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="Seconds between /health probes.")
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="Keep per-IP/per-email buckets (all requests come from one address).")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'auth.db')}", connect_args={"check_same_thread": False})
+        migrate("auth", engine)
+        Session = seed_users(engine, args.users)
+
+        def get_db():
+            db = Session()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app = create_app()
+        app.dependency_overrides[database.get_db] = get_db
+        if not args.keep_rate_limits:
+            for limiter in (rate_limit.login_by_ip, rate_limit.login_by_email):
+                limiter.capacity = limiter.rate = float("inf")
+
+        elapsed, logins, probes, statuses = asyncio.run(
+            run(app, args.users, args.logins, args.concurrency, args.probe_interval))
+        engine.dispose()
+
+    print(f"logins: {len(logins)} in {elapsed:.2f}s ({len(logins) / elapsed:.1f}/s), statuses {dict(statuses)}")
+    print(f"login latency  p50 {percentile(logins, 50) * 1000:.0f} ms, p95 {percentile(logins, 95) * 1000:.0f} ms, "
+          f"p99 {percentile(logins, 99) * 1000:.0f} ms")
+    print(f"/health latency p50 {percentile(probes, 50) * 1000:.1f} ms, p95 {percentile(probes, 95) * 1000:.1f} ms, "
+          f"max {max(probes, default=0) * 1000:.1f} ms over {len(probes)} probes")
+    if statuses.get(503):
+        print(f"hash queue full: {statuses[503]} requests shed (PASSWORD_HASH_QUEUE_SIZE)")
+
+
+if __name__ == "__main__":
+    main()
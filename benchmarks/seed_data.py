@@ -0,0 +1,448 @@
+"""Synthetic data generator for local benchmarks.
+
+Fills complaint_analyses_v2 and youtube_comments with deterministic, production-shaped
+rows: streamed through COPY on PostgreSQL, executemany batches on SQLite.
+
+    python -m benchmarks.seed_data --complaints 10000000 --comments 2000000 --seed 42
+    python -m benchmarks.seed_data --database-url sqlite:///bench.db --complaints 100000
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+from sqlalchemy import DateTime, Enum as DBEnum, Float, create_engine, text
+
+from llm_management.database import SQLALCHEMY_DATABASE_URL
+from llm_management.models import (ComplaintAnalysis, IssueStatus, SeverityLevel, SubmissionSource,
+                                   UserSubmissionType)
+from migrations import migrate
+from news_monitor.models import CommentSentiment, YoutubeComment
+from news_monitor.rollup import rebuild_rollup
+
+# Rows are generated in fixed-size chunks, each with its own RNG derived from the seed,
+# so the output depends only on --seed and the row counts, never on --batch-size.
+GENERATION_CHUNK = 10_000
+
+BISHKEK_CENTER = (42.8746, 74.5698)
+BISHKEK_UTC_OFFSET = timedelta(hours=6)
+
+# category -> (weight, departments, subcategories)
+CATEGORIES = {
+    "Городская инфраструктура и ЖКХ": (34, ["Мэрия г. Бишкек, Департамент ЖКХ", "Тазалык", "Бишкекводоканал",
+                                            "Бишкекглавархитектура"],
+                                       ["вывоз мусора", "ямы на дороге", "нет горячей воды", "не работает освещение",
+                                        "отключение отопления", "незаконная стройка"]),
+    "Общественный порядок и безопасность": (16, ["МВД КР, ГУВД г. Бишкек", "МЧС КР"],
+                                            ["шум ночью", "драка во дворе", "незаконная парковка", "кража"]),
+    "Здравоохранение": (11, ["Министерство здравоохранения КР", "ЦСМ"],
+                        ["грубость врача", "очереди в поликлинике", "нет лекарств", "отказ в помощи"]),
+    "Образование и дети": (9, ["Министерство образования и науки КР", "Мэрия г. Бишкек, Управление образования"],
+                           ["поборы в школе", "нет мест в детсаду", "питание в школе"]),
+    "Коррупция и госуслуги": (8, ["ГРС при КМ КР", "Антикоррупционная служба ГКНБ"],
+                              ["вымогательство взятки", "очереди в ЦОН", "задержка документов"]),
+    "Экология и животные": (7, ["Министерство природных ресурсов КР", "Тазалык", "Мэрия г. Бишкек"],
+                            ["стихийная свалка", "вырубка деревьев", "бродячие собаки", "смог"]),
+    "Работа и социальная защита": (5, ["Министерство труда КР", "Социальный фонд КР"],
+                                   ["невыплата зарплаты", "задержка пенсии", "отказ в пособии"]),
+    "Интернет, цифровые услуги и связь": (4, ["Министерство цифрового развития КР"],
+                                          ["не работает Тундук", "сбой портала госуслуг"]),
+    "Экономика и бизнес": (3, ["Министерство экономики КР", "ГНС КР"],
+                           ["проверки бизнеса", "рост тарифов"]),
+    "Другое": (3, ["Мэрия г. Бишкек"], ["прочее"]),
+}
+
+STREETS = {
+    "Ленинский район": ["ул. Киевская", "ул. Токтогула", "ул. Абдрахманова", "ул. Тыныстанова", "ул. Ахунбаева",
+                        "мкр. Джал"],
+    "Октябрьский район": ["пр. Чуй", "ул. Исанова", "ул. Ибраимова", "мкр. Асанбай", "мкр. Восток-5",
+                          "ул. Горького"],
+    "Первомайский район": ["ул. Московская", "ул. Панфилова", "пр. Манаса", "ул. Фрунзе", "ул. Логвиненко"],
+    "Свердловский район": ["пр. Жибек Жолу", "ул. Байтик Баатыра", "мкр. Аламедин-1", "ул. Шабдан Баатыра",
+                           "мкр. Кок-Жар"],
+}
+
+STATUS_WEIGHTS = {
+    IssueStatus.ANALYZED: 35, IssueStatus.RESOLVED: 25, IssueStatus.IN_PROGRESS: 12,
+    IssueStatus.ANALYSIS_FAILED: 6, IssueStatus.PENDING_USER_FEEDBACK: 5, IssueStatus.REJECTED: 5,
+    IssueStatus.PENDING_ANALYSIS: 4, IssueStatus.CLOSED_UNRESOLVED: 3,
+}
+SEVERITY_WEIGHTS = {SeverityLevel.LOW: 30, SeverityLevel.MEDIUM: 40, SeverityLevel.HIGH: 22,
+                    SeverityLevel.CRITICAL: 8}
+SOURCE_WEIGHTS = {SubmissionSource.TELEGRAM: 85, SubmissionSource.WEBFORM: 10, SubmissionSource.WHATSAPP: 4,
+                  SubmissionSource.OTHER: 1}
+SENTIMENT_WEIGHTS = {
+    CommentSentiment.NEUTRAL: 28, CommentSentiment.NEGATIVE: 20, CommentSentiment.POSITIVE: 14,
+    CommentSentiment.ANGRY: 9, CommentSentiment.FRUSTRATED: 8, CommentSentiment.GRATEFUL: 6,
+    CommentSentiment.SARCASTIC: 5, CommentSentiment.SAD: 4, CommentSentiment.EXCITED: 3,
+    CommentSentiment.CONFUSED: 2, CommentSentiment.UNKNOWN: 1,
+}
+
+# Local (UTC+6) hour-of-day and Monday..Sunday activity profiles.
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 7, 10, 13, 14, 13, 11, 10, 10, 10, 11, 12, 13, 14, 13, 10, 6, 3]
+WEEKDAY_WEIGHTS = [1.15, 1.1, 1.05, 1.05, 1.0, 0.8, 0.7]
+
+CHANNELS = [
+    ("UCMT_crm-eLZl3CNvNr-1lWQ", "Ала Тоо", 30),
+    ("UCbj2FCkrX13P9fDnxnY0GGw", "Апрель", 25),
+    ("UCs_xNajKMU60fbeIhcxStoA", "Азаттык", 20),
+    ("UCNPxzbEkoNcydfLrRdTb-HA", "Акипресс", 15),
+    ("UCwlDbu6R30KrhDxq0ETTXPQ", "Лимон KG", 10),
+]
+VIDEO_TITLE_TEMPLATES = ["Новости Бишкека: {}", "{}: что говорят жители", "Срочно! {}", "Репортаж: {}",
+                         "Мэрия о проблеме: {}"]
+
+# Short formulaic comments carry an obvious label; they repeat a lot in production.
+FORMULAIC_COMMENTS = [
+    ("Молодцы!", CommentSentiment.POSITIVE), ("Спасибо!", CommentSentiment.GRATEFUL),
+    ("Рахмат", CommentSentiment.GRATEFUL), ("Позор!", CommentSentiment.ANGRY),
+    ("Уят!", CommentSentiment.ANGRY), ("👍👍👍", CommentSentiment.POSITIVE), ("😡", CommentSentiment.ANGRY),
+    ("Ну-ну...", CommentSentiment.SARCASTIC), ("Жаль людей", CommentSentiment.SAD),
+    ("А где мэрия?", CommentSentiment.FRUSTRATED), ("Ничего не поменяется", CommentSentiment.FRUSTRATED),
+    ("Супер!!!", CommentSentiment.EXCITED), ("Не понял, это где?", CommentSentiment.CONFUSED),
+]
+COMMENT_OPENERS = ["Опять", "Каждый год одно и то же:", "Наконец-то", "Почему", "У нас тоже", "Кто ответит за то, что"]
+COMMENT_TAILS = ["никто ничего не делает.", "спасибо журналистам.", "сколько можно?", "надо срочно решать.",
+                 "так и живём.", "пусть власти посмотрят."]
+FIRST_NAMES = ["Айбек", "Нурлан", "Айгуль", "Бакыт", "Елена", "Азамат", "Жылдыз", "Сергей", "Чолпон", "Эрлан",
+               "Динара", "Тимур"]
+
+
+def _cum(weights):
+    return list(accumulate(weights))
+
+
+def _zipf_cum(n, s=1.1):
+    return _cum(1.0 / (rank ** s) for rank in range(1, n + 1))
+
+
+def _chunk_rng(seed, table_name, chunk_index):
+    return random.Random(f"{seed}:{table_name}:{chunk_index}")
+
+
+def _day_weights(days, end_date):
+    # Mild growth trend over the period, modulated by the weekly profile.
+    start = end_date - timedelta(days=days)
+    return [(0.5 + idx / days) * WEEKDAY_WEIGHTS[(start + timedelta(days=idx)).weekday()] for idx in range(days)]
+
+
+class SyntheticDataset:
+    def __init__(self, seed, days=365, end_date=None, addresses=5000, users=None, videos_per_channel=200):
+        self.seed = seed
+        self.days = days
+        self.end_date = end_date or datetime(2025, 6, 1, tzinfo=timezone.utc)
+        self.start_date = self.end_date - timedelta(days=days)
+        self.day_cum = _cum(_day_weights(days, self.end_date))
+        self.hour_cum = _cum(HOUR_WEIGHTS)
+
+        rng = random.Random(f"{seed}:pools")
+        self.addresses = self._build_addresses(rng, addresses)
+        self.address_cum = _zipf_cum(len(self.addresses), 0.8)
+        self.users = users
+        self.videos = self._build_videos(rng, videos_per_channel)
+        self.video_cum = _zipf_cum(len(self.videos), 0.9)
+
+        self.categories = list(CATEGORIES)
+        self.category_cum = _cum(CATEGORIES[c][0] for c in self.categories)
+        self._user_cums = {}
+
+    @staticmethod
+    def _build_addresses(rng, count):
+        districts = list(STREETS)
+        pool = []
+        for _ in range(count):
+            district = rng.choice(districts)
+            street = rng.choice(STREETS[district])
+            lat = BISHKEK_CENTER[0] + rng.gauss(0, 0.025)
+            lon = BISHKEK_CENTER[1] + rng.gauss(0, 0.04)
+            pool.append((f"г. Бишкек, {street}, {rng.randint(1, 180)}", round(lat, 6), round(lon, 6), district))
+        return pool
+
+    @staticmethod
+    def _build_videos(rng, per_channel):
+        subcategories = [sub for _, _, subs in CATEGORIES.values() for sub in subs]
+        videos = []
+        for channel_id, channel_title, _ in CHANNELS:
+            for _ in range(per_channel):
+                video_id = "".join(rng.choices("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_",
+                                               k=11))
+                title = rng.choice(VIDEO_TITLE_TEMPLATES).format(rng.choice(subcategories))
+                videos.append((video_id, channel_id, channel_title, title))
+        # Interleave channels by weight so the Zipf head is not one channel only.
+        channel_weight = {channel_id: weight for channel_id, _, weight in CHANNELS}
+        rng.shuffle(videos)
+        videos.sort(key=lambda v: -channel_weight[v[1]] * rng.random())
+        return videos
+
+    def _user_cum(self, kind, count, s):
+        if (kind, count) not in self._user_cums:
+            self._user_cums[kind, count] = _zipf_cum(count, s)
+        return self._user_cums[kind, count]
+
+    def _timestamps(self, rng, n):
+        days = rng.choices(range(self.days), cum_weights=self.day_cum, k=n)
+        hours = rng.choices(range(24), cum_weights=self.hour_cum, k=n)
+        return [self.start_date + timedelta(days=d, hours=h, seconds=rng.randrange(3600)) - BISHKEK_UTC_OFFSET
+                for d, h in zip(days, hours)]
+
+    def complaint_rows(self, chunk_index, start, n, total):
+        user_count = self.users or max(1000, total // 5)
+        user_cum = self._user_cum("complaints", user_count, 0.8)
+        statuses, status_cum = list(STATUS_WEIGHTS), _cum(STATUS_WEIGHTS.values())
+        severities, severity_cum = list(SEVERITY_WEIGHTS), _cum(SEVERITY_WEIGHTS.values())
+        sources, source_cum = list(SOURCE_WEIGHTS), _cum(SOURCE_WEIGHTS.values())
+
+        rng = _chunk_rng(self.seed, ComplaintAnalysis.__tablename__, chunk_index)
+        categories = rng.choices(self.categories, cum_weights=self.category_cum, k=n)
+        addresses = rng.choices(self.addresses, cum_weights=self.address_cum, k=n)
+        users = rng.choices(range(user_count), cum_weights=user_cum, k=n)
+        chunk_statuses = rng.choices(statuses, cum_weights=status_cum, k=n)
+        chunk_severities = rng.choices(severities, cum_weights=severity_cum, k=n)
+        chunk_sources = rng.choices(sources, cum_weights=source_cum, k=n)
+        created = self._timestamps(rng, n)
+
+        rows = []
+        for i in range(n):
+            _, departments, subcategories = CATEGORIES[categories[i]]
+            address_text, lat, lon, district = addresses[i]
+            subcategory = rng.choice(subcategories)
+            user = users[i]
+            status = chunk_statuses[i]
+            submission_type = UserSubmissionType.COMPLAINT
+            if rng.random() < 0.08:
+                submission_type, status = UserSubmissionType.REQUEST, IssueStatus.NEW
+            analyzed = status not in (IssueStatus.NEW, IssueStatus.PENDING_ANALYSIS, IssueStatus.ANALYSIS_FAILED)
+            has_address = rng.random() < 0.7
+            resolved_at = resolution = feedback = None
+            if status in (IssueStatus.RESOLVED, IssueStatus.PENDING_USER_FEEDBACK):
+                resolved_at = created[i] + timedelta(hours=rng.expovariate(1 / 72))
+                resolution = f"Проблема «{subcategory}» устранена, выезд бригады."
+                if status == IssueStatus.RESOLVED and rng.random() < 0.3:
+                    feedback = rng.choice(["Спасибо, решили быстро", "Решено частично", "Ничего не изменилось"])
+
+            rows.append((
+                f"{subcategory.capitalize()} по адресу {address_text}. Прошу принять меры.",
+                submission_type,
+                chunk_sources[i],
+                str(400_000_000 + user),
+                f"user{user}" if rng.random() < 0.8 else None,
+                FIRST_NAMES[user % len(FIRST_NAMES)],
+                rng.choice(departments) if analyzed else None,
+                rng.choice(["общегражданская", "общегражданская", "личная"]) if analyzed else None,
+                categories[i] if analyzed else None,
+                subcategory if analyzed else None,
+                address_text if analyzed and has_address else None,
+                lat if analyzed and has_address and rng.random() < 0.4 else None,
+                lon if analyzed and has_address and rng.random() < 0.4 else None,
+                district if analyzed and has_address else None,
+                chunk_severities[i] if analyzed else None,
+                None,
+                None,
+                "Тайм-аут запроса к Ollama API." if status == IssueStatus.ANALYSIS_FAILED else None,
+                status,
+                created[i],
+                resolved_at or (created[i] + timedelta(hours=1) if analyzed else None),
+                resolved_at,
+                resolution,
+                feedback,
+            ))
+        return rows
+
+    def comment_rows(self, chunk_index, start, n, total):
+        user_count = max(500, total // 8)
+        user_cum = self._user_cum("comments", user_count, 0.9)
+        sentiments, sentiment_cum = list(SENTIMENT_WEIGHTS), _cum(SENTIMENT_WEIGHTS.values())
+
+        rng = _chunk_rng(self.seed, YoutubeComment.__tablename__, chunk_index)
+        videos = rng.choices(self.videos, cum_weights=self.video_cum, k=n)
+        users = rng.choices(range(user_count), cum_weights=user_cum, k=n)
+        chunk_sentiments = rng.choices(sentiments, cum_weights=sentiment_cum, k=n)
+        published = self._timestamps(rng, n)
+
+        rows = []
+        for i in range(n):
+            video_id, channel_id, channel_title, title = videos[i]
+            if rng.random() < 0.35:
+                comment_text, sentiment = rng.choice(FORMULAIC_COMMENTS)
+            else:
+                comment_text = f"{rng.choice(COMMENT_OPENERS)} {title.lower()}, {rng.choice(COMMENT_TAILS)}"
+                sentiment = chunk_sentiments[i]
+            rows.append((
+                f"@user-{users[i]:x}",
+                comment_text,
+                None,
+                title,
+                f"Ugz{self.seed:04x}{start + i:016x}",
+                video_id,
+                channel_id,
+                channel_title,
+                published[i],
+                sentiment,
+                published[i] + timedelta(minutes=rng.randint(1, 180)),
+            ))
+        return rows
+
+
+COMPLAINT_COLUMNS = [
+    "original_complaint_text", "submission_type_by_user", "source", "source_user_id", "source_username",
+    "user_first_name", "responsible_department", "complaint_type", "complaint_category", "complaint_subcategory",
+    "address_text", "latitude", "longitude", "district", "severity_level", "applicant_data", "other_details",
+    "llm_processing_error", "status", "created_at", "updated_at", "resolved_at", "resolution_details",
+    "user_feedback_on_resolution",
+]
+COMMENT_COLUMNS = [
+    "youtube_username", "comment_text", "opinion_text", "topic", "youtube_comment_id", "youtube_video_id",
+    "youtube_channel_id", "youtube_channel_title", "comment_published_at", "sentiment", "created_at",
+]
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+_COPY_SPECIAL = re.compile(r"[\\\t\n\r]")
+
+TABLES = {
+    "complaints": (ComplaintAnalysis.__table__, COMPLAINT_COLUMNS, SyntheticDataset.complaint_rows),
+    "comments": (YoutubeComment.__table__, COMMENT_COLUMNS, SyntheticDataset.comment_rows),
+}
+
+
+def _copy_formatter(column):
+    # Enum columns are stored by member name, the same way SQLAlchemy binds them.
+    if isinstance(column.type, DBEnum):
+        return lambda value: value.name
+    if isinstance(column.type, DateTime):
+        return datetime.isoformat
+    if isinstance(column.type, Float):
+        return repr
+    return lambda value: value.translate(_COPY_ESCAPES) if _COPY_SPECIAL.search(value) else value
+
+
+def render_copy_text(table, columns, rows):
+    formatters = [_copy_formatter(table.c[name]) for name in columns]
+    return "".join("\t".join("\\N" if value is None else fmt(value) for fmt, value in zip(formatters, row)) + "\n"
+                   for row in rows)
+
+
+# Generation is CPU-bound Python, so chunks are built (and pre-rendered for COPY) in worker
+# processes while the parent only streams them into the database.
+_worker_dataset = None
+
+
+def _init_worker(dataset_kwargs):
+    global _worker_dataset
+    _worker_dataset = SyntheticDataset(**dataset_kwargs)
+
+
+def _generate_chunk(task):
+    kind, chunk_index, start, n, total, as_copy = task
+    table, columns, make_rows = TABLES[kind]
+    rows = make_rows(_worker_dataset, chunk_index, start, n, total)
+    return (render_copy_text(table, columns, rows) if as_copy else rows), n
+
+
+def generate_chunks(pool, kind, total, as_copy):
+    tasks = [(kind, chunk_index, start, min(GENERATION_CHUNK, total - start), total, as_copy)
+             for chunk_index, start in enumerate(range(0, total, GENERATION_CHUNK))]
+    return pool.imap(_generate_chunk, tasks)
+
+
+def copy_into_postgres(engine, table, columns, chunks, batch_size):
+    sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT text)"
+    raw = engine.raw_connection()
+    loaded = 0
+    try:
+        cursor = raw.cursor()
+        parts, buffered = [], 0
+        for payload, n in chunks:
+            parts.append(payload)
+            buffered += n
+            if buffered >= batch_size:
+                cursor.copy_expert(sql, io.StringIO("".join(parts)))
+                raw.commit()
+                loaded += buffered
+                parts, buffered = [], 0
+                print(f"  {table.name}: {loaded} rows")
+        if parts:
+            cursor.copy_expert(sql, io.StringIO("".join(parts)))
+            loaded += buffered
+        cursor.execute(f"ANALYZE {table.name}")
+        raw.commit()
+    finally:
+        raw.close()
+    return loaded
+
+
+def insert_executemany(engine, table, columns, chunks, batch_size):
+    loaded = 0
+    batch = []
+    with engine.begin() as conn:
+        for rows, _ in chunks:
+            batch.extend(dict(zip(columns, row)) for row in rows)
+            if len(batch) >= batch_size:
+                conn.execute(table.insert(), batch)
+                loaded += len(batch)
+                batch = []
+                print(f"  {table.name}: {loaded} rows")
+        if batch:
+            conn.execute(table.insert(), batch)
+            loaded += len(batch)
+    return loaded
+
+
+def truncate(engine, table):
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"TRUNCATE {table.name} RESTART IDENTITY"))
+        else:
+            conn.execute(table.delete())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic complaints and YouTube comments.")
+    parser.add_argument("--database-url", default=SQLALCHEMY_DATABASE_URL)
+    parser.add_argument("--complaints", type=int, default=100_000)
+    parser.add_argument("--comments", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365, help="Length of the generated period.")
+    parser.add_argument("--end-date", type=datetime.fromisoformat, default=None,
+                        help="Last day of the period (ISO date). Fixed by default for reproducibility.")
+    parser.add_argument("--addresses", type=int, default=5000, help="Size of the repeated address pool.")
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes generating rows in parallel.")
+    parser.add_argument("--truncate", action="store_true", help="Empty the target tables first.")
+    args = parser.parse_args(argv)
+
+    dataset_kwargs = {
+        "seed": args.seed,
+        "days": args.days,
+        "end_date": args.end_date.replace(tzinfo=timezone.utc) if args.end_date else None,
+        "addresses": args.addresses,
+    }
+    engine = create_engine(args.database_url)
+    migrate("complaints", engine)
+    migrate("youtube", engine)
+    use_copy = engine.dialect.name == "postgresql"
+    loader = copy_into_postgres if use_copy else insert_executemany
+
+    with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(dataset_kwargs,)) as pool:
+        for kind, total in (("complaints", args.complaints), ("comments", args.comments)):
+            table, columns, _ = TABLES[kind]
+            if args.truncate:
+                truncate(engine, table)
+            if total:
+                started = time.perf_counter()
+                loaded = loader(engine, table, columns, generate_chunks(pool, kind, total, use_copy), args.batch_size)
+                elapsed = time.perf_counter() - started
+                print(f"{table.name}: {loaded} rows in {elapsed:.1f}s ({loaded / elapsed:,.0f} rows/s)")
+            if kind == "comments" and (total or args.truncate):
+                # Seeded comments arrive labelled, past the sentiment worker that keeps the rollup.
+                with engine.begin() as conn:
+                    rebuild_rollup(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Comments classified per minute: one Ollama request per comment vs batched prompts.
+
+Needs a running Ollama with the model from SENTIMENT_MODEL (default gemma3:27b). Comments come from
+the synthetic dataset, so every mode sees the same texts; each mode starts with an empty cache.
+"single" and "batched" send every text to the model; "lexicon" is batched with the lexicon scorer
+labelling formulaic comments first, as the worker does by default (LEXICON_ENABLED).
+
+    python -m benchmarks.sentiment_throughput --comments 200
+    SENTIMENT_BATCH_TOKENS=6000 SENTIMENT_CONCURRENCY=4 python -m benchmarks.sentiment_throughput
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.seed_data import COMMENT_COLUMNS, SyntheticDataset
+from news_monitor import lexicon, sentiment
+from news_monitor.sentiment_cache import SentimentCache, normalize
+
+
+def comment_texts(count, seed):
+    rows = SyntheticDataset(seed=seed).comment_rows(0, 0, count * 3, count * 3)
+    index = COMMENT_COLUMNS.index("comment_text")
+    # Unique texts only, otherwise the cache does the work.
+    return list({normalize(row[index]): row[index] for row in rows}.values())[:count]
+
+
+def run(mode, texts, cache_dir):
+    # A fresh cache per mode: the point is to measure the model, not the cache.
+    sentiment.sentiment_cache = SentimentCache(os.path.join(cache_dir, f"{mode}.sqlite3"))
+    lexicon.LEXICON_ENABLED = mode == "lexicon"
+    started = time.perf_counter()
+    if mode == "single":
+        labels = [sentiment.analyze_comment_sentiment_with_ai(text) for text in texts]
+    else:
+        labels = sentiment.classify_comments(texts)
+    return time.perf_counter() - started, labels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark comment sentiment classification.")
+    parser.add_argument("--comments", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--modes", nargs="+", choices=["single", "batched", "lexicon"],
+                        default=["single", "batched", "lexicon"])
+    args = parser.parse_args(argv)
+
+    texts = comment_texts(args.comments, args.seed)
+    results = {}
+    cache_dir = tempfile.mkdtemp(prefix="sentiment-bench-")
+    for mode in args.modes:
+        elapsed, labels = run(mode, texts, cache_dir)
+        results[mode] = labels
+        print(f"{mode:<8} {len(texts)} comments in {elapsed:.1f}s = {len(texts) / elapsed * 60:.0f}/min, "
+              f"labels {dict(Counter(label.name for label in labels))}")
+    for mode in results:
+        if mode != "single" and "single" in results:
+            agree = sum(a == b for a, b in zip(results["single"], results[mode]))
+            print(f"agreement single/{mode}: {agree}/{len(texts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Cost of authenticating one request: the old verify-then-query path against local RS256 verification.
+
+"hs256+query" is what every request used to pay in llm_management: decode an HS256 token with the
+shared secret, then load the user row. "rs256" is token_verifier.TokenVerifier with the JWKS already
+cached, which is all a service other than auth does now. Uses a throwaway SQLite file, so the
+query column is a lower bound of what a round trip to PostgreSQL costs.
+
+    python -m benchmarks.token_verify --iterations 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth.core.keys import KeyRing
+from auth.core.token_verifier import RevocationList, TokenVerifier
+from auth.db import crud, models
+from auth.schemas.user_schemas import UserRole
+from migrations import migrate
+
+EMAIL = "worker0@bench.local"
+
+
+def claims():
+    return {"sub": EMAIL, "role": "worker", "is_active": True, "is_confirmed_by_admin": True,
+            "exp": datetime.now(timezone.utc) + timedelta(hours=1), "typ": "access"}
+
+
+def measure(fn, iterations):
+    fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark access token verification.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--revoked", type=int, default=10000, help="Entries in the revocation list.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'auth.db')}")
+        migrate("auth", engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            db.add(models.User(email=EMAIL, full_name="Worker", hashed_password="x", role=UserRole.WORKER,
+                               is_active=True, is_confirmed_by_admin=True))
+            db.commit()
+
+        secret = "benchmark-secret"
+        hs_token = jwt.encode(claims(), secret, algorithm="HS256")
+
+        def hs256_and_query():
+            payload = jwt.decode(hs_token, secret, algorithms=["HS256"])
+            with Session() as db:
+                crud.get_user_by_email(db, email=payload["sub"])
+
+        ring = KeyRing(os.path.join(tmp, "keys"), autogenerate=True)
+        kid, key = ring.signing_key
+        rs_token = jwt.encode(claims(), key, algorithm="RS256", headers={"kid": kid})
+        revocations = RevocationList()
+        expires = datetime.now(timezone.utc) + timedelta(days=1)
+        revocations.apply((f"jti-{i}", expires, datetime.now(timezone.utc)) for i in range(args.revoked))
+        verifier = TokenVerifier(ring.jwks, revocations)
+
+        results = {
+            "hs256 decode only": measure(lambda: jwt.decode(hs_token, secret, algorithms=["HS256"]), args.iterations),
+            "hs256+query": measure(hs256_and_query, args.iterations),
+            "rs256 (cached jwks)": measure(lambda: verifier.decode(rs_token), args.iterations),
+        }
+        engine.dispose()
+
+    for name, us in results.items():
+        print(f"{name:<22} {us:8.1f} us/op")
+
+
+if __name__ == "__main__":
+    main()
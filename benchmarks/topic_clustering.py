@@ -0,0 +1,87 @@
+"""Comments per second through the topic model: fitting, then incremental assignment.
+
+Comments come from the synthetic dataset and never touch the database, so this measures the
+CPU work of news_monitor/topics.py alone: hashing n-grams, k-means updates and assignment.
+Purity is the share of the synthetic problem ("ямы на дороге", ...) that a cluster's
+non-formulaic comments have in common, weighted by cluster size.
+
+    python -m benchmarks.topic_clustering --comments 1000000
+    TOPIC_CLUSTERS=100 python -m benchmarks.topic_clustering --fit-sample 100000
+"""
+import argparse
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from benchmarks.seed_data import CATEGORIES, COMMENT_COLUMNS, GENERATION_CHUNK, SyntheticDataset
+from news_monitor import topics
+
+SUBCATEGORIES = sorted({sub for _, _, subs in CATEGORIES.values() for sub in subs}, key=len, reverse=True)
+
+
+def comments(count, seed):
+    """(texts, problem of the video or None for formulaic comments)."""
+    dataset = SyntheticDataset(seed=seed)
+    text_index, title_index = COMMENT_COLUMNS.index("comment_text"), COMMENT_COLUMNS.index("topic")
+    texts, problems = [], []
+    for chunk, start in enumerate(range(0, count, GENERATION_CHUNK)):
+        for row in dataset.comment_rows(chunk, start, min(GENERATION_CHUNK, count - start), count):
+            title = row[title_index].lower()
+            texts.append(row[text_index])
+            problems.append(next((sub for sub in SUBCATEGORIES if sub in title), None)
+                            if title in row[text_index].lower() else None)
+    return texts, problems
+
+
+def purity(labels, problems):
+    by_cluster = defaultdict(Counter)
+    for label, problem in zip(labels, problems):
+        if problem is not None:
+            by_cluster[label][problem] += 1
+    total = sum(sum(counts.values()) for counts in by_cluster.values())
+    return sum(counts.most_common(1)[0][1] for counts in by_cluster.values()) / total if total else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark comment topic clustering.")
+    parser.add_argument("--comments", type=int, default=1000000)
+    parser.add_argument("--fit-sample", type=int, default=topics.FIT_SAMPLE)
+    parser.add_argument("--clusters", type=int, default=topics.N_CLUSTERS)
+    parser.add_argument("--batch-size", type=int, default=topics.BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    texts, problems = comments(args.comments, args.seed)
+    print(f"generated {len(texts)} comments in {time.perf_counter() - started:.1f}s (not counted)")
+
+    model = topics.TopicModel(n_clusters=args.clusters, seed=args.seed)
+    sample = texts[:args.fit_sample]
+    started = time.perf_counter()
+    model.fit(sample, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"fit      {len(sample)} comments x {topics.FIT_EPOCHS} epochs, {model.centroids.shape[1]} clusters "
+          f"in {elapsed:.1f}s = {len(sample) / elapsed:.0f}/s")
+
+    # Everything, as the job would see it: batch by batch, the centroids moving as they go.
+    labels = []
+    started = time.perf_counter()
+    for start in range(0, len(texts), args.batch_size):
+        labels.append(model.assign(texts[start:start + args.batch_size]))
+    elapsed = time.perf_counter() - started
+    labels = np.concatenate(labels)
+    print(f"assign   {len(texts)} comments in {elapsed:.1f}s = {len(texts) / elapsed:.0f}/s, "
+          f"without topic {np.count_nonzero(labels == topics.NO_TOPIC)}")
+
+    started = time.perf_counter()
+    for start in range(0, len(texts), args.batch_size):
+        model.vectorize(texts[start:start + args.batch_size])
+    print(f"features alone: {len(texts) / (time.perf_counter() - started):.0f}/s")
+    print(f"purity by problem: {purity(labels.tolist(), problems):.1%}")
+    for cluster, terms in list(enumerate(model.top_terms(5)))[:10]:
+        print(f"  {cluster:>3} {model.counts[cluster]:>8}  {', '.join(terms)}")
+
+
+if __name__ == "__main__":
+    main()
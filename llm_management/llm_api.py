@@ -1,30 +1,77 @@
-from fastapi import FastAPI, HTTPException, Depends ,Query
+from fastapi import APIRouter, BackgroundTasks, FastAPI, HTTPException, Depends ,Query, Request, Response
 from pydantic import BaseModel, Field
 from typing import Optional, List
-import requests
 import json
 import os
-import sys
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, configure_mappers
 from datetime import datetime
 from sqlalchemy import desc, extract
 from collections import Counter
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from datetime import datetime, timedelta
-import models
-from models import SubmissionSource, UserSubmissionType, IssueStatus, SeverityLevel, ComplaintAnalysis
-from database import engine, get_db
-from sqlalchemy import func, or_
-from auth.core import deps as auth_deps
-from auth.db import models as auth_models
+from datetime import datetime, timedelta, timezone
+from llm_management.models import SubmissionSource, UserSubmissionType, IssueStatus, SeverityLevel, ComplaintAnalysis, \
+    ACTIVE_STATUS_CONDITION
+from llm_management.database import get_db
+from sqlalchemy import false, func, or_, text, update
+from auth.core import lifecycle, token_verifier
+from auth.core.token_verifier import VerifiedUser, get_current_active_user
 load_dotenv()
 OLLAMA_API_URL = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api/generate")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gemma3:27b")
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", 30))
+ANALYSIS_RESUME_SECONDS = float(os.getenv("ANALYSIS_RESUME_SECONDS", 300))
+ANALYSIS_STALE_MINUTES = float(os.getenv("ANALYSIS_STALE_MINUTES", 10))
+# Upcoming complaint partitions are also created while the process runs, not only at warm-up.
+PARTITIONS_CHECK_SECONDS = float(os.getenv("PARTITIONS_CHECK_SECONDS", 86400))
+ANALYSIS_RESUME_BATCH = 5  # per run; each may wait up to 120 s for the LLM
+MAX_STATUS_IDS = 100
 
-models.Base.metadata.create_all(bind=engine)
+router = APIRouter()
+
+
+def run_migrations(app: FastAPI):
+    from migrations import migrate_on_startup
+    with lifecycle.app_session(app, get_db) as db:
+        migrate_on_startup("complaints", db.get_bind())
+
+
+def ensure_partitions(app: FastAPI):
+    from llm_management import partitions
+    with lifecycle.app_session(app, get_db) as db:
+        created = partitions.ensure_partitions(db.connection())
+        db.commit()
+    if created:
+        print(f"Созданы партиции: {created}")
+
+
+def sync_auth_keys(app: FastAPI):
+    # Best effort: intake endpoints do not need auth, so an unreachable auth service must not keep
+    # this one unready. Keys are fetched on first use and revocations on the next periodic sync.
+    try:
+        token_verifier.sync_remote(app)
+    except Exception as e:
+        print(f"Не удалось получить ключи/отзывы токенов у сервиса авторизации: {e}")
+
+
+def preload(app: FastAPI):
+    # Pay for mapper configuration and the HTTP client import before the first request does.
+    configure_mappers()
+    import requests  # noqa: F401
+
+
+def filter_by_created_at(query, date_from: Optional[datetime], date_to: Optional[datetime]):
+    # Bounds are sent as timestamptz constants, so PostgreSQL can prune monthly partitions
+    # of complaint_analyses_v2 at plan time. Naive datetimes are taken as UTC.
+    if date_from:
+        if date_from.tzinfo is None:
+            date_from = date_from.replace(tzinfo=timezone.utc)
+        query = query.filter(ComplaintAnalysis.created_at >= date_from)
+    if date_to:
+        if date_to.tzinfo is None:
+            date_to = date_to.replace(tzinfo=timezone.utc)
+        query = query.filter(ComplaintAnalysis.created_at < date_to + timedelta(days=1))
+    return query
 
-app = FastAPI(root_path="/api")
 
 class StatsByCategoryItem(BaseModel):
     category: Optional[str]
@@ -123,19 +170,17 @@ class IssueDetails(BaseModel):
         orm_mode = True
         use_enum_values = True
 
-@app.post("/submit-issue/", response_model=SubmissionResponse, status_code=201)
-def submit_issue(item: IssueSubmissionItem, db: Session = Depends(get_db)):
+def analyze_complaint(text: str):
+    """Ask the LLM to analyse a complaint; returns (LLMAnalysisResult, error or None, IssueStatus)."""
+    import requests
     llm_analysis_results = LLMAnalysisResult()
     llm_processing_error = None
-    current_status = IssueStatus.NEW  # Статус по умолчанию
-
-    if item.submission_type_by_user == UserSubmissionType.COMPLAINT:
-        current_status = IssueStatus.PENDING_ANALYSIS
-        prompt = f"""
+    current_status = IssueStatus.PENDING_ANALYSIS
+    prompt = f"""
         Вы — высококвалифицированный AI-аналитик в центре обработки обращений граждан. Ваша задача — точно проанализировать текст жалобы и извлечь структурированную информацию.
 
         Текст жалобы:
-        "{item.text}"
+        "{text}"
 
         Проанализируйте жалобу и предоставьте ответ ИСКЛЮЧИТЕЛЬНО в формате JSON со следующими полями:
 
@@ -196,50 +241,118 @@ def submit_issue(item: IssueSubmissionItem, db: Session = Depends(get_db)):
 
         Строго следуйте формату JSON. Не добавляйте никаких пояснений вне JSON.
 """
-        try:
-            payload = {
-                "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": False,
-                "format": "json"
-            }
-            response = requests.post(OLLAMA_API_URL, json=payload, timeout=120)  # Увеличено время ожидания
-            response.raise_for_status()
-
-            llm_response_str = response.json().get("response", "")
-
-            if not llm_response_str:
-                llm_processing_error = "LLM вернул пустой ответ."
-                current_status = IssueStatus.ANALYSIS_FAILED
-            else:
-                try:
-                    if llm_response_str.strip().startswith("```json"):
-                        llm_response_str = llm_response_str.strip()[7:]
-                        if llm_response_str.strip().endswith("```"):
-                            llm_response_str = llm_response_str.strip()[:-3]
-
-                    parsed_llm_json = json.loads(llm_response_str.strip())
-
-                    llm_analysis_results = LLMAnalysisResult(**parsed_llm_json)
-                    current_status = IssueStatus.ANALYZED if llm_analysis_results.responsible_department else IssueStatus.ANALYSIS_FAILED
-
-                except json.JSONDecodeError as jde:
-                    llm_processing_error = f"Ошибка декодирования JSON от LLM: {str(jde)}. Ответ LLM (начало): '{llm_response_str[:300]}...'"
-                    current_status = IssueStatus.ANALYSIS_FAILED
-                except Exception as e:
-                    llm_processing_error = f"Ошибка обработки ответа LLM или валидации данных: {str(e)}. Ответ LLM (начало): '{llm_response_str[:300]}...'"
-                    current_status = IssueStatus.ANALYSIS_FAILED
-
-        except requests.exceptions.Timeout:
-            llm_processing_error = f"Тайм-аут запроса к Ollama API ({OLLAMA_API_URL})."
-            current_status = IssueStatus.ANALYSIS_FAILED
-        except requests.exceptions.RequestException as req_err:
-            llm_processing_error = f"Ошибка запроса к Ollama API: {str(req_err)}"
-            current_status = IssueStatus.ANALYSIS_FAILED
-        except Exception as e:
-            llm_processing_error = f"Непредвиденная ошибка при обработке LLM: {str(e)}"
+    try:
+        payload = {
+            "model": OLLAMA_MODEL,
+            "prompt": prompt,
+            "stream": False,
+            "format": "json"
+        }
+        response = requests.post(OLLAMA_API_URL, json=payload, timeout=120)  # Увеличено время ожидания
+        response.raise_for_status()
+
+        llm_response_str = response.json().get("response", "")
+
+        if not llm_response_str:
+            llm_processing_error = "LLM вернул пустой ответ."
             current_status = IssueStatus.ANALYSIS_FAILED
+        else:
+            try:
+                if llm_response_str.strip().startswith("```json"):
+                    llm_response_str = llm_response_str.strip()[7:]
+                    if llm_response_str.strip().endswith("```"):
+                        llm_response_str = llm_response_str.strip()[:-3]
+
+                parsed_llm_json = json.loads(llm_response_str.strip())
+
+                llm_analysis_results = LLMAnalysisResult(**parsed_llm_json)
+                current_status = IssueStatus.ANALYZED if llm_analysis_results.responsible_department else IssueStatus.ANALYSIS_FAILED
+
+            except json.JSONDecodeError as jde:
+                llm_processing_error = f"Ошибка декодирования JSON от LLM: {str(jde)}. Ответ LLM (начало): '{llm_response_str[:300]}...'"
+                current_status = IssueStatus.ANALYSIS_FAILED
+            except Exception as e:
+                llm_processing_error = f"Ошибка обработки ответа LLM или валидации данных: {str(e)}. Ответ LLM (начало): '{llm_response_str[:300]}...'"
+                current_status = IssueStatus.ANALYSIS_FAILED
+
+    except requests.exceptions.Timeout:
+        llm_processing_error = f"Тайм-аут запроса к Ollama API ({OLLAMA_API_URL})."
+        current_status = IssueStatus.ANALYSIS_FAILED
+    except requests.exceptions.RequestException as req_err:
+        llm_processing_error = f"Ошибка запроса к Ollama API: {str(req_err)}"
+        current_status = IssueStatus.ANALYSIS_FAILED
+    except Exception as e:
+        llm_processing_error = f"Непредвиденная ошибка при обработке LLM: {str(e)}"
+        current_status = IssueStatus.ANALYSIS_FAILED
+
+    return llm_analysis_results, llm_processing_error, current_status
+
 
+def save_analysis(db: Session, issue_id: int, analysis: LLMAnalysisResult, error: Optional[str],
+                  status: IssueStatus) -> bool:
+    """Store a background analysis; False if the issue left PENDING_ANALYSIS in the meantime."""
+    result = db.execute(
+        update(ComplaintAnalysis)
+        .where(ComplaintAnalysis.id == issue_id, ComplaintAnalysis.status == IssueStatus.PENDING_ANALYSIS)
+        .values(**analysis.model_dump(), llm_processing_error=error, status=status)
+    )
+    db.commit()
+    return result.rowcount > 0
+
+
+def analyze_in_background(app: FastAPI, issue_id: int, complaint_text: str):
+    analysis, error, status = analyze_complaint(complaint_text)
+    with lifecycle.app_session(app, get_db) as db:
+        save_analysis(db, issue_id, analysis, error, status)
+
+
+def claim_pending_analysis(db: Session):
+    """Oldest complaint left pending past ANALYSIS_STALE_MINUTES, marked as taken (updated_at) so that
+    other workers skip it for that long; None if there is none."""
+    stale_before = datetime.now(timezone.utc) - timedelta(minutes=ANALYSIS_STALE_MINUTES)
+    row = db.query(ComplaintAnalysis.id, ComplaintAnalysis.original_complaint_text).filter(
+        text(ACTIVE_STATUS_CONDITION),
+        ComplaintAnalysis.status == IssueStatus.PENDING_ANALYSIS,
+        func.coalesce(ComplaintAnalysis.updated_at, ComplaintAnalysis.created_at) < stale_before,
+    ).order_by(ComplaintAnalysis.created_at).limit(1).with_for_update(skip_locked=True).first()
+    if row is not None:
+        db.execute(update(ComplaintAnalysis).where(ComplaintAnalysis.id == row.id).values(updated_at=func.now()))
+    db.commit()
+    return row
+
+
+def resume_pending_analyses(app: FastAPI):
+    # Background analyses die with the process; pick up complaints left pending for too long.
+    resumed = 0
+    while resumed < ANALYSIS_RESUME_BATCH:
+        with lifecycle.app_session(app, get_db) as db:
+            row = claim_pending_analysis(db)
+        if row is None:
+            break
+        analyze_in_background(app, row.id, row.original_complaint_text)
+        resumed += 1
+    if resumed:
+        print(f"Дообработано зависших обращений: {resumed}")
+
+
+@router.post("/submit-issue/", response_model=SubmissionResponse, status_code=201)
+def submit_issue(
+        item: IssueSubmissionItem,
+        request: Request,
+        response: Response,
+        background_tasks: BackgroundTasks,
+        wait_for_analysis: bool = Query(True, description="false: сохранить жалобу и сразу ответить 202, "
+                                                          "анализ идёт в фоне (результат — /issues/status/)"),
+        db: Session = Depends(get_db)
+):
+    llm_analysis_results = LLMAnalysisResult()
+    llm_processing_error = None
+    current_status = IssueStatus.NEW  # Статус по умолчанию
+
+    if item.submission_type_by_user == UserSubmissionType.COMPLAINT:
+        current_status = IssueStatus.PENDING_ANALYSIS
+        if wait_for_analysis:
+            llm_analysis_results, llm_processing_error, current_status = analyze_complaint(item.text)
     elif item.submission_type_by_user == UserSubmissionType.REQUEST:
         current_status = IssueStatus.NEW
 
@@ -276,6 +389,12 @@ def submit_issue(item: IssueSubmissionItem, db: Session = Depends(get_db)):
         print(f"Database save error: {str(e)}")
         raise HTTPException(status_code=500, detail={"message": f"Не удалось сохранить данные в базу: {str(e)}"})
 
+    message = "Обращение успешно обработано и сохранено."
+    if current_status == IssueStatus.PENDING_ANALYSIS:
+        background_tasks.add_task(analyze_in_background, request.app, db_record.id, item.text)
+        response.status_code = 202
+        message = "Обращение сохранено, анализ выполняется."
+
     return SubmissionResponse(
         saved_record_id=db_record.id,
         original_text=db_record.original_complaint_text,
@@ -285,7 +404,7 @@ def submit_issue(item: IssueSubmissionItem, db: Session = Depends(get_db)):
         status=db_record.status,
         analysis=llm_analysis_results if current_status == IssueStatus.ANALYZED else None,
         llm_processing_error=llm_processing_error,
-        message="Обращение успешно обработано и сохранено."
+        message=message
     )
 
 
@@ -296,12 +415,12 @@ class IssueListParams(BaseModel):
     order: str = Query("desc", description="Порядок сортировки (asc или desc)")
 
 
-@app.get("/all_issues/", response_model=List[IssueDetails],
+@router.get("/all_issues/", response_model=List[IssueDetails],
          summary="Получить список всех обращений (для работников/админов)")
 def get_all_issues(
         params: IssueListParams = Depends(),
         db: Session = Depends(get_db),
-        current_user: auth_models.User = Depends(auth_deps.get_current_active_user)  # Защита эндпоинта
+        current_user: VerifiedUser = Depends(get_current_active_user)  # Защита эндпоинта
 ):
 
     query = db.query(ComplaintAnalysis)
@@ -320,7 +439,7 @@ def get_all_issues(
     issues = query.offset(params.skip).limit(params.limit).all()
     return issues
 
-@app.get("/issues/", response_model=List[IssueDetails])
+@router.get("/issues/", response_model=List[IssueDetails])
 def get_issues_for_user(
         source_user_id: str,
         db: Session = Depends(get_db),
@@ -348,8 +467,55 @@ def get_issues_for_user(
     return issues
 
 
-@app.get("/issue/{issue_id}", response_model=IssueDetails)
-def get_issue_details(issue_id: int, db: Session = Depends(get_db),current_user: auth_models.User = Depends(auth_deps.get_current_active_user)):
+class IssueStatusItem(BaseModel):
+    id: int
+    status: IssueStatus
+    responsible_department: Optional[str] = None
+    complaint_type: Optional[str] = None
+    llm_processing_error: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+        use_enum_values = True
+
+
+@router.get("/issues/status/", response_model=List[IssueStatusItem],
+            summary="Статусы нескольких обращений одним запросом (для ботов, ждущих анализа)")
+def get_issue_statuses(
+        ids: List[int] = Query(..., description=f"ID обращений, не больше {MAX_STATUS_IDS}"),
+        source_user_ids: List[str] = Query(..., description="ID автора каждого обращения, в том же порядке"),
+        db: Session = Depends(get_db)
+):
+    # Unauthenticated like /issues/: an issue is only shown to a caller who also knows its author.
+    if len(ids) > MAX_STATUS_IDS:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_STATUS_IDS} ID за запрос")
+    if len(ids) != len(source_user_ids):
+        raise HTTPException(status_code=400, detail="ids и source_user_ids должны быть одной длины")
+    authors = dict(zip(ids, source_user_ids))
+    rows = db.query(ComplaintAnalysis.id, ComplaintAnalysis.source_user_id, ComplaintAnalysis.status,
+                    ComplaintAnalysis.responsible_department, ComplaintAnalysis.complaint_type,
+                    ComplaintAnalysis.llm_processing_error) \
+        .filter(ComplaintAnalysis.id.in_(authors)).all()
+    return [row for row in rows if row.source_user_id == authors[row.id]]
+
+
+@router.get("/work_queue/", response_model=List[IssueDetails],
+         summary="Очередь необработанных обращений (ожидают анализа, ошибка анализа, в работе)")
+def get_work_queue(
+        db: Session = Depends(get_db),
+        department: Optional[str] = None,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(50, ge=1, le=200),
+        current_user: VerifiedUser = Depends(get_current_active_user)
+):
+    query = db.query(ComplaintAnalysis).filter(text(ACTIVE_STATUS_CONDITION))
+    if department:
+        query = query.filter(ComplaintAnalysis.responsible_department == department)
+    return query.order_by(ComplaintAnalysis.created_at).offset(skip).limit(limit).all()
+
+
+@router.get("/issue/{issue_id}", response_model=IssueDetails)
+def get_issue_details(issue_id: int, db: Session = Depends(get_db),current_user: VerifiedUser = Depends(get_current_active_user)):
     issue = db.query(ComplaintAnalysis).filter(ComplaintAnalysis.id == issue_id).first()
     if issue is None:
         raise HTTPException(status_code=404, detail="Обращение не найдено")
@@ -380,108 +546,182 @@ class UserFeedbackRequest(BaseModel):
                                              description="Отзыв пользователя о качестве решения проблемы (текст или оценка).")
 
 
-@app.patch("/issue/{issue_id}", response_model=IssueDetails, summary="Обновить детали обращения")
-def update_issue_details(
-        issue_id: int,
-        update_data: IssueUpdateRequest,
-        db: Session = Depends(get_db),
-        current_user: auth_models.User = Depends(auth_deps.get_current_active_user)
-):
-    issue = db.query(ComplaintAnalysis).filter(ComplaintAnalysis.id == issue_id).first()
-    if issue is None:
-        raise HTTPException(status_code=404, detail="Обращение не найдено")
-
-    update_data_dict = update_data.dict(exclude_unset=True)
-
-    for key, value in update_data_dict.items():
-        setattr(issue, key, value)
-
-    issue.updated_at = datetime.utcnow()
-
+def _update_issue(db: Session, issue_id: int, values: dict, condition=None, conflict_detail: str = None):
+    """One conditional UPDATE ... RETURNING; the extra lookup only happens when nothing matched."""
+    stmt = update(ComplaintAnalysis).where(ComplaintAnalysis.id == issue_id)
+    if condition is not None:
+        stmt = stmt.where(condition)
+    stmt = stmt.values(updated_at=func.now(), **values).returning(ComplaintAnalysis) \
+        .execution_options(synchronize_session=False)
     try:
+        issue = db.execute(stmt).scalars().first()
+        if issue is not None:
+            db.expunge(issue)  # keep the RETURNING values instead of re-selecting them after commit
         db.commit()
-        db.refresh(issue)
     except Exception as e:
         db.rollback()
         print(f"Ошибка обновления обращения {issue_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Не удалось обновить обращение: {str(e)}")
 
+    if issue is None:
+        if db.query(ComplaintAnalysis.id).filter(ComplaintAnalysis.id == issue_id).first() is None:
+            raise HTTPException(status_code=404, detail="Обращение не найдено")
+        raise HTTPException(status_code=400, detail=conflict_detail)
     return issue
 
 
-@app.post("/issue/{issue_id}/resolve", response_model=IssueDetails, summary="Отметить обращение как решенное")
-def mark_issue_as_resolved(
+@router.patch("/issue/{issue_id}", response_model=IssueDetails, summary="Обновить детали обращения")
+def update_issue_details(
         issue_id: int,
-        resolution_data: ResolutionRequest,
+        update_data: IssueUpdateRequest,
         db: Session = Depends(get_db),
-        current_user: auth_models.User = Depends(auth_deps.get_current_active_user)
+        current_user: VerifiedUser = Depends(get_current_active_user)
 ):
-    issue = db.query(ComplaintAnalysis).filter(ComplaintAnalysis.id == issue_id).first()
-    if issue is None:
-        raise HTTPException(status_code=404, detail="Обращение не найдено")
-
-    if issue.status == IssueStatus.RESOLVED:
-        raise HTTPException(status_code=400, detail="Обращение уже отмечено как решенное.")
+    return _update_issue(db, issue_id, update_data.model_dump(exclude_unset=True))
 
-    issue.status = IssueStatus.RESOLVED
-    issue.resolution_details = resolution_data.resolution_details
-    issue.resolved_at = resolution_data.resolved_at if resolution_data.resolved_at else datetime.utcnow()
-    issue.updated_at = datetime.utcnow()
-
-    try:
-        db.commit()
-        db.refresh(issue)
-    except Exception as e:
-        db.rollback()
-        print(f"Ошибка при отметке обращения {issue_id} как решенного: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Не удалось обновить обращение: {str(e)}")
 
-    return issue
+@router.post("/issue/{issue_id}/resolve", response_model=IssueDetails, summary="Отметить обращение как решенное")
+def mark_issue_as_resolved(
+        issue_id: int,
+        resolution_data: ResolutionRequest,
+        db: Session = Depends(get_db),
+        current_user: VerifiedUser = Depends(get_current_active_user)
+):
+    values = {
+        "status": IssueStatus.RESOLVED,
+        "resolution_details": resolution_data.resolution_details,
+        "resolved_at": resolution_data.resolved_at if resolution_data.resolved_at else datetime.utcnow(),
+    }
+    return _update_issue(db, issue_id, values, ComplaintAnalysis.status != IssueStatus.RESOLVED,
+                         "Обращение уже отмечено как решенное.")
 
 
-@app.post("/issue/{issue_id}/feedback", response_model=IssueDetails, summary="Добавить отзыв пользователя о решении")
+@router.post("/issue/{issue_id}/feedback", response_model=IssueDetails, summary="Добавить отзыв пользователя о решении")
 def add_user_feedback_to_issue(
         issue_id: int,
         feedback_data: UserFeedbackRequest,
         db: Session = Depends(get_db)
 ):
-    issue = db.query(ComplaintAnalysis).filter(ComplaintAnalysis.id == issue_id).first()
-    if issue is None:
-        raise HTTPException(status_code=404, detail="Обращение не найдено")
+    return _update_issue(
+        db, issue_id, {"user_feedback_on_resolution": feedback_data.user_feedback_on_resolution},
+        ComplaintAnalysis.status.in_([IssueStatus.RESOLVED, IssueStatus.PENDING_USER_FEEDBACK]),
+        "Отзыв можно оставить только по решенному обращению или ожидающему отзыв.")
+
+
+BULK_UPDATE_MAX_IDS = 1000
+
+
+class BulkIssueFilter(BaseModel):
+    status: Optional[IssueStatus] = None
+    responsible_department: Optional[str] = None
+    complaint_category: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+
+class BulkIssueUpdateRequest(BaseModel):
+    ids: Optional[List[int]] = Field(None, description=f"ID обращений (не более {BULK_UPDATE_MAX_IDS}).")
+    filter: Optional[BulkIssueFilter] = Field(None, description="Условие отбора вместо списка ID.")
+    from_statuses: Optional[List[IssueStatus]] = Field(
+        None, description="Менять только обращения в этих статусах.")
+    status: Optional[IssueStatus] = None
+    responsible_department: Optional[str] = None
+    resolution_details: Optional[str] = None
+
+
+class BulkIssueOutcome(BaseModel):
+    id: int
+    outcome: str = Field(..., description="updated | not_found | precondition_failed")
+    status: Optional[IssueStatus] = None
 
 
-    if issue.status != IssueStatus.RESOLVED and issue.status != IssueStatus.PENDING_USER_FEEDBACK:
-        raise HTTPException(status_code=400, detail="Отзыв можно оставить только по решенному обращению или ожидающему отзыв.")
+class BulkIssueUpdateResponse(BaseModel):
+    updated: int
+    results: List[BulkIssueOutcome]
 
-    issue.user_feedback_on_resolution = feedback_data.user_feedback_on_resolution
-    issue.updated_at = datetime.utcnow()
 
+@router.post("/issues/bulk_update", response_model=BulkIssueUpdateResponse,
+             summary="Массово изменить статус или ответственное ведомство")
+def bulk_update_issues(
+        request: BulkIssueUpdateRequest,
+        db: Session = Depends(get_db),
+        current_user: VerifiedUser = Depends(get_current_active_user)
+):
+    if (request.ids is None) == (request.filter is None):
+        raise HTTPException(status_code=400, detail="Укажите либо список ids, либо filter.")
+    if request.status is None and request.responsible_department is None:
+        raise HTTPException(status_code=400, detail="Нечего менять: укажите status и/или responsible_department.")
+    if request.resolution_details is not None and request.status != IssueStatus.RESOLVED:
+        raise HTTPException(status_code=400, detail="resolution_details сохраняется только вместе со status RESOLVED.")
+    if request.ids is not None and len(request.ids) > BULK_UPDATE_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Не более {BULK_UPDATE_MAX_IDS} ID за один запрос.")
+
+    values = {"updated_at": func.now()}
+    if request.responsible_department is not None:
+        values["responsible_department"] = request.responsible_department
+    if request.status is not None:
+        values["status"] = request.status
+        if request.status == IssueStatus.RESOLVED:
+            values["resolved_at"] = func.now()
+            if request.resolution_details is not None:
+                values["resolution_details"] = request.resolution_details
+
+    preconditions = []
+    if request.from_statuses:
+        preconditions.append(ComplaintAnalysis.status.in_(request.from_statuses))
+    if request.status is not None:
+        # Same rule as the single-issue endpoints: an issue is not moved into the status it already has.
+        preconditions.append(ComplaintAnalysis.status != request.status)
+
+    stmt = update(ComplaintAnalysis).where(*preconditions)
+    if request.ids is not None:
+        ids = list(dict.fromkeys(request.ids))
+        stmt = stmt.where(ComplaintAnalysis.id.in_(ids) if ids else false())
+    else:
+        criteria = request.filter
+        if not any(value is not None for value in criteria.model_dump().values()):
+            raise HTTPException(status_code=400, detail="Пустой filter изменил бы все обращения.")
+        if criteria.status is not None:
+            stmt = stmt.where(ComplaintAnalysis.status == criteria.status)
+        if criteria.responsible_department is not None:
+            stmt = stmt.where(ComplaintAnalysis.responsible_department == criteria.responsible_department)
+        if criteria.complaint_category is not None:
+            stmt = stmt.where(ComplaintAnalysis.complaint_category == criteria.complaint_category)
+        stmt = filter_by_created_at(stmt, criteria.date_from, criteria.date_to)
+
+    stmt = stmt.values(**values).returning(ComplaintAnalysis.id, ComplaintAnalysis.status) \
+        .execution_options(synchronize_session=False)
     try:
+        updated = db.execute(stmt).all()
         db.commit()
-        db.refresh(issue)
     except Exception as e:
         db.rollback()
-        print(f"Ошибка при добавлении отзыва к обращению {issue_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Не удалось обновить обращение: {str(e)}")
-
-    return issue
-
-
-@app.get("/stats/overall", response_model=OverallStatsResponse, summary="Получить общую статистику по обращениям")
+        print(f"Ошибка массового обновления обращений: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Не удалось обновить обращения: {str(e)}")
+
+    results = {row.id: BulkIssueOutcome(id=row.id, outcome="updated", status=row.status) for row in updated}
+    if request.ids is not None:
+        missing = [issue_id for issue_id in ids if issue_id not in results]
+        current = dict(db.query(ComplaintAnalysis.id, ComplaintAnalysis.status)
+                       .filter(ComplaintAnalysis.id.in_(missing)).all()) if missing else {}
+        for issue_id in missing:
+            results[issue_id] = BulkIssueOutcome(id=issue_id, outcome="precondition_failed", status=current[issue_id]) \
+                if issue_id in current else BulkIssueOutcome(id=issue_id, outcome="not_found")
+        results = {issue_id: results[issue_id] for issue_id in ids}
+    return BulkIssueUpdateResponse(updated=len(updated), results=list(results.values()))
+
+
+@router.get("/stats/overall", response_model=OverallStatsResponse, summary="Получить общую статистику по обращениям")
 def get_overall_stats(
         db: Session = Depends(get_db),
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
         source: Optional[SubmissionSource] = None,
-        current_user: auth_models.User = Depends(auth_deps.get_current_active_user)
+        current_user: VerifiedUser = Depends(get_current_active_user)
 ):
     query_base = db.query(ComplaintAnalysis)
 
-    if date_from:
-        query_base = query_base.filter(ComplaintAnalysis.created_at >= date_from)
-    if date_to:
-        query_base = query_base.filter(ComplaintAnalysis.created_at < date_to + timedelta(
-            days=1) if date_to else ComplaintAnalysis.created_at <= datetime.utcnow())
+    query_base = filter_by_created_at(query_base, date_from, date_to)
     if source:
         query_base = query_base.filter(ComplaintAnalysis.source == source)
 
@@ -527,7 +767,7 @@ def get_overall_stats(
     )
 
 
-@app.get("/stats/timeline", response_model=List[TimeSeriesDataPoint],
+@router.get("/stats/timeline", response_model=List[TimeSeriesDataPoint],
          summary="Получить статистику по времени (динамика)")
 def get_timeline_stats(
         db: Session = Depends(get_db),
@@ -539,14 +779,10 @@ def get_timeline_stats(
         department: Optional[str] = None,
         status: Optional[IssueStatus] = None,
         severity: Optional[SeverityLevel] = None,
-        current_user: auth_models.User = Depends(auth_deps.get_current_active_user)
+        current_user: VerifiedUser = Depends(get_current_active_user)
 ):
     query_base = db.query(ComplaintAnalysis)
-    if date_from:
-        query_base = query_base.filter(ComplaintAnalysis.created_at >= date_from)
-    if date_to:
-        query_base = query_base.filter(ComplaintAnalysis.created_at < date_to + timedelta(
-            days=1) if date_to else ComplaintAnalysis.created_at <= datetime.utcnow())
+    query_base = filter_by_created_at(query_base, date_from, date_to)
     if category:
         query_base = query_base.filter(ComplaintAnalysis.complaint_category == category)
     if department:
@@ -583,7 +819,7 @@ def get_timeline_stats(
     return result
 
 
-@app.get("/stats/top_problematic_addresses", response_model=List[dict], summary="Топ проблемных адресов")
+@router.get("/stats/top_problematic_addresses", response_model=List[dict], summary="Топ проблемных адресов")
 def get_top_problematic_addresses(
         limit: int = Query(1, ge=1, le=100),
         db: Session = Depends(get_db),
@@ -591,18 +827,14 @@ def get_top_problematic_addresses(
         date_to: Optional[datetime] = None,
         category: Optional[str] = None,
         district: Optional[str] = None,
-        current_user: auth_models.User = Depends(auth_deps.get_current_active_user)
+        current_user: VerifiedUser = Depends(get_current_active_user)
 ):
     query_base = db.query(
         ComplaintAnalysis.address_text,
         func.count(ComplaintAnalysis.id).label("complaint_count")
     ).filter(ComplaintAnalysis.address_text != None)
 
-    if date_from:
-        query_base = query_base.filter(ComplaintAnalysis.created_at >= date_from)
-    if date_to:
-        query_base = query_base.filter(ComplaintAnalysis.created_at < date_to + timedelta(
-            days=1) if date_to else ComplaintAnalysis.created_at <= datetime.utcnow())
+    query_base = filter_by_created_at(query_base, date_from, date_to)
     if category:
         query_base = query_base.filter(ComplaintAnalysis.complaint_category == category)
     if district:
@@ -616,3 +848,15 @@ def get_top_problematic_addresses(
     return [{"address": row.address_text, "complaint_count": row.complaint_count} for row in top_addresses]
 
 
+def create_app() -> FastAPI:
+    app = FastAPI(root_path="/api", lifespan=lifecycle.lifespan(
+        [run_migrations, ensure_partitions, preload, sync_auth_keys],
+        periodic=[(REVOCATION_SYNC_SECONDS, token_verifier.sync_remote),
+                  (ANALYSIS_RESUME_SECONDS, resume_pending_analyses),
+                  (PARTITIONS_CHECK_SECONDS, ensure_partitions)]))
+    app.include_router(router)
+    app.include_router(lifecycle.health_router(get_db))
+    return app
+
+
+app = create_app()
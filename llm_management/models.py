@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum as DBEnum, Float, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum as DBEnum, Float, Boolean, Index, text
 from sqlalchemy.sql import func
-from database import Base
+from llm_management.database import Base
 import enum
 from typing import Optional
 
@@ -31,6 +31,12 @@ class IssueStatus(str, enum.Enum):
     PENDING_USER_FEEDBACK = "pending_user_feedback"
 
 
+# Issues an operator still has to act on. Served by a partial index, so filters must use
+# ACTIVE_STATUS_CONDITION (or render the same literals) for the planner to match it.
+ACTIVE_STATUSES = (IssueStatus.PENDING_ANALYSIS, IssueStatus.ANALYSIS_FAILED, IssueStatus.IN_PROGRESS)
+ACTIVE_STATUS_CONDITION = "status IN ({})".format(", ".join(f"'{s.name}'" for s in ACTIVE_STATUSES))
+
+
 class SeverityLevel(str, enum.Enum):
     LOW = "низкий"
     MEDIUM = "средний"
@@ -41,21 +47,21 @@ class SeverityLevel(str, enum.Enum):
 class ComplaintAnalysis(Base):
     __tablename__ = "complaint_analyses_v2"
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
 
 
     original_complaint_text = Column(Text, nullable=False)
-    submission_type_by_user = Column(DBEnum(UserSubmissionType), nullable=True, index=True)
+    submission_type_by_user = Column(DBEnum(UserSubmissionType), nullable=True)
     source = Column(DBEnum(SubmissionSource), nullable=False, index=True)
-    source_user_id = Column(String, nullable=False, index=True)
+    source_user_id = Column(String, nullable=False)
     source_username = Column(String, nullable=True)
     user_first_name = Column(String, nullable=True)
 
-    responsible_department = Column(String, index=True, nullable=True)
-    complaint_type = Column(String, index=True, nullable=True)
+    responsible_department = Column(String, nullable=True)
+    complaint_type = Column(String, nullable=True)
 
-    complaint_category = Column(String, index=True, nullable=True)
-    complaint_subcategory = Column(String, index=True, nullable=True)
+    complaint_category = Column(String, nullable=True)
+    complaint_subcategory = Column(String, nullable=True)
 
     address_text = Column(String, nullable=True)
     latitude = Column(Float, nullable=True)
@@ -69,7 +75,7 @@ class ComplaintAnalysis(Base):
     llm_processing_error = Column(Text, nullable=True)
 
 
-    status = Column(DBEnum(IssueStatus), default=IssueStatus.NEW, nullable=False, index=True)
+    status = Column(DBEnum(IssueStatus), default=IssueStatus.NEW, nullable=False)
 
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -80,5 +86,17 @@ class ComplaintAnalysis(Base):
     resolution_details = Column(Text, nullable=True)
     user_feedback_on_resolution = Column(Text, nullable=True)
 
+    # Mirrors migrations/complaints.py; every index here has to pay for itself on insert.
+    __table_args__ = (
+        Index("ix_complaint_analyses_v2_created_at", created_at),
+        Index("ix_complaint_analyses_v2_status_created_at", status, created_at),
+        Index("ix_complaint_analyses_v2_category_created_at", complaint_category, created_at),
+        Index("ix_complaint_analyses_v2_department_created_at", responsible_department, created_at),
+        Index("ix_complaint_analyses_v2_active_queue", created_at,
+              postgresql_where=text(ACTIVE_STATUS_CONDITION), sqlite_where=text(ACTIVE_STATUS_CONDITION)),
+        Index("ix_complaint_analyses_v2_lower_source_user_id", func.lower(source_user_id)),
+        Index("ix_complaint_analyses_v2_lower_source_username", func.lower(source_username)),
+    )
+
     def __repr__(self):
         return f"<ComplaintAnalysis id={self.id} status='{self.status.value}'>"
\ No newline at end of file
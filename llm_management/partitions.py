@@ -0,0 +1,230 @@
+"""Monthly range partitioning of complaint_analyses_v2 on created_at (PostgreSQL only).
+
+    python -m llm_management.partitions convert            # one-off: heap -> partitioned table
+    python -m llm_management.partitions ensure             # create upcoming monthly partitions
+    python -m llm_management.partitions archive --older-than-months 12 --out-dir /var/backups/kopuro
+    python -m llm_management.partitions restore /var/backups/kopuro/complaint_analyses_v2_p2023_01.csv.gz
+    python -m llm_management.partitions status
+
+Archived partitions are exported to gzip'ed CSV and re-attached to complaint_analyses_v2_archive,
+so they stay queryable (also through the complaint_analyses_all view) without slowing down the
+live table. Pass --drop to remove them from the database after export.
+
+The llm_api service runs `ensure` at warm-up and then every PARTITIONS_CHECK_SECONDS (a day).
+"""
+import argparse
+import gzip
+import os
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from llm_management.database import engine
+from llm_management.models import ComplaintAnalysis
+
+TABLE = ComplaintAnalysis.__tablename__
+ARCHIVE_TABLE = f"{TABLE}_archive"
+ALL_VIEW = "complaint_analyses_all"
+DEFAULT_PARTITION = f"{TABLE}_pdefault"
+PARTITION_MONTHS_AHEAD = int(os.getenv("COMPLAINTS_PARTITION_MONTHS_AHEAD", 3))
+
+_PARTITION_RE = re.compile(rf"^{TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def _month_of_partition(name):
+    match = _PARTITION_RE.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def _bounds(month):
+    return f"FROM ('{month.isoformat()} 00:00:00+00') TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+
+
+def is_partitioned(conn, table=TABLE):
+    if conn.dialect.name != "postgresql":
+        return False
+    relkind = conn.execute(text("SELECT relkind FROM pg_class WHERE relname = :name AND relkind IN ('r', 'p')"),
+                           {"name": table}).scalar()
+    return relkind == "p"
+
+
+def list_partitions(conn, parent=TABLE):
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :parent ORDER BY c.relname"
+    ), {"parent": parent}).scalars().all()
+    return list(rows)
+
+
+def _month_condition(month):
+    return (f"created_at >= '{month.isoformat()} 00:00:00+00' "
+            f"AND created_at < '{_add_months(month, 1).isoformat()} 00:00:00+00'")
+
+
+def _create_month_partition(conn, parent, month, name=None):
+    name = name or partition_name(month)
+    default = f"{parent}_pdefault"
+    if default in list_partitions(conn, parent) and conn.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {_month_condition(month)})")).scalar():
+        # Rows of the month already landed in DEFAULT, and PostgreSQL refuses a partition that would
+        # make them misplaced: move them into the new table first, then attach it. Same transaction.
+        conn.execute(text(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        moved = conn.execute(text(f"WITH moved AS (DELETE FROM {default} WHERE {_month_condition(month)} "
+                                  f"RETURNING *) INSERT INTO {name} SELECT * FROM moved")).rowcount
+        conn.execute(text(f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES {_bounds(month)}"))
+        print(f"Партиция {name}: перенесено строк из {default}: {moved}")
+        return
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent} FOR VALUES {_bounds(month)}"))
+
+
+def ensure_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD, today=None):
+    """Create the partitions for the current month and `months_ahead` following ones."""
+    if not is_partitioned(conn):
+        return []
+    current = _month_start(today or datetime.now(timezone.utc))
+    existing = set(list_partitions(conn))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(current, offset)
+        if partition_name(month) not in existing:
+            _create_month_partition(conn, TABLE, month)
+            created.append(partition_name(month))
+    return created
+
+
+def convert_to_partitioned(conn, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Rebuild the plain table as a partitioned one. Runs in the caller's transaction."""
+    if is_partitioned(conn):
+        return False
+    heap = f"{TABLE}_heap"
+    conn.execute(text(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE"))
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": TABLE}).scalar()
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {heap}"))
+    conn.execute(text(f"UPDATE {heap} SET created_at = now() WHERE created_at IS NULL"))
+    conn.execute(text(f"CREATE TABLE {TABLE} (LIKE {heap} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+                      f"PARTITION BY RANGE (created_at)"))
+    conn.execute(text(f"ALTER TABLE {TABLE} ALTER COLUMN created_at SET NOT NULL"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id"))
+
+    first = conn.execute(text(f"SELECT min(created_at) FROM {heap}")).scalar()
+    current = _month_start(datetime.now(timezone.utc))
+    month = _month_start(first) if first else current
+    while month <= _add_months(current, months_ahead):
+        _create_month_partition(conn, TABLE, month)
+        month = _add_months(month, 1)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+
+    conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {heap}"))
+    conn.execute(text(f"DROP TABLE {heap}"))
+    # The partition key has to be part of every unique constraint.
+    conn.execute(text(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)"))
+    for index in ComplaintAnalysis.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    conn.execute(text(f"ANALYZE {TABLE}"))
+    return True
+
+
+def _ensure_archive(conn):
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} (LIKE {TABLE} INCLUDING DEFAULTS) "
+                      f"PARTITION BY RANGE (created_at)"))
+    conn.execute(text(f"CREATE OR REPLACE VIEW {ALL_VIEW} AS "
+                      f"SELECT * FROM {TABLE} UNION ALL SELECT * FROM {ARCHIVE_TABLE}"))
+
+
+def _export_partition(conn, name, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{name}.csv.gz")
+    cursor = conn.connection.cursor()
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", fh)
+    return path
+
+
+def archive_partitions(conn, older_than_months, out_dir, drop=False, today=None):
+    """Detach partitions that ended more than `older_than_months` ago and export them."""
+    if not is_partitioned(conn):
+        raise RuntimeError(f"{TABLE} is not partitioned; run `convert` first.")
+    cutoff = _add_months(_month_start(today or datetime.now(timezone.utc)), -older_than_months)
+    _ensure_archive(conn)
+    archived = []
+    for name in list_partitions(conn):
+        month = _month_of_partition(name)
+        if month is None or _add_months(month, 1) > cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        path = _export_partition(conn, name, out_dir)
+        if drop:
+            conn.execute(text(f"DROP TABLE {name}"))
+        else:
+            conn.execute(text(f"ALTER TABLE {ARCHIVE_TABLE} ATTACH PARTITION {name} FOR VALUES {_bounds(month)}"))
+        archived.append((name, path))
+    return archived
+
+
+def restore_partition(conn, path):
+    """Load an exported partition file back into the archive table."""
+    name = os.path.basename(path).split(".", 1)[0]
+    month = _month_of_partition(name)
+    if month is None:
+        raise ValueError(f"Не удалось определить месяц партиции по имени файла: {path}")
+    _ensure_archive(conn)
+    if name in list_partitions(conn, ARCHIVE_TABLE) or name in list_partitions(conn):
+        raise ValueError(f"Партиция {name} уже существует.")
+    _create_month_partition(conn, ARCHIVE_TABLE, month, name)
+    cursor = conn.connection.cursor()
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        cursor.copy_expert(f"COPY {name} FROM STDIN WITH (FORMAT csv, HEADER)", fh)
+    return name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Manage monthly partitions of {TABLE}.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert = commands.add_parser("convert", help="Convert the plain table into a partitioned one.")
+    convert.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    ensure = commands.add_parser("ensure", help="Create partitions for the upcoming months.")
+    ensure.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    archive = commands.add_parser("archive", help="Detach and export old partitions.")
+    archive.add_argument("--older-than-months", type=int, required=True)
+    archive.add_argument("--out-dir", required=True)
+    archive.add_argument("--drop", action="store_true", help="Drop partitions after export.")
+    restore = commands.add_parser("restore", help="Load an exported partition into the archive table.")
+    restore.add_argument("path")
+    commands.add_parser("status", help="List live and archived partitions.")
+    args = parser.parse_args(argv)
+
+    with engine.begin() as conn:
+        if args.command == "convert":
+            converted = convert_to_partitioned(conn, args.months_ahead)
+            print("Таблица преобразована." if converted else "Таблица уже партиционирована.")
+        elif args.command == "ensure":
+            created = ensure_partitions(conn, args.months_ahead)
+            print(f"Создано партиций: {len(created)} {created}")
+        elif args.command == "archive":
+            for name, path in archive_partitions(conn, args.older_than_months, args.out_dir, args.drop):
+                print(f"{name} -> {path}")
+        elif args.command == "restore":
+            print(f"Восстановлена партиция {restore_partition(conn, args.path)}")
+        else:
+            print(f"{TABLE}: {list_partitions(conn)}")
+            print(f"{ARCHIVE_TABLE}: {list_partitions(conn, ARCHIVE_TABLE)}")
+
+
+if __name__ == "__main__":
+    main()
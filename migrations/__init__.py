@@ -0,0 +1,33 @@
+"""Versioned schema migrations for the auth, complaints and youtube databases.
+
+    python -m migrations                 # upgrade every component
+    python -m migrations complaints      # upgrade one component
+    python -m migrations --status
+"""
+import importlib
+
+from .runner import MIGRATE_ON_STARTUP, Migration, applied_versions, upgrade
+
+COMPONENTS = {
+    "auth": "migrations.auth",
+    "complaints": "migrations.complaints",
+    "youtube": "migrations.youtube",
+}
+
+
+def load_component(component):
+    return importlib.import_module(COMPONENTS[component])
+
+
+def migrate(component, engine=None):
+    module = load_component(component)
+    return upgrade(engine or module.engine, component, module.MIGRATIONS)
+
+
+def migrate_on_startup(component, engine=None):
+    if not MIGRATE_ON_STARTUP:
+        return []
+    applied = migrate(component, engine)
+    for migration in applied:
+        print(f"Применена миграция {component}:{migration.version:04d} {migration.name}")
+    return applied
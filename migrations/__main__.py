@@ -0,0 +1,30 @@
+import argparse
+
+from . import COMPONENTS, applied_versions, load_component, migrate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m migrations", description="Apply schema migrations.")
+    parser.add_argument("components", nargs="*", metavar="component",
+                        help=f"Components to migrate: {', '.join(sorted(COMPONENTS))} (default: all).")
+    parser.add_argument("--status", action="store_true", help="Show applied and pending versions only.")
+    args = parser.parse_args(argv)
+    unknown = set(args.components) - set(COMPONENTS)
+    if unknown:
+        parser.error(f"unknown components: {', '.join(sorted(unknown))}")
+
+    for component in args.components or sorted(COMPONENTS):
+        module = load_component(component)
+        if args.status:
+            with module.engine.connect() as conn:
+                done = applied_versions(conn, component)
+            for migration in module.MIGRATIONS:
+                mark = "x" if migration.version in done else " "
+                print(f"[{mark}] {component}:{migration.version:04d} {migration.name}")
+            continue
+        applied = migrate(component)
+        print(f"{component}: применено миграций {len(applied)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from auth.db import models
+
+from .runner import Migration, create_index, drop_index
+
+COMPONENT = "auth"
+
+
+def _baseline(conn):
+    models.Base.metadata.create_all(conn)
+
+
+def _drop_unused_indexes(conn):
+    drop_index(conn, "ix_users_id")  # duplicates the primary key
+
+
+def _revoked_tokens(conn):
+    models.RevokedToken.__table__.create(conn, checkfirst=True)
+
+
+def _user_search_indexes(conn):
+    # /admin/users searches by lowercase prefix; text_pattern_ops lets LIKE 'abc%' use the index
+    # whatever the database collation is.
+    opclass = " text_pattern_ops" if conn.dialect.name == "postgresql" else ""
+    create_index(conn, "ix_users_lower_email_prefix", "users", [f"lower(email){opclass}"])
+    create_index(conn, "ix_users_lower_full_name_prefix", "users", [f"lower(full_name){opclass}"])
+    drop_index(conn, "ix_users_full_name")  # only ever searched through lower(full_name)
+
+
+MIGRATIONS = [
+    Migration(1, "baseline schema", _baseline),
+    Migration(2, "drop unused indexes", _drop_unused_indexes),
+    Migration(3, "revoked tokens", _revoked_tokens),
+    Migration(4, "user search indexes", _user_search_indexes),
+]
@@ -0,0 +1,44 @@
+from llm_management import models
+from llm_management.models import ACTIVE_STATUS_CONDITION
+
+from .runner import Migration, create_index, drop_index
+
+COMPONENT = "complaints"
+TABLE = models.ComplaintAnalysis.__tablename__
+
+
+def _baseline(conn):
+    models.Base.metadata.create_all(conn)
+
+
+def _workload_indexes(conn):
+    # Stats and listings filter on one dimension and then range/sort on created_at.
+    create_index(conn, "ix_complaint_analyses_v2_created_at", TABLE, ["created_at"])
+    create_index(conn, "ix_complaint_analyses_v2_status_created_at", TABLE, ["status", "created_at"])
+    create_index(conn, "ix_complaint_analyses_v2_category_created_at", TABLE, ["complaint_category", "created_at"])
+    create_index(conn, "ix_complaint_analyses_v2_department_created_at", TABLE,
+                 ["responsible_department", "created_at"])
+    # The work queue only ever looks at a small active slice of the table.
+    create_index(conn, "ix_complaint_analyses_v2_active_queue", TABLE, ["created_at"],
+                 where=ACTIVE_STATUS_CONDITION)
+    # /issues/ matches case-insensitively on either column.
+    create_index(conn, "ix_complaint_analyses_v2_lower_source_user_id", TABLE, ["lower(source_user_id)"])
+    create_index(conn, "ix_complaint_analyses_v2_lower_source_username", TABLE, ["lower(source_username)"])
+
+    for name in (
+            "ix_complaint_analyses_v2_id",  # duplicates the primary key
+            "ix_complaint_analyses_v2_status",
+            "ix_complaint_analyses_v2_complaint_category",
+            "ix_complaint_analyses_v2_responsible_department",
+            "ix_complaint_analyses_v2_source_user_id",
+            "ix_complaint_analyses_v2_complaint_subcategory",
+            "ix_complaint_analyses_v2_complaint_type",
+            "ix_complaint_analyses_v2_submission_type_by_user",
+    ):
+        drop_index(conn, name)
+
+
+MIGRATIONS = [
+    Migration(1, "baseline schema", _baseline),
+    Migration(2, "workload-driven composite and partial indexes", _workload_indexes),
+]
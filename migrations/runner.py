@@ -0,0 +1,93 @@
+"""Applies the migrations of one component in version order and records them in schema_migrations.
+
+Version 1 ("baseline schema") of every component runs Base.metadata.create_all() against the
+*current* models. On a fresh database it therefore already creates the tables, columns and indexes
+that later versions add to databases made before them. So every step after the baseline must be
+idempotent: it has to check before acting (create_index/drop_index use IF [NOT] EXISTS, add_column
+and Table.create(checkfirst=True) look first), never assume the previous schema. Data
+migrations must be written to be safe to rerun as well. tests/test_schema_indexes.py runs every step
+a second time on a fresh database to hold the steps to this.
+"""
+import os
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import func
+
+MIGRATE_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("component", String(50), primary_key=True),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+def applied_versions(conn: Connection, component: str) -> set:
+    if not inspect(conn).has_table(schema_migrations.name):
+        return set()
+    rows = conn.execute(select(schema_migrations.c.version).where(schema_migrations.c.component == component))
+    return set(rows.scalars())
+
+
+def upgrade(engine: Engine, component: str, migrations: Iterable[Migration]) -> List[Migration]:
+    """Apply pending migrations of one component, each in its own transaction."""
+    applied = []
+    with engine.connect() as conn:
+        # Several workers may start at once; only one of them migrates, the rest wait and find nothing to do.
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_lock(hashtext(:key))"), {"key": f"schema_migrations:{component}"})
+        try:
+            schema_migrations.create(conn, checkfirst=True)
+            conn.commit()
+            done = applied_versions(conn, component)
+            for migration in sorted(migrations, key=lambda m: m.version):
+                if migration.version in done:
+                    continue
+                try:
+                    migration.upgrade(conn)
+                    conn.execute(schema_migrations.insert().values(
+                        component=component, version=migration.version, name=migration.name))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied.append(migration)
+        finally:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"),
+                             {"key": f"schema_migrations:{component}"})
+                conn.commit()
+    return applied
+
+
+def create_index(conn: Connection, name: str, table: str, expressions: List[str], where: Optional[str] = None,
+                 unique: bool = False):
+    sql = f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(expressions)})"
+    if where:
+        sql += f" WHERE {where}"
+    conn.execute(text(sql))
+
+
+def drop_index(conn: Connection, name: str):
+    conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def add_column(conn: Connection, table: str, name: str, ddl: str):
+    # A fresh database already has the column from the baseline's create_all.
+    if name not in {column["name"] for column in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
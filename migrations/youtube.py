@@ -0,0 +1,80 @@
+from news_monitor import models
+
+from .runner import Migration, add_column, create_index, drop_index
+
+COMPONENT = "youtube"
+
+
+def _baseline(conn):
+    models.Base.metadata.create_all(conn)
+
+
+def _drop_unused_indexes(conn):
+    for name in (
+            "ix_youtube_comments_id",  # duplicates the primary key
+            "ix_youtube_comments_topic",
+            "ix_youtube_comments_youtube_channel_title",
+    ):
+        drop_index(conn, name)
+
+
+def _video_crawl_state(conn):
+    models.VideoCrawlState.__table__.create(conn, checkfirst=True)
+
+
+def _sentiment_backlog_index(conn):
+    # The sentiment worker claims the newest pending rows; the index holds only those.
+    create_index(conn, "ix_youtube_comments_sentiment_pending", models.YoutubeComment.__tablename__, ["id"],
+                 where=models.SENTIMENT_PENDING_CONDITION)
+
+
+def _monitored_channels(conn):
+    models.MonitoredChannel.__table__.create(conn, checkfirst=True)
+
+
+def _comment_replies(conn):
+    add_column(conn, models.YoutubeComment.__tablename__, "parent_comment_id", "VARCHAR")
+
+
+def _sentiment_rollup(conn):
+    from news_monitor.rollup import rebuild_rollup
+    models.SentimentRollup.__table__.create(conn, checkfirst=True)
+    rebuild_rollup(conn)  # backfill from the comments labelled so far
+
+
+def _comment_topics(conn):
+    models.CommentTopic.__table__.create(conn, checkfirst=True)
+    add_column(conn, models.YoutubeComment.__tablename__, "topic_cluster_id", "INTEGER")
+    create_index(conn, "ix_youtube_comments_topic_pending", models.YoutubeComment.__tablename__, ["id"],
+                 where=models.TOPIC_PENDING_CONDITION)
+
+
+def _sentiment_labelled_at(conn):
+    add_column(conn, models.YoutubeComment.__tablename__, "sentiment_labelled_at", "TIMESTAMP WITH TIME ZONE")
+
+
+def _sentiment_labelled_index(conn):
+    # Serves backlog_stats' count of comments labelled within the last RATE_WINDOW.
+    create_index(conn, "ix_youtube_comments_sentiment_labelled_at", models.YoutubeComment.__tablename__,
+                 ["sentiment_labelled_at"], where=models.SENTIMENT_LABELLED_CONDITION)
+
+
+def _sentiment_retries(conn):
+    table = models.YoutubeComment.__tablename__
+    add_column(conn, table, "sentiment_attempts", "INTEGER")
+    add_column(conn, table, "sentiment_retry_at", "TIMESTAMP WITH TIME ZONE")
+
+
+MIGRATIONS = [
+    Migration(1, "baseline schema", _baseline),
+    Migration(2, "drop unused indexes", _drop_unused_indexes),
+    Migration(3, "video crawl state", _video_crawl_state),
+    Migration(4, "sentiment backlog index", _sentiment_backlog_index),
+    Migration(5, "monitored channels", _monitored_channels),
+    Migration(6, "comment replies", _comment_replies),
+    Migration(7, "sentiment rollup", _sentiment_rollup),
+    Migration(8, "comment topics", _comment_topics),
+    Migration(9, "sentiment labelled at", _sentiment_labelled_at),
+    Migration(10, "sentiment labelled at index", _sentiment_labelled_index),
+    Migration(11, "sentiment retries", _sentiment_retries),
+]
@@ -0,0 +1,191 @@
+"""Sentiment analytics over YouTube comments, for the dashboard.
+
+Every endpoint reads youtube_sentiment_daily (SentimentRollup), never youtube_comments, so a
+request costs the same whatever the number of comments; only labelled comments are counted.
+Filters follow the complaint /stats endpoints: date_from/date_to (whole days, both inclusive)
+plus optional channel, video and topic.
+
+    uvicorn news_monitor.analytics_api:app --port 8003
+"""
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, FastAPI, Query
+from pydantic import BaseModel
+from sqlalchemy import desc, func
+from sqlalchemy.orm import Session
+
+from auth.core import lifecycle, token_verifier
+from auth.core.token_verifier import VerifiedUser, get_current_active_user
+from news_monitor.database import get_db
+from news_monitor.models import CommentSentiment, SentimentRollup
+
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", 30))
+NEGATIVE_SENTIMENTS = (CommentSentiment.NEGATIVE, CommentSentiment.ANGRY, CommentSentiment.FRUSTRATED)
+
+router = APIRouter(prefix="/youtube")
+
+GROUP_COLUMNS = {
+    "channel": SentimentRollup.youtube_channel_id,
+    "video": SentimentRollup.youtube_video_id,
+    "topic": SentimentRollup.topic,
+    "day": SentimentRollup.day,
+}
+
+
+def run_migrations(app: FastAPI):
+    from migrations import migrate_on_startup
+    with lifecycle.app_session(app, get_db) as db:
+        migrate_on_startup("youtube", db.get_bind())
+
+
+def sync_auth_keys(app: FastAPI):
+    try:
+        token_verifier.sync_remote(app)
+    except Exception as e:
+        print(f"Не удалось получить ключи/отзывы токенов у сервиса авторизации: {e}")
+
+
+class SentimentDistributionItem(BaseModel):
+    key: Optional[str]
+    title: Optional[str] = None  # channel title for channels, video title for videos
+    total: int
+    by_sentiment: Dict[CommentSentiment, int]
+
+
+class NegativeVideoItem(BaseModel):
+    video_id: str
+    channel_id: str
+    channel_title: Optional[str]
+    topic: Optional[str]
+    total: int
+    negative: int
+    negative_share: float
+
+
+class SentimentTimelinePoint(BaseModel):
+    period: str
+    total: int
+    by_sentiment: Dict[CommentSentiment, int]
+
+
+def filter_rollup(query, date_from: Optional[datetime], date_to: Optional[datetime], channel_id: Optional[str],
+                  video_id: Optional[str], topic: Optional[str]):
+    if date_from:
+        query = query.filter(SentimentRollup.day >= date_from.date())
+    if date_to:
+        query = query.filter(SentimentRollup.day <= date_to.date())
+    if channel_id:
+        query = query.filter(SentimentRollup.youtube_channel_id == channel_id)
+    if video_id:
+        query = query.filter(SentimentRollup.youtube_video_id == video_id)
+    if topic:
+        query = query.filter(SentimentRollup.topic == topic)
+    return query
+
+
+@router.get("/stats/distribution", response_model=List[SentimentDistributionItem],
+            summary="Распределение тональности по каналам, видео, темам или дням")
+def get_sentiment_distribution(
+        group_by: str = Query("channel", enum=list(GROUP_COLUMNS)),
+        limit: int = Query(100, ge=1, le=1000),
+        db: Session = Depends(get_db),
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        channel_id: Optional[str] = None,
+        video_id: Optional[str] = None,
+        topic: Optional[str] = None,
+        current_user: VerifiedUser = Depends(get_current_active_user)
+):
+    column = GROUP_COLUMNS[group_by]
+    title = {"channel": SentimentRollup.youtube_channel_title, "video": SentimentRollup.topic}.get(group_by)
+    query = db.query(column.label("key"), SentimentRollup.sentiment,
+                     func.sum(SentimentRollup.comment_count).label("count"))
+    if title is not None:
+        query = query.add_columns(func.max(title).label("title"))
+    query = filter_rollup(query, date_from, date_to, channel_id, video_id, topic)
+    rows = query.group_by(column, SentimentRollup.sentiment).all()
+
+    items = {}
+    for row in rows:
+        key = row.key.isoformat() if isinstance(row.key, date) else row.key
+        item = items.setdefault(key, SentimentDistributionItem(key=key, title=getattr(row, "title", None),
+                                                               total=0, by_sentiment={}))
+        item.total += row.count
+        item.by_sentiment[row.sentiment] = row.count
+    if group_by == "day":
+        return sorted(items.values(), key=lambda item: item.key)[-limit:]
+    return sorted(items.values(), key=lambda item: item.total, reverse=True)[:limit]
+
+
+@router.get("/stats/top_negative_videos", response_model=List[NegativeVideoItem],
+            summary="Видео с наибольшей долей негативных комментариев")
+def get_top_negative_videos(
+        limit: int = Query(10, ge=1, le=100),
+        min_comments: int = Query(20, ge=1, description="Не учитывать видео с меньшим числом размеченных комментариев"),
+        db: Session = Depends(get_db),
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        channel_id: Optional[str] = None,
+        topic: Optional[str] = None,
+        current_user: VerifiedUser = Depends(get_current_active_user)
+):
+    total = func.sum(SentimentRollup.comment_count)
+    negative = func.sum(SentimentRollup.comment_count).filter(SentimentRollup.sentiment.in_(NEGATIVE_SENTIMENTS))
+    query = db.query(SentimentRollup.youtube_video_id, func.max(SentimentRollup.youtube_channel_id).label("channel_id"),
+                     func.max(SentimentRollup.youtube_channel_title).label("channel_title"),
+                     func.max(SentimentRollup.topic).label("topic"),
+                     total.label("total"), func.coalesce(negative, 0).label("negative"))
+    query = filter_rollup(query, date_from, date_to, channel_id, None, topic)
+    rows = query.group_by(SentimentRollup.youtube_video_id).having(total >= min_comments) \
+        .order_by(desc(func.coalesce(negative, 0) * 1.0 / total), desc("negative")) \
+        .limit(limit).all()
+    return [NegativeVideoItem(video_id=row.youtube_video_id, channel_id=row.channel_id,
+                              channel_title=row.channel_title, topic=row.topic, total=row.total,
+                              negative=row.negative, negative_share=round(row.negative / row.total, 4))
+            for row in rows]
+
+
+@router.get("/stats/timeline", response_model=List[SentimentTimelinePoint],
+            summary="Динамика тональности комментариев")
+def get_sentiment_timeline(
+        group_by_period: str = Query("day", enum=["day", "month", "year"],
+                                     description="Группировать по дню, месяцу или году"),
+        db: Session = Depends(get_db),
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        channel_id: Optional[str] = None,
+        video_id: Optional[str] = None,
+        topic: Optional[str] = None,
+        sentiment: Optional[CommentSentiment] = None,
+        current_user: VerifiedUser = Depends(get_current_active_user)
+):
+    query = db.query(SentimentRollup.day, SentimentRollup.sentiment,
+                     func.sum(SentimentRollup.comment_count).label("count"))
+    query = filter_rollup(query, date_from, date_to, channel_id, video_id, topic)
+    if sentiment:
+        query = query.filter(SentimentRollup.sentiment == sentiment)
+    rows = query.group_by(SentimentRollup.day, SentimentRollup.sentiment).all()
+
+    # At most one row per day and sentiment: months and years are summed here rather than with
+    # date_trunc, which SQLite does not have.
+    date_format_str = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}[group_by_period]
+    periods = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        periods[row.day.strftime(date_format_str)][row.sentiment] += row.count
+    return [SentimentTimelinePoint(period=period, total=sum(counts.values()), by_sentiment=dict(counts))
+            for period, counts in sorted(periods.items())]
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(root_path="/api", lifespan=lifecycle.lifespan(
+        [run_migrations, sync_auth_keys],
+        periodic=[(REVOCATION_SYNC_SECONDS, token_verifier.sync_remote)]))
+    app.include_router(router)
+    app.include_router(lifecycle.health_router(get_db))
+    return app
+
+
+app = create_app()
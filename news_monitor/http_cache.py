@@ -0,0 +1,270 @@
+"""HTTP cache and offline record/replay for the YouTube Data API client.
+
+youtube_monitor.execute() sends every API request through the transport build_http() returns
+(one per fetch thread, like the httplib2.Http it wraps):
+
+  - channels.list and playlistItems.list responses are reused for YOUTUBE_CACHE_CHANNEL_TTL_MINUTES
+    and YOUTUBE_CACHE_PLAYLIST_TTL_MINUTES. execute() asks is_fresh() before charging the quota,
+    so a fresh entry costs neither a request nor quota units;
+  - every other GET, and an expired entry, goes out with If-None-Match: <etag of the cached
+    response>; a 304 Not Modified is answered from the cache. The API still counts the call,
+    but the unchanged response is not sent again.
+
+Entries live in a SQLite file (YOUTUBE_HTTP_CACHE_PATH) shared by the threads and processes of
+the host, keyed on the method and the URL without the API key; entries unused for
+YOUTUBE_HTTP_CACHE_MAX_AGE_HOURS are dropped.
+
+YOUTUBE_HTTP_MODE=record also writes every response the client receives to
+YOUTUBE_HTTP_RECORDINGS (one JSON file per request, responses in the order they came, no API key).
+YOUTUBE_HTTP_MODE=replay serves them from there without opening a connection: a request gets its
+recorded responses in order, the last one repeating, and a request that was never recorded
+raises RecordingNotFound. The whole ingestion path can then run deterministically, with no API key:
+
+    YOUTUBE_HTTP_MODE=record python -m news_monitor.scheduler --once
+    YOUTUBE_HTTP_MODE=replay python -m news_monitor.scheduler --once
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+MODE = os.getenv("YOUTUBE_HTTP_MODE", "live")  # live, record or replay
+CACHE_ENABLED = os.getenv("YOUTUBE_HTTP_CACHE", "true").lower() in ("1", "true", "yes")
+CACHE_PATH = os.getenv("YOUTUBE_HTTP_CACHE_PATH", "youtube_http_cache.sqlite3")
+MAX_AGE = float(os.getenv("YOUTUBE_HTTP_CACHE_MAX_AGE_HOURS", 24 * 7)) * 3600
+RECORDINGS_DIR = os.getenv("YOUTUBE_HTTP_RECORDINGS", "youtube_recordings")
+# Seconds a response is reused without asking the API, by resource. A channel's uploads playlist never
+# changes; a new upload shows up at most YOUTUBE_CACHE_PLAYLIST_TTL_MINUTES late.
+TTL = {
+    "channels": float(os.getenv("YOUTUBE_CACHE_CHANNEL_TTL_MINUTES", 24 * 60)) * 60,
+    "playlistItems": float(os.getenv("YOUTUBE_CACHE_PLAYLIST_TTL_MINUTES", 30)) * 60,
+}
+PRUNE_EVERY = 1000  # puts between clean-ups
+KEPT_HEADERS = ("content-type", "etag")
+
+
+class RecordingNotFound(LookupError):
+    pass
+
+
+def request_key(method: str, uri: str) -> str:
+    """Method and URL with the query sorted and the API key left out."""
+    parts = urlsplit(uri)
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if name != "key")
+    return f"{method} {urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))}"
+
+
+def is_fresh(http, uri: str, method: str = "GET") -> bool:
+    """Whether `http` will answer without a request (False for a plain httplib2.Http)."""
+    check = getattr(http, "is_fresh", None)
+    return bool(check and check(uri, method))
+
+
+def resource_of(uri: str) -> str:
+    return urlsplit(uri).path.rstrip("/").rsplit("/", 1)[-1]
+
+
+def make_response(status: int, headers: dict, content: bytes):
+    import httplib2
+    return httplib2.Response({**headers, "status": str(status)}), content
+
+
+class ResponseCache:
+    def __init__(self, path: str = CACHE_PATH, max_age: float = MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.counts = Counter()  # fresh: served without a request, not_modified: 304, stored: full responses
+        self._conn = None
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS http_cache (key TEXT PRIMARY KEY, status INTEGER NOT NULL, "
+                         "headers TEXT NOT NULL, content BLOB NOT NULL, etag TEXT, fetched_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_http_cache_fetched_at ON http_cache (fetched_at)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str):
+        """(status, headers, content, etag, fetched_at) or None."""
+        with self._lock:
+            row = self._connection().execute("SELECT status, headers, content, etag, fetched_at FROM http_cache "
+                                             "WHERE key = ?", [key]).fetchone()
+        if row is None:
+            return None
+        status, headers, content, etag, fetched_at = row
+        return status, json.loads(headers), bytes(content), etag, fetched_at
+
+    def is_fresh(self, key: str, ttl: float) -> bool:
+        with self._lock:
+            row = self._connection().execute("SELECT 1 FROM http_cache WHERE key = ? AND fetched_at > ?",
+                                             [key, time.time() - ttl]).fetchone()
+        return row is not None
+
+    def put(self, key: str, status: int, headers: dict, content: bytes):
+        headers = {name: headers[name] for name in KEPT_HEADERS if name in headers}
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT INTO http_cache (key, status, headers, content, etag, fetched_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET status = excluded.status, "
+                         "headers = excluded.headers, content = excluded.content, etag = excluded.etag, "
+                         "fetched_at = excluded.fetched_at",
+                         [key, status, json.dumps(headers), content, headers.get("etag"), time.time()])
+            self._puts += 1
+            if self._puts >= PRUNE_EVERY:
+                self._puts = 0
+                conn.execute("DELETE FROM http_cache WHERE fetched_at <= ?", [time.time() - self.max_age])
+
+    def touch(self, key: str):
+        """The API confirmed the entry (304): it is fresh again."""
+        with self._lock:
+            self._connection().execute("UPDATE http_cache SET fetched_at = ? WHERE key = ?", [time.time(), key])
+
+    def count(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self.counts)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachingHttp:
+    """Stands in for httplib2.Http: serves fresh entries and revalidates the rest with their ETag."""
+
+    def __init__(self, http, cache: ResponseCache, run_counts=None):
+        self.http = http
+        self.cache = cache
+        self.run_counts = run_counts  # also told every outcome, through its count(outcome)
+
+    def _count(self, outcome: str):
+        self.cache.count(outcome)
+        if self.run_counts is not None:
+            self.run_counts.count(outcome)
+
+    def is_fresh(self, uri: str, method: str = "GET") -> bool:
+        ttl = TTL.get(resource_of(uri), 0)
+        return method == "GET" and ttl > 0 and self.cache.is_fresh(request_key(method, uri), ttl)
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        if method != "GET":
+            return self.http.request(uri, method, body=body, headers=headers, **kwargs)
+        key = request_key(method, uri)
+        entry = self.cache.get(key)
+        if entry is not None:
+            status, cached_headers, cached_content, etag, fetched_at = entry
+            if time.time() - fetched_at < TTL.get(resource_of(uri), 0):
+                self._count("fresh")
+                return make_response(status, cached_headers, cached_content)
+            if etag:
+                headers = {**(headers or {}), "if-none-match": etag}
+        resp, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+        if resp.status == 304 and entry is not None:
+            self.cache.touch(key)
+            self._count("not_modified")
+            return make_response(status, cached_headers, cached_content)
+        if resp.status == 200:
+            self.cache.put(key, resp.status, resp, content)
+            self._count("stored")
+        return resp, content
+
+
+class Recordings:
+    """Recorded responses on disk, one JSON file per request key."""
+
+    def __init__(self, directory: str = RECORDINGS_DIR):
+        self.directory = directory
+        self._loaded = {}  # key -> responses
+        self._served = Counter()
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest()[:24] + ".json")
+
+    def _load(self, key: str) -> list:
+        if key not in self._loaded:
+            try:
+                with open(self.path(key), encoding="utf-8") as f:
+                    self._loaded[key] = json.load(f)["responses"]
+            except FileNotFoundError:
+                self._loaded[key] = []
+        return self._loaded[key]
+
+    def append(self, key: str, status: int, headers: dict, content: bytes):
+        response = {"status": status, "headers": {name: headers[name] for name in KEPT_HEADERS if name in headers},
+                    "body": content.decode("utf-8")}
+        with self._lock:
+            responses = self._load(key)
+            responses.append(response)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(key), "w", encoding="utf-8") as f:
+                json.dump({"request": key, "responses": responses}, f, ensure_ascii=False, indent=1)
+
+    def next(self, key: str):
+        with self._lock:
+            responses = self._load(key)
+            if not responses:
+                raise RecordingNotFound(f"Нет записанного ответа для {key} в {self.directory}")
+            response = responses[min(self._served[key], len(responses) - 1)]
+            self._served[key] += 1
+        return make_response(response["status"], response["headers"], response["body"].encode("utf-8"))
+
+
+class RecordingHttp:
+    """Passes requests on and writes down every response the client gets back."""
+
+    def __init__(self, http, recordings: Recordings):
+        self.http = http
+        self.recordings = recordings
+
+    def is_fresh(self, uri: str, method: str = "GET") -> bool:
+        return is_fresh(self.http, uri, method)
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        resp, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+        self.recordings.append(request_key(method, uri), resp.status, resp, content)
+        return resp, content
+
+
+class ReplayHttp:
+    """Answers from the recordings only; never opens a connection."""
+
+    def __init__(self, recordings: Recordings):
+        self.recordings = recordings
+
+    def is_fresh(self, uri: str, method: str = "GET") -> bool:
+        return False  # replayed calls are charged like live ones
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        return self.recordings.next(request_key(method, uri))
+
+
+youtube_http_cache = ResponseCache()
+recordings = Recordings()
+
+
+def build_http(mode: str = None, run_counts=None):
+    """The transport of one fetch thread, for YOUTUBE_HTTP_MODE; `run_counts` gets the cache outcomes too."""
+    mode = mode or MODE
+    if mode == "replay":
+        return ReplayHttp(recordings)
+    from googleapiclient.http import build_http as build_transport
+    http = build_transport()
+    if CACHE_ENABLED:
+        http = CachingHttp(http, youtube_http_cache, run_counts)
+    if mode == "record":
+        http = RecordingHttp(http, recordings)
+    return http
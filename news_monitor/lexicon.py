@@ -0,0 +1,197 @@
+"""CPU-only sentiment for short, formulaic comments ("Спасибо!", "позор", "👍👍"), ahead of the LLM.
+
+Comments are normalized like the sentiment cache keys, split into words and emoji, and every
+token is mapped to an id in a small Russian/Kyrgyz lexicon (by word stem) or to 0. A batch is then
+scored with NumPy: one gather of the (tokens x labels) weight rows and one np.add.reduceat per
+comment. A comment gets a label only if
+  - every lexicon hit agrees on it (purity) and hits make up most of the comment (coverage):
+    purity * coverage >= SENTIMENT_LEXICON_THRESHOLD;
+  - it has at most SENTIMENT_LEXICON_MAX_TOKENS words besides filler ("очень", "вам", ...);
+  - there is no negation or contrast ("не", "но", "эмес", ...);
+everything else goes to the model. How well this matches the labels already stored:
+
+    python -m news_monitor.lexicon --report --limit 20000
+"""
+import argparse
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from news_monitor.models import CommentSentiment
+from news_monitor.sentiment_cache import normalize
+
+LEXICON_ENABLED = os.getenv("SENTIMENT_LEXICON", "true").lower() in ("1", "true", "yes")
+THRESHOLD = float(os.getenv("SENTIMENT_LEXICON_THRESHOLD", 0.8))
+MAX_TOKENS = int(os.getenv("SENTIMENT_LEXICON_MAX_TOKENS", 6))
+MIN_STEM = 4  # shorter entries only match whole words
+
+# Stems (normalized: lower case, ё -> е); a word matches its longest stem of at least MIN_STEM letters.
+LEXICON = {
+    CommentSentiment.GRATEFUL: ["спасиб", "спс", "благодар", "рахмат", "ыраазы", "алкыш"],
+    CommentSentiment.POSITIVE: ["молодц", "молодчин", "отличн", "супер", "класс", "хорош", "красав", "браво",
+                                "прекрасн", "умниц", "лучш", "круто", "жакшы", "азамат", "сонун", "мыкты"],
+    CommentSentiment.EXCITED: ["ура", "вау", "восторг", "обожа", "шедевр", "офигенн"],
+    CommentSentiment.NEGATIVE: ["позор", "ужас", "плох", "отстой", "бред", "кошмар", "стыд", "отврат", "бездар",
+                                "жаман", "уят", "уятсыз"],
+    CommentSentiment.ANGRY: ["ненави", "бесит", "достали", "воры", "ворюг", "бандит", "сволоч"],
+    CommentSentiment.SAD: ["жаль", "грустн", "печальн", "соболезн", "скорбим", "кайгы", "тилектеш", "капа"],
+}
+EMOJI = {
+    CommentSentiment.POSITIVE: "👍👏❤💯🥰😊☺🤗✅",
+    CommentSentiment.EXCITED: "😍🔥🎉🤩💪",
+    CommentSentiment.GRATEFUL: "🙏",
+    CommentSentiment.NEGATIVE: "👎💩🤮🤦",
+    CommentSentiment.ANGRY: "😡🤬😠",
+    CommentSentiment.SAD: "😢😭💔😔😞",
+}
+# Not counted as words; they neither help nor hurt coverage.
+FILLER = {"очень", "вам", "вас", "всем", "за", "и", "это", "так", "просто", "большое", "огромное", "как", "же",
+          "вы", "ты", "тебе", "всех", "чоң", "абдан", "баарына", "сизге", "сага", "бардыгына", "көп", "эле"}
+# Turn the meaning of the rest around; such comments are left to the model.
+NEGATION = {"не", "нет", "ни", "но", "зато", "хотя", "жок", "эмес", "бирок"}
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_REPEATED_LETTER = re.compile(r"(\w)\1{2,}")
+_SKIN_TONE = re.compile("[\U0001F3FB-\U0001F3FF]")
+
+
+class LexiconScorer:
+    def __init__(self, lexicon=LEXICON, emoji=EMOJI, threshold: float = THRESHOLD, max_tokens: int = MAX_TOKENS):
+        self.threshold = threshold
+        self.max_tokens = max_tokens
+        self.labels = list(lexicon)
+        # Token ids: 0 unknown, 1 filler, 2 negation, then one per lexicon entry.
+        self.entries = {}
+        rows = [np.zeros(len(self.labels)), np.zeros(len(self.labels)), np.zeros(len(self.labels))]
+        for label_index, label in enumerate(self.labels):
+            for entry in list(lexicon[label]) + list(emoji.get(label, "")):
+                self.entries[entry] = len(rows)
+                row = np.zeros(len(self.labels))
+                row[label_index] = 1.0
+                rows.append(row)
+        self.weights = np.vstack(rows).astype(np.float32)
+        self.is_content = np.ones(len(rows), dtype=np.int32)
+        self.is_content[1] = 0
+        self.is_negation = np.zeros(len(rows), dtype=np.int32)
+        self.is_negation[2] = 1
+        self._ids = {}
+        self.scored = 0
+        self.labelled = 0
+
+    def token_id(self, token: str) -> int:
+        token_id = self._ids.get(token)
+        if token_id is None:
+            if token in FILLER:
+                token_id = 1
+            elif token in NEGATION:
+                token_id = 2
+            else:
+                token_id = self.entries.get(token, 0)
+                for end in range(len(token) - 1, MIN_STEM - 1, -1):
+                    if token_id:
+                        break
+                    token_id = self.entries.get(token[:end], 0)
+            if len(self._ids) > 200000:
+                self._ids.clear()
+            self._ids[token] = token_id
+        return token_id
+
+    def encode(self, texts):
+        """Flat token-id array and the offset of every comment in it (each comment has at least one token)."""
+        ids, offsets = [], []
+        for text in texts:
+            offsets.append(len(ids))
+            text = _SKIN_TONE.sub("", normalize(text))
+            tokens = [_REPEATED_LETTER.sub(r"\1", token) for token in _TOKEN.findall(text)]
+            ids += [self.token_id(token) for token in tokens] or [0]
+        return np.array(ids, dtype=np.int32), np.array(offsets, dtype=np.int64)
+
+    def score(self, texts):
+        """(label or None, confidence) for every text."""
+        if not texts:
+            return [], np.zeros(0)
+        ids, offsets = self.encode(texts)
+        scores = np.add.reduceat(self.weights[ids], offsets, axis=0)
+        content = np.add.reduceat(self.is_content[ids], offsets)
+        negated = np.add.reduceat(self.is_negation[ids], offsets) > 0
+        matched = scores.sum(axis=1)
+        purity = scores.max(axis=1) / np.maximum(matched, 1)
+        coverage = matched / np.maximum(content, 1)
+        confidence = np.where(negated | (content > self.max_tokens), 0.0, purity * coverage)
+        best = scores.argmax(axis=1)
+        labels = [self.labels[index] if ok else None
+                  for index, ok in zip(best, (confidence >= self.threshold) & (matched > 0))]
+        self.scored += len(texts)
+        self.labelled += sum(label is not None for label in labels)
+        return labels, confidence
+
+
+lexicon_scorer = LexiconScorer()
+
+
+def agreement_report(pairs, scorer: LexiconScorer = None, batch_size: int = 5000) -> dict:
+    """Compare the scorer with stored labels, given (comment text, CommentSentiment) pairs."""
+    scorer = scorer or LexiconScorer()
+    total = labelled = agreed = 0
+    confusion = Counter()  # (stored, lexicon) for labelled comments
+    batch = []
+
+    def flush():
+        nonlocal total, labelled, agreed
+        labels, _ = scorer.score([text for text, _ in batch])
+        for (_, stored), label in zip(batch, labels):
+            total += 1
+            if label is not None:
+                labelled += 1
+                agreed += label == stored
+                confusion[stored, label] += 1
+        batch.clear()
+
+    for pair in pairs:
+        batch.append(pair)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return {"total": total, "labelled": labelled, "agreed": agreed,
+            "coverage": labelled / total if total else 0.0,
+            "agreement": agreed / labelled if labelled else 0.0,
+            "confusion": confusion}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Словарная разметка тональности: сверка с сохранёнными метками.")
+    parser.add_argument("--report", action="store_true")
+    parser.add_argument("--limit", type=int, default=None, help="сколько последних размеченных комментариев взять")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+    if not args.report:
+        parser.print_help()
+        return
+
+    from sqlalchemy import select
+    from news_monitor.database import SessionLocal
+    from news_monitor.models import YoutubeComment
+
+    stmt = (select(YoutubeComment.comment_text, YoutubeComment.sentiment)
+            .where(YoutubeComment.sentiment.is_not(None), YoutubeComment.sentiment != CommentSentiment.UNKNOWN)
+            .order_by(YoutubeComment.id.desc()).limit(args.limit).execution_options(yield_per=5000))
+    with SessionLocal() as db:
+        report = agreement_report(((row.comment_text, row.sentiment) for row in db.execute(stmt)),
+                                  LexiconScorer(threshold=args.threshold))
+    print(f"Комментариев: {report['total']}, размечено словарём: {report['labelled']} ({report['coverage']:.1%}), "
+          f"совпало с сохранённой меткой: {report['agreed']} ({report['agreement']:.1%})")
+    by_label = Counter()
+    for (stored, label), count in report["confusion"].items():
+        by_label[label] += count
+    for label, count in by_label.most_common():
+        agreed = report["confusion"][label, label]
+        misses = ", ".join(f"{stored.value} {n}" for (stored, lexicon_label), n in report["confusion"].most_common()
+                           if lexicon_label == label and stored != label)
+        print(f"  {label.value:<15} {count:>7}  точность {agreed / count:.1%}" + (f"  (на самом деле: {misses})" if misses else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 # news_monitor/models.py
 import enum
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum as DBEnum
+from sqlalchemy import (Boolean, Column, Date, Float, Index, Integer, LargeBinary, String, Text, DateTime,
+                        Enum as DBEnum, text)
 from sqlalchemy.sql import func
-from database import Base
+from news_monitor.database import Base
 
 
 class CommentSentiment(str, enum.Enum):
@@ -19,22 +20,112 @@ class CommentSentiment(str, enum.Enum):
     UNKNOWN = "НЕОПРЕДЕЛЕНО"
 
 
+# Comments are stored before they are classified; NULL sentiment means "waiting for the sentiment
+# worker". Served by a partial index, so the worker filters with this exact condition.
+SENTIMENT_PENDING_CONDITION = "sentiment IS NULL"
+# Same for the topic clustering job (news_monitor/topics.py).
+TOPIC_PENDING_CONDITION = "topic_cluster_id IS NULL"
+# Labelled comments, by when; the sentiment worker's "labelled per minute" reads the recent end.
+SENTIMENT_LABELLED_CONDITION = "sentiment_labelled_at IS NOT NULL"
+
+
 class YoutubeComment(Base):
     __tablename__ = "youtube_comments"
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     youtube_username = Column(String, nullable=False, index=True)
     comment_text = Column(Text, nullable=False)
     opinion_text = Column(Text, nullable=True)
-    topic = Column(String, nullable=True, index=True)
+    topic = Column(String, nullable=True)
     youtube_comment_id = Column(String, nullable=False, unique=True, index=True)
+    parent_comment_id = Column(String, nullable=True)  # the top-level comment, for replies
     youtube_video_id = Column(String, nullable=True, index=True)
     youtube_channel_id = Column(String, nullable=True, index=True)
-    youtube_channel_title = Column(String, nullable=True, index=True)
+    youtube_channel_title = Column(String, nullable=True)
     comment_published_at = Column(DateTime(timezone=True), nullable=True)
-    sentiment = Column(DBEnum(CommentSentiment), default=CommentSentiment.UNKNOWN, nullable=True, index=True)
+    sentiment = Column(DBEnum(CommentSentiment), nullable=True, index=True)
+    topic_cluster_id = Column(Integer, nullable=True)  # CommentTopic.id, -1 for comments without usable words
+    # Set by the sentiment worker only; updated_at also moves for topic assignment and other bulk updates.
+    sentiment_labelled_at = Column(DateTime(timezone=True), nullable=True)
+    # Model calls that gave no usable label; the row stays pending and is not claimed before retry_at.
+    sentiment_attempts = Column(Integer, nullable=True)
+    sentiment_retry_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Mirrors migrations/youtube.py.
+    __table_args__ = (
+        Index("ix_youtube_comments_sentiment_pending", id,
+              postgresql_where=text(SENTIMENT_PENDING_CONDITION), sqlite_where=text(SENTIMENT_PENDING_CONDITION)),
+        Index("ix_youtube_comments_topic_pending", id,
+              postgresql_where=text(TOPIC_PENDING_CONDITION), sqlite_where=text(TOPIC_PENDING_CONDITION)),
+        Index("ix_youtube_comments_sentiment_labelled_at", sentiment_labelled_at,
+              postgresql_where=text(SENTIMENT_LABELLED_CONDITION), sqlite_where=text(SENTIMENT_LABELLED_CONDITION)),
+    )
+
     def __repr__(self):
-        return f"<YoutubeComment id={self.id} channel='{self.youtube_channel_title}' video_id='{self.youtube_video_id}' comment_id='{self.youtube_comment_id}'>"
\ No newline at end of file
+        return f"<YoutubeComment id={self.id} channel='{self.youtube_channel_title}' video_id='{self.youtube_video_id}' comment_id='{self.youtube_comment_id}'>"
+
+
+class VideoCrawlState(Base):
+    """Where the incremental comment crawl of one video stopped."""
+    __tablename__ = "youtube_video_crawl_state"
+
+    youtube_video_id = Column(String, primary_key=True)
+    youtube_channel_id = Column(String, nullable=True)
+    video_published_at = Column(DateTime(timezone=True), nullable=True)
+    # Newest comment seen so far; the next crawl (order=time) stops when it reaches it.
+    last_comment_published_at = Column(DateTime(timezone=True), nullable=True)
+    last_comment_id = Column(String, nullable=True)
+    # statistics.commentCount at the last crawl: unchanged means nothing to fetch.
+    comment_count = Column(Integer, nullable=True)
+    last_crawled_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class MonitoredChannel(Base):
+    """A channel the monitor polls, and when it is due next (see news_monitor/scheduler.py)."""
+    __tablename__ = "youtube_channels"
+
+    youtube_channel_id = Column(String, primary_key=True)
+    title = Column(String, nullable=True)
+    is_active = Column(Boolean, nullable=False, default=True)
+    # Adapted after every run: shorter for channels that keep getting comments, longer for quiet ones.
+    interval_minutes = Column(Float, nullable=False)
+    next_run_at = Column(DateTime(timezone=True), nullable=True)
+    last_run_at = Column(DateTime(timezone=True), nullable=True)
+    last_new_comments = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class SentimentRollup(Base):
+    """Labelled comments per day, channel, video and sentiment, for the analytics API.
+
+    Updated by the sentiment worker in the same transaction as the labels (news_monitor/rollup.py).
+    Comments without a channel or video id are counted under "".
+    """
+    __tablename__ = "youtube_sentiment_daily"
+
+    day = Column(Date, primary_key=True)  # UTC date the comment was published
+    youtube_channel_id = Column(String, primary_key=True)
+    youtube_video_id = Column(String, primary_key=True)
+    sentiment = Column(DBEnum(CommentSentiment), primary_key=True)
+    youtube_channel_title = Column(String, nullable=True)
+    topic = Column(String, nullable=True)
+    comment_count = Column(Integer, nullable=False, default=0)
+
+    # Mirrors migrations/youtube.py; the primary key serves the plain date range.
+    __table_args__ = (
+        Index("ix_youtube_sentiment_daily_channel_day", youtube_channel_id, day),
+        Index("ix_youtube_sentiment_daily_video_day", youtube_video_id, day),
+    )
+
+
+class CommentTopic(Base):
+    """One cluster of the comment topic model (news_monitor/topics.py); id is the cluster index."""
+    __tablename__ = "youtube_comment_topics"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    centroid = Column(LargeBinary, nullable=False)  # float32, unit length, over the hashed n-gram features
+    top_terms = Column(Text, nullable=True)  # comma-separated, most characteristic first
+    comment_count = Column(Integer, nullable=False, default=0)  # comments assigned so far
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,111 @@
+"""YouTube Data API quota accounting shared by all fetch threads.
+
+Every call is charged its quota cost before it is sent. A token bucket (YOUTUBE_QUOTA_UNITS_PER_SECOND,
+YOUTUBE_QUOTA_BURST) keeps the fan-out from bursting, and the daily budget (YOUTUBE_DAILY_QUOTA minus
+YOUTUBE_QUOTA_RESERVE) makes acquire() raise QuotaExhausted instead of letting the API start failing.
+The budget resets at midnight Pacific time, like YouTube's own counter. Spending is only known to
+this process, so after a restart a quotaExceeded answer from the API closes the budget as well.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+# https://developers.google.com/youtube/v3/determine_quota_cost
+QUOTA_COSTS = {
+    "channels.list": 1,
+    "playlistItems.list": 1,
+    "videos.list": 1,
+    "commentThreads.list": 1,
+    "comments.list": 1,
+    "search.list": 100,
+}
+
+DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", 10000))
+QUOTA_RESERVE = int(os.getenv("YOUTUBE_QUOTA_RESERVE", 200))
+UNITS_PER_SECOND = float(os.getenv("YOUTUBE_QUOTA_UNITS_PER_SECOND", 20))
+BURST = float(os.getenv("YOUTUBE_QUOTA_BURST", 40))
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+
+class QuotaExhausted(Exception):
+    pass
+
+
+def quota_day() -> date:
+    return datetime.now(QUOTA_TIMEZONE).date()
+
+
+class QuotaLimiter:
+    def __init__(self, daily_quota: int = DAILY_QUOTA, reserve: int = QUOTA_RESERVE,
+                 units_per_second: float = UNITS_PER_SECOND, burst: float = BURST, today=quota_day):
+        self.daily_quota = daily_quota
+        self.reserve = reserve
+        self.rate = units_per_second
+        self.capacity = burst
+        self.today = today
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._day = today()
+        self._exhausted = False
+        self.spent = Counter()  # units per call type, current quota day
+        self._lock = threading.Lock()
+
+    @property
+    def spent_total(self) -> int:
+        return sum(self.spent.values())
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            self._roll_day()
+            return 0 if self._exhausted else max(0, self.daily_quota - self.reserve - self.spent_total)
+
+    def _roll_day(self):
+        day = self.today()
+        if day != self._day:
+            self._day, self._exhausted = day, False
+            self.spent.clear()
+
+    def acquire(self, call_type: str):
+        """Charge one call of `call_type`, waiting for the bucket; returns the units charged, raises QuotaExhausted."""
+        cost = QUOTA_COSTS.get(call_type, 1)
+        while True:
+            with self._lock:
+                self._roll_day()
+                if self._exhausted or self.spent_total + cost > self.daily_quota - self.reserve:
+                    self._exhausted = True
+                    raise QuotaExhausted(f"дневная квота YouTube API исчерпана ({self.spent_total} ед.)")
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # A call dearer than the whole bucket (search.list) goes out once it is full.
+                if self._tokens >= min(cost, self.capacity):
+                    self._tokens -= cost
+                    self.spent[call_type] += cost
+                    return cost
+                wait = (min(cost, self.capacity) - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def share(self, parts: int):
+        """Keep 1/parts of the budget and rate, for one of `parts` processes spending the same API key."""
+        with self._lock:
+            self.daily_quota //= parts
+            self.reserve //= parts
+            self.rate /= parts
+            self.capacity = max(1.0, self.capacity / parts)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def exhaust(self):
+        """The API said quotaExceeded: nothing more today, whatever our own count says."""
+        with self._lock:
+            self._exhausted = True
+
+    def snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self.spent)
+
+
+youtube_quota = QuotaLimiter()
@@ -0,0 +1,98 @@
+"""Keeps youtube_sentiment_daily (SentimentRollup) in step with the labelled comments.
+
+add_to_rollup() is called by the sentiment worker for every batch it labels, so the rollup only
+ever grows by the rows that just left the pending state. rebuild_rollup() recomputes it from
+youtube_comments, for the backfill in migrations/youtube.py or after fixing labels by hand:
+
+    python -m news_monitor.rollup --rebuild
+"""
+import argparse
+from collections import Counter
+from datetime import timezone
+
+from sqlalchemy import Date, cast, delete, func, select, text
+
+from news_monitor.models import SentimentRollup, YoutubeComment
+
+ROLLUP = SentimentRollup.__table__
+KEY = ["day", "youtube_channel_id", "youtube_video_id", "sentiment"]
+
+
+def comment_day(published_at, created_at):
+    value = published_at or created_at
+    # SQLite hands timestamps back without tzinfo; they are UTC.
+    return (value.astimezone(timezone.utc) if value.tzinfo else value).date()
+
+
+def _upsert(dialect_name):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(ROLLUP)
+    return stmt.on_conflict_do_update(index_elements=KEY, set_={
+        "comment_count": ROLLUP.c.comment_count + stmt.excluded.comment_count,
+        "youtube_channel_title": stmt.excluded.youtube_channel_title,
+        "topic": stmt.excluded.topic,
+    })
+
+
+def add_to_rollup(db, labelled) -> int:
+    """Count (comment row, CommentSentiment) pairs into the rollup; returns the number of rollup rows touched.
+
+    A comment row needs youtube_channel_id, youtube_video_id, youtube_channel_title, topic,
+    comment_published_at and created_at.
+    """
+    counts, names = Counter(), {}
+    for row, sentiment in labelled:
+        key = (comment_day(row.comment_published_at, row.created_at), row.youtube_channel_id or "",
+               row.youtube_video_id or "", sentiment)
+        counts[key] += 1
+        names[key] = row.youtube_channel_title, row.topic
+    # In key order: workers upserting overlapping keys in different orders could deadlock on PostgreSQL.
+    rows = [dict(zip(KEY, key), youtube_channel_title=names[key][0], topic=names[key][1], comment_count=count)
+            for key, count in sorted(counts.items())]
+    if rows:
+        db.execute(_upsert(db.get_bind().dialect.name), rows)
+    return len(rows)
+
+
+def day_expression(dialect_name):
+    published = func.coalesce(YoutubeComment.comment_published_at, YoutubeComment.created_at)
+    if dialect_name == "postgresql":
+        return cast(func.timezone("UTC", published), Date)
+    return func.date(published)
+
+
+def rebuild_rollup(conn):
+    """Replace the rollup with counts computed from youtube_comments (one GROUP BY)."""
+    day = day_expression(conn.dialect.name)
+    channel_id = func.coalesce(YoutubeComment.youtube_channel_id, "")
+    video_id = func.coalesce(YoutubeComment.youtube_video_id, "")
+    counts = (select(day, channel_id, video_id, YoutubeComment.sentiment,
+                     func.max(YoutubeComment.youtube_channel_title), func.max(YoutubeComment.topic),
+                     func.count(YoutubeComment.id))
+              .where(YoutubeComment.sentiment.is_not(None))
+              # By position: PostgreSQL would not match the bound '' and 'UTC' of a repeated expression.
+              .group_by(text("1, 2, 3, 4")))
+    conn.execute(delete(ROLLUP))
+    conn.execute(ROLLUP.insert().from_select(
+        KEY + ["youtube_channel_title", "topic", "comment_count"], counts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сводная таблица тональности комментариев YouTube.")
+    parser.add_argument("--rebuild", action="store_true", help="пересчитать сводку по youtube_comments")
+    args = parser.parse_args(argv)
+    if args.rebuild:
+        from news_monitor.database import engine
+        with engine.begin() as conn:
+            rebuild_rollup(conn)
+            rows = conn.scalar(select(func.count()).select_from(ROLLUP))
+        print(f"Сводка тональности пересчитана: {rows} строк.")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Runs the YouTube monitor as per-channel jobs, sharded across processes.
+
+Channels live in the youtube_channels table (MonitoredChannel); CHANNEL_IDS from the configuration
+are added to it on start, and more can be inserted by hand. Every channel has its own interval:
+halved after a run that brought at least BUSY_NEW_COMMENTS new comments, doubled after a run that
+brought none, kept within MIN/MAX_INTERVAL_MINUTES, with +-JITTER so channels do not fire together.
+
+Each process takes the channels of its shard (crc32 of the channel id modulo YOUTUBE_SHARD_COUNT)
+and runs up to CHANNEL_JOBS of them at once. A job holds a PostgreSQL advisory lock on its channel,
+so a misconfigured shard or a slow run never crawls the same channel twice at the same time. The
+daily quota is split evenly between the shards, since they all spend the same API key.
+
+    python -m news_monitor.scheduler --shard 0 --shards 2
+"""
+import argparse
+import os
+import random
+import threading
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, text
+
+from news_monitor import youtube_monitor
+from news_monitor.database import SessionLocal
+from news_monitor.models import MonitoredChannel
+from news_monitor.quota import youtube_quota
+
+SHARD_INDEX = int(os.getenv("YOUTUBE_SHARD_INDEX", 0))
+SHARD_COUNT = int(os.getenv("YOUTUBE_SHARD_COUNT", 1))
+CHANNEL_JOBS = int(os.getenv("YOUTUBE_CHANNEL_JOBS", 4))
+MIN_INTERVAL_MINUTES = float(os.getenv("YOUTUBE_MIN_INTERVAL_MINUTES", 15))
+MAX_INTERVAL_MINUTES = float(os.getenv("YOUTUBE_MAX_INTERVAL_MINUTES", 24 * 60))
+BUSY_NEW_COMMENTS = int(os.getenv("YOUTUBE_BUSY_CHANNEL_COMMENTS", 50))
+JITTER = float(os.getenv("YOUTUBE_SCHEDULE_JITTER", 0.1))
+TICK_SECONDS = 10
+
+
+def shard_of(channel_id: str, shard_count: int) -> int:
+    # crc32 rather than hash(): the same on every host and across restarts.
+    return zlib.crc32(channel_id.encode()) % shard_count
+
+
+def next_interval(interval_minutes: float, new_comments: int) -> float:
+    if new_comments >= BUSY_NEW_COMMENTS:
+        interval_minutes /= 2
+    elif new_comments == 0:
+        interval_minutes *= 2
+    return min(MAX_INTERVAL_MINUTES, max(MIN_INTERVAL_MINUTES, interval_minutes))
+
+
+def with_jitter(interval_minutes: float, rng=random) -> timedelta:
+    return timedelta(minutes=interval_minutes * (1 + rng.uniform(-JITTER, JITTER)))
+
+
+def sync_channels(db, channel_ids) -> int:
+    """Add configured channels missing from the table, due at once; returns how many were added."""
+    known = set(db.scalars(select(MonitoredChannel.youtube_channel_id)))
+    added = [channel_id for channel_id in dict.fromkeys(channel_ids) if channel_id not in known]
+    db.add_all(MonitoredChannel(youtube_channel_id=channel_id, interval_minutes=youtube_monitor.RUN_EVERY_MINUTES)
+               for channel_id in added)
+    db.commit()
+    return len(added)
+
+
+def due_channels(db, now, shard_index: int = SHARD_INDEX, shard_count: int = SHARD_COUNT) -> list:
+    channel_ids = db.scalars(select(MonitoredChannel.youtube_channel_id)
+                             .where(MonitoredChannel.is_active.is_(True),
+                                    (MonitoredChannel.next_run_at.is_(None)) | (MonitoredChannel.next_run_at <= now))
+                             .order_by(MonitoredChannel.next_run_at.nulls_first()))
+    return [channel_id for channel_id in channel_ids if shard_of(channel_id, shard_count) == shard_index]
+
+
+@contextmanager
+def channel_lock(engine, channel_id: str):
+    """Yields whether this process may crawl the channel now (a session-level advisory lock on PostgreSQL)."""
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    key = f"youtube_channel:{channel_id}"
+    with engine.connect() as conn:
+        locked = conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": key}).scalar()
+        conn.commit()
+        try:
+            yield locked
+        finally:
+            if locked:
+                conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": key})
+                conn.commit()
+
+
+class ChannelScheduler:
+    def __init__(self, session_factory=SessionLocal, shard_index: int = SHARD_INDEX, shard_count: int = SHARD_COUNT,
+                 jobs: int = CHANNEL_JOBS, youtube=None, rng=random):
+        self.session_factory = session_factory
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.jobs = jobs
+        self.youtube = youtube
+        self.rng = rng
+        self.stopping = threading.Event()
+        self._engine = session_factory.kw["bind"]
+
+    def due(self) -> list:
+        with self.session_factory() as db:
+            return due_channels(db, datetime.now(timezone.utc), self.shard_index, self.shard_count)
+
+    def run_channel(self, channel_id: str):
+        """One monitoring cycle for one channel, then reschedule it; None if it was not ours to run."""
+        with channel_lock(self._engine, channel_id) as locked:
+            if not locked:
+                return None
+            with self.session_factory() as db:
+                channel = db.get(MonitoredChannel, channel_id)
+                started = datetime.now(timezone.utc)
+                # Another process may have run it between our due() and taking the lock.
+                if channel is None or not channel.is_active or \
+                        (channel.next_run_at and youtube_monitor._as_utc(channel.next_run_at) > started):
+                    return None
+
+            # The fetch threads are shared out between the channels running at once.
+            stats = youtube_monitor.process_new_youtube_data(
+                self.youtube, workers=max(1, youtube_monitor.FETCH_WORKERS // self.jobs), channel_ids=[channel_id])
+
+            with self.session_factory() as db:
+                channel = db.get(MonitoredChannel, channel_id)
+                if stats.quota_exhausted:
+                    interval = channel.interval_minutes  # the run was cut short and says nothing about activity
+                else:
+                    interval = next_interval(channel.interval_minutes, stats.new_comments)
+                channel.interval_minutes = interval
+                channel.last_run_at = started
+                channel.last_new_comments = stats.new_comments
+                channel.next_run_at = started + with_jitter(interval, self.rng)
+                title = youtube_monitor.CHANNEL_PLAYLIST_CACHE.get(channel_id, (None, None))[1]
+                if title:
+                    channel.title = title
+                db.commit()
+                print(f"Канал {channel_id}: новых комментариев {stats.new_comments}, "
+                      f"следующий запуск через ~{interval:.0f} мин.")
+        return stats
+
+    def run_pending(self) -> int:
+        """Run every channel that is due now, one after another; returns how many ran."""
+        return sum(self.run_channel(channel_id) is not None for channel_id in self.due())
+
+    def run_forever(self):
+        running = {}  # future -> channel id
+        with ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="channel-job") as pool:
+            try:
+                while not self.stopping.is_set():
+                    try:
+                        busy = set(running.values())
+                        for channel_id in self.due():
+                            if len(running) >= self.jobs:
+                                break
+                            if channel_id not in busy:
+                                running[pool.submit(self.run_channel, channel_id)] = channel_id
+                    except Exception as e:
+                        print(f"Ошибка планировщика: {e}")
+                    if running:
+                        done, _ = wait(running, timeout=TICK_SECONDS, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            channel_id = running.pop(future)
+                            if future.exception():
+                                print(f"Ошибка задачи канала {channel_id}: {future.exception()}")
+                    else:
+                        self.stopping.wait(TICK_SECONDS)
+            except KeyboardInterrupt:
+                print("\nПолучен сигнал прерывания. Завершение работы...")
+                self.stopping.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Планировщик мониторинга YouTube.")
+    parser.add_argument("--shard", type=int, default=SHARD_INDEX)
+    parser.add_argument("--shards", type=int, default=SHARD_COUNT)
+    parser.add_argument("--jobs", type=int, default=CHANNEL_JOBS)
+    parser.add_argument("--once", action="store_true", help="обработать каналы, которым пора, и выйти")
+    args = parser.parse_args(argv)
+
+    youtube_monitor.create_db_tables()
+    with SessionLocal() as db:
+        added = sync_channels(db, youtube_monitor.CHANNEL_IDS)
+    if added:
+        print(f"Добавлено каналов из конфигурации: {added}")
+    if args.shards > 1:
+        youtube_quota.share(args.shards)
+
+    youtube = youtube_monitor.get_youtube_service()
+    if not youtube:
+        print("Не удалось инициализировать YouTube сервис.")
+        exit(1)
+    scheduler = ChannelScheduler(shard_index=args.shard, shard_count=args.shards, jobs=args.jobs, youtube=youtube)
+    if args.once:
+        print(f"Обработано каналов: {scheduler.run_pending()}")
+        return
+    print(f"Планировщик запущен: шард {args.shard + 1} из {args.shards}, одновременно каналов: {args.jobs}. "
+          f"Для остановки нажмите Ctrl+C.")
+    scheduler.run_forever()
+    print("Скрипт остановлен.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Sentiment labels for YouTube comments from the local Ollama model.
+
+classify_comments() packs as many comments as fit into SENTIMENT_BATCH_TOKENS into one prompt and
+asks for a JSON array of {"index", "label"}; several such batches run at once
+(SENTIMENT_CONCURRENCY). Labels are checked against CommentSentiment; a comment whose label is
+missing or invalid is classified again on its own with the original one-comment prompt. A batch the
+model could not be reached for is UNKNOWN as a whole, cached only for ERROR_TTL.
+Texts are looked up in sentiment_cache by normalized form first, so "Молодцы!" is asked once, and
+short formulaic ones ("спасибо", "позор", "👍") are labelled by news_monitor.lexicon without the model.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from news_monitor import lexicon
+from news_monitor.models import CommentSentiment
+from news_monitor.sentiment_cache import ERROR_TTL, normalize, sentiment_cache
+
+AI_MODEL_ENDPOINT = os.getenv("OLLAMA_API_URL", "http://localhost:11434/api/generate")
+AI_MODEL_NAME = os.getenv("SENTIMENT_MODEL", "gemma3:27b")  # или ваша модель
+SENTIMENT_BATCH_TOKENS = int(os.getenv("SENTIMENT_BATCH_TOKENS", 3000))
+SENTIMENT_BATCH_MAX_ITEMS = int(os.getenv("SENTIMENT_BATCH_MAX_ITEMS", 50))
+SENTIMENT_CONCURRENCY = int(os.getenv("SENTIMENT_CONCURRENCY", 2))
+SENTIMENT_TIMEOUT = float(os.getenv("SENTIMENT_TIMEOUT", 180))
+SINGLE_TIMEOUT = 90
+
+LABELS = ", ".join(sentiment.value for sentiment in CommentSentiment if sentiment != CommentSentiment.UNKNOWN)
+
+_thread_local = threading.local()
+
+
+def _session() -> requests.Session:
+    # One keep-alive connection per classifying thread.
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = _thread_local.session = requests.Session()
+    return session
+
+
+def _generate(prompt: str, timeout: float, json_format: bool = False) -> str:
+    payload = {"model": AI_MODEL_NAME, "prompt": prompt, "stream": False}
+    if json_format:
+        payload["format"] = "json"
+    response = _session().post(AI_MODEL_ENDPOINT, json=payload, timeout=timeout)
+    response.raise_for_status()
+    return response.json().get("response", "")
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough for Cyrillic with gemma's tokenizer; only used to size batches.
+    return len(text) // 3 + 8
+
+
+def parse_label(value) -> CommentSentiment | None:
+    try:
+        return CommentSentiment(str(value).strip().strip('."\'').upper())
+    except ValueError:
+        return None
+
+
+def analyze_comment_sentiment_with_ai(comment_text: str):
+    stripped_text = comment_text.strip()
+    key = normalize(stripped_text)
+    if not key: return CommentSentiment.NEUTRAL
+    cached = sentiment_cache.get(key)
+    if cached is not None: return cached
+    return _classify_single(key, stripped_text)
+
+
+def _classify_single(key: str, stripped_text: str, fail_fast: bool = False):
+    prompt = f"""Вы — эксперт по классификации эмоциональной окраски текста. Проанализируйте следующий комментарий с YouTube и определите его эмоциональный тон.
+Выберите одну метку из следующих категорий: {LABELS}
+Комментарий: "{stripped_text}"
+Ответьте только меткой."""
+    try:
+        ai_response_raw = _generate(prompt, SINGLE_TIMEOUT).strip()
+        sentiment_enum_val = parse_label(ai_response_raw)
+        if sentiment_enum_val is not None:
+            sentiment_cache.put(key, sentiment_enum_val)
+            return sentiment_enum_val
+        print(f"    ИИ вернул неизвестный тег: '{ai_response_raw}'. Установлено НЕОПРЕДЕЛЕНО.")
+    except requests.exceptions.RequestException as e:
+        if fail_fast:
+            raise
+        print(f"    Ошибка соединения с сервисом ИИ: {e}")
+    except Exception as e:
+        print(f"    Неожиданная ошибка во время анализа ИИ: {e}")
+    # Short TTL: a model hiccup or an outage should not stick to this text for good.
+    sentiment_cache.put(key, CommentSentiment.UNKNOWN, ttl=ERROR_TTL)
+    return CommentSentiment.UNKNOWN
+
+
+def batch_prompt(texts) -> str:
+    items = json.dumps([{"index": i, "text": text} for i, text in enumerate(texts)], ensure_ascii=False)
+    return f"""Вы — эксперт по классификации эмоциональной окраски текста. Ниже JSON-массив комментариев с YouTube.
+Для каждого комментария выберите одну метку из категорий: {LABELS}
+Комментарии: {items}
+Ответьте JSON-массивом вида [{{"index": 0, "label": "МЕТКА"}}, ...] — ровно по одному элементу на каждый index, без пояснений."""
+
+
+def parse_batch_response(raw: str, size: int) -> dict:
+    """index -> CommentSentiment for every well-formed item of the model's answer."""
+    raw = raw.strip()
+    if raw.startswith("```"):
+        raw = raw.strip("`").removeprefix("json").strip()
+    data = json.loads(raw)
+    if isinstance(data, dict):
+        # format=json sometimes wraps the array: {"labels": [...]} or similar.
+        data = next((value for value in data.values() if isinstance(value, list)), [])
+    labels = {}
+    for item in data if isinstance(data, list) else []:
+        if not isinstance(item, dict):
+            continue
+        index, label = item.get("index"), parse_label(item.get("label"))
+        if isinstance(index, int) and 0 <= index < size and label is not None:
+            labels[index] = label
+    return labels
+
+
+def classify_batch(items, fail_fast: bool = False) -> list:
+    """Labels for a list of (cache key, text); caches them as it goes."""
+    texts = [text for _, text in items]
+    labels = {}
+    try:
+        labels = parse_batch_response(_generate(batch_prompt(texts), SENTIMENT_TIMEOUT, json_format=True),
+                                      len(texts))
+    except requests.exceptions.RequestException as e:
+        if fail_fast:
+            raise
+        # The model is unreachable: one call per comment would only wait out SINGLE_TIMEOUT each time.
+        print(f"    Ошибка соединения с сервисом ИИ (пакет из {len(texts)}): {e}")
+        sentiment_cache.put_many(((key, CommentSentiment.UNKNOWN) for key, _ in items), ttl=ERROR_TTL)
+        return [CommentSentiment.UNKNOWN] * len(items)
+    except Exception as e:
+        print(f"    Не удалось разобрать ответ ИИ для пакета из {len(texts)}: {e}")
+    sentiment_cache.put_many((items[i][0], label) for i, label in labels.items())
+    missing = len(texts) - len(labels)
+    if missing:
+        print(f"    Пакет из {len(texts)}: без метки {missing}, классифицируем по одному.")
+    return [labels[i] if i in labels else _classify_single(*items[i], fail_fast=fail_fast)
+            for i in range(len(items))]
+
+
+def make_batches(items, token_budget: int, max_items: int, text=lambda item: item):
+    batch, tokens = [], 0
+    for item in items:
+        cost = estimate_tokens(text(item))
+        if batch and (tokens + cost > token_budget or len(batch) >= max_items):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(item)
+        tokens += cost
+    if batch:
+        yield batch
+
+
+def classify_comments(texts, fail_fast: bool = False) -> list:
+    """CommentSentiment for each text, in order.
+
+    With fail_fast, a connection error is raised instead of being turned into (and cached as)
+    UNKNOWN, and UNKNOWN entries of the cache are asked again, for callers that would rather try
+    again later than store UNKNOWN.
+    """
+    keys = [normalize(text) for text in texts]
+    results = {"": CommentSentiment.NEUTRAL}
+    results.update((key, label) for key, label in sentiment_cache.get_many(key for key in keys if key).items()
+                   if not (fail_fast and label == CommentSentiment.UNKNOWN))
+    # One model call per normalized text; the first spelling seen stands in for the others.
+    todo = {}
+    for key, text in zip(keys, texts):
+        if key not in results and key not in todo:
+            todo[key] = text.strip()
+    if todo and lexicon.LEXICON_ENABLED:
+        # Not cached: the scorer is cheaper than the cache lookup, and a lexicon change applies at once.
+        local, _ = lexicon.lexicon_scorer.score(list(todo.values()))
+        for key, label in zip(list(todo), local):
+            if label is not None:
+                results[key] = label
+                del todo[key]
+
+    batches = list(make_batches(todo.items(), SENTIMENT_BATCH_TOKENS, SENTIMENT_BATCH_MAX_ITEMS,
+                                text=lambda item: item[1]))
+    if len(batches) > 1 and SENTIMENT_CONCURRENCY > 1:
+        with ThreadPoolExecutor(max_workers=SENTIMENT_CONCURRENCY, thread_name_prefix="sentiment") as pool:
+            labelled = list(pool.map(lambda batch: classify_batch(batch, fail_fast), batches))
+    else:
+        labelled = [classify_batch(batch, fail_fast) for batch in batches]
+    for batch, labels in zip(batches, labelled):
+        for (key, _), label in zip(batch, labels):
+            results[key] = label
+    return [results[key] for key in keys]
@@ -0,0 +1,127 @@
+"""Disk-backed LRU cache of sentiment labels, keyed on normalized comment text.
+
+A SQLite file (SENTIMENT_CACHE_PATH) survives restarts and is shared by every process on the host.
+Real labels live for SENTIMENT_CACHE_TTL_DAYS; UNKNOWN from a failed or unparsable model call only
+for SENTIMENT_ERROR_TTL_MINUTES, so it gets retried. Past SENTIMENT_CACHE_MAX_ENTRIES the least
+recently used entries are dropped.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from news_monitor.models import CommentSentiment
+
+CACHE_PATH = os.getenv("SENTIMENT_CACHE_PATH", "sentiment_cache.sqlite3")
+MAX_ENTRIES = int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", 200000))
+LABEL_TTL = float(os.getenv("SENTIMENT_CACHE_TTL_DAYS", 180)) * 86400
+ERROR_TTL = float(os.getenv("SENTIMENT_ERROR_TTL_MINUTES", 15)) * 60
+PRUNE_EVERY = 1000  # puts between size checks
+
+_REPEATED_SYMBOL = re.compile(r"([^\w\s])\1+")
+
+
+def normalize(text: str) -> str:
+    """"Молодцы!!!", " молодцы " and "МОЛОДЦЫ." share a key; so do "😡", "😡😡😡" and "😡!"."""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+    # Punctuation, variation selectors and zero-width joiners carry no sentiment of their own.
+    text = "".join(c for c in text if unicodedata.category(c)[0] not in "PM" and unicodedata.category(c) != "Cf")
+    text = " ".join(text.split())
+    if not any(c.isalnum() for c in text):
+        return "".join(sorted(set(text.replace(" ", ""))))
+    return _REPEATED_SYMBOL.sub(r"\1", text)
+
+
+class SentimentCache:
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sentiment_cache ("
+                         "key TEXT PRIMARY KEY, label TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_sentiment_cache_last_used ON sentiment_cache (last_used)")
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, keys) -> dict:
+        """key -> CommentSentiment for the keys that have a live entry."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(f"SELECT key, label FROM sentiment_cache WHERE expires_at > ? "
+                                    f"AND key IN ({','.join('?' * len(chunk))})", [now, *chunk]).fetchall()
+                found.update((key, CommentSentiment[label]) for key, label in rows)
+            if found:
+                conn.executemany("UPDATE sentiment_cache SET last_used = ? WHERE key = ?",
+                                 [(now, key) for key in found])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items, ttl: float = LABEL_TTL):
+        """Store (key, CommentSentiment) pairs."""
+        now = time.time()
+        rows = [(key, label.name, now + ttl, now) for key, label in items]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("INSERT INTO sentiment_cache (key, label, expires_at, last_used) VALUES (?, ?, ?, ?) "
+                             "ON CONFLICT (key) DO UPDATE SET label = excluded.label, "
+                             "expires_at = excluded.expires_at, last_used = excluded.last_used", rows)
+            self._puts += len(rows)
+            if self._puts >= PRUNE_EVERY:
+                self._puts = 0
+                self._prune(conn)
+
+    def put(self, key: str, label: CommentSentiment, ttl: float = LABEL_TTL):
+        self.put_many([(key, label)], ttl)
+
+    def _prune(self, conn):
+        conn.execute("DELETE FROM sentiment_cache WHERE expires_at <= ?", [time.time()])
+        excess = conn.execute("SELECT count(*) FROM sentiment_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute("DELETE FROM sentiment_cache WHERE key IN "
+                         "(SELECT key FROM sentiment_cache ORDER BY last_used LIMIT ?)", [excess])
+
+    def prune(self):
+        with self._lock:
+            self._prune(self._connection())
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute("SELECT count(*) FROM sentiment_cache").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+sentiment_cache = SentimentCache()
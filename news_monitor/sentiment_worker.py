@@ -0,0 +1,196 @@
+"""Classifies stored YouTube comments whose sentiment is still pending (NULL).
+
+The monitor inserts comments without waiting for the model; this process drains that backlog,
+newest comments first. Each thread claims up to SENTIMENT_WORKER_BATCH rows with
+SELECT ... FOR UPDATE SKIP LOCKED, classifies them and writes the labels in the same transaction,
+so any number of threads and processes can run side by side without labelling a row twice. If the
+model is unreachable the claim is rolled back and the rows stay pending. A row the model gives no
+usable label (UNKNOWN) stays pending too, and is retried after SENTIMENT_RETRY_MINUTES, doubling
+each time; after SENTIMENT_MAX_ATTEMPTS it is stored as UNKNOWN for good.
+
+    python -m news_monitor.sentiment_worker --threads 4
+    python -m news_monitor.sentiment_worker --stats
+"""
+import argparse
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import requests
+from sqlalchemy import func, or_, select, text, update
+
+from news_monitor.database import SessionLocal
+from news_monitor.lexicon import lexicon_scorer
+from news_monitor.models import SENTIMENT_PENDING_CONDITION, CommentSentiment, YoutubeComment
+from news_monitor.rollup import add_to_rollup
+from news_monitor.sentiment import classify_comments
+from news_monitor.sentiment_cache import sentiment_cache
+
+BATCH_SIZE = int(os.getenv("SENTIMENT_WORKER_BATCH", 50))
+THREADS = int(os.getenv("SENTIMENT_WORKER_THREADS", 2))
+IDLE_SECONDS = float(os.getenv("SENTIMENT_WORKER_IDLE_SECONDS", 15))  # also the back-off when the model is down
+REPORT_SECONDS = float(os.getenv("SENTIMENT_WORKER_REPORT_SECONDS", 60))
+RETRY_AFTER = timedelta(minutes=float(os.getenv("SENTIMENT_RETRY_MINUTES", 15)))
+MAX_ATTEMPTS = int(os.getenv("SENTIMENT_MAX_ATTEMPTS", 5))
+RATE_WINDOW = timedelta(minutes=15)
+
+PENDING = text(SENTIMENT_PENDING_CONDITION)
+
+
+def claim_and_classify(db, batch_size: int = BATCH_SIZE) -> int:
+    """Label one batch of the newest pending comments; returns how many were labelled."""
+    now = datetime.now(timezone.utc)
+    rows = db.execute(select(YoutubeComment.id, YoutubeComment.comment_text, YoutubeComment.youtube_channel_id,
+                             YoutubeComment.youtube_video_id, YoutubeComment.youtube_channel_title,
+                             YoutubeComment.topic, YoutubeComment.comment_published_at, YoutubeComment.created_at,
+                             YoutubeComment.sentiment_attempts)
+                      .where(PENDING, or_(YoutubeComment.sentiment_retry_at.is_(None),
+                                          YoutubeComment.sentiment_retry_at <= now))
+                      .order_by(YoutubeComment.id.desc()).limit(batch_size)
+                      .with_for_update(skip_locked=True)).all()
+    if not rows:
+        db.rollback()
+        return 0
+    try:
+        labels = classify_comments([row.comment_text for row in rows], fail_fast=True)
+    except Exception:
+        db.rollback()  # releases the rows for the next attempt
+        raise
+    labelled, retries = [], []
+    for row, label in zip(rows, labels):
+        attempts = (row.sentiment_attempts or 0) + 1
+        if label != CommentSentiment.UNKNOWN or attempts >= MAX_ATTEMPTS:
+            labelled.append((row, label))
+        else:
+            retries.append({"id": row.id, "sentiment_attempts": attempts,
+                            "sentiment_retry_at": now + RETRY_AFTER * 2 ** (attempts - 1)})
+    if labelled:
+        db.execute(update(YoutubeComment), [{"id": row.id, "sentiment": label, "sentiment_labelled_at": now}
+                                            for row, label in labelled])
+        add_to_rollup(db, labelled)  # same transaction: the analytics never see a label twice or not at all
+    if retries:
+        db.execute(update(YoutubeComment), retries)
+    db.commit()
+    return len(labelled)
+
+
+def backlog_stats(db, window: timedelta = RATE_WINDOW) -> dict:
+    """Pending comments, the age of the oldest one and how many were labelled per minute lately."""
+    pending, oldest = db.execute(select(func.count(YoutubeComment.id), func.min(YoutubeComment.created_at))
+                                 .where(PENDING)).one()
+    since = datetime.now(timezone.utc) - window
+    labelled = db.scalar(select(func.count(YoutubeComment.id)).where(YoutubeComment.sentiment_labelled_at >= since))
+    return {"pending": pending, "oldest_pending_at": oldest,
+            "labelled_per_minute": labelled / (window.total_seconds() / 60)}
+
+
+class SentimentWorker:
+    def __init__(self, session_factory=SessionLocal, threads: int = THREADS, batch_size: int = BATCH_SIZE,
+                 idle_seconds: float = IDLE_SECONDS):
+        self.session_factory = session_factory
+        self.threads = threads
+        self.batch_size = batch_size
+        self.idle_seconds = idle_seconds
+        self.labelled = 0
+        self.errors = 0
+        self.stopping = threading.Event()
+        self._recent = deque()  # (monotonic time, rows) of this process's claims within RATE_WINDOW
+        self._lock = threading.Lock()
+
+    def _record(self, count: int, error: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            self.errors += error
+            self.labelled += count
+            self._recent.append((now, count))
+            while self._recent and self._recent[0][0] < now - RATE_WINDOW.total_seconds():
+                self._recent.popleft()
+
+    def drain_rate(self) -> float:
+        """Comments per minute labelled by this process over the last RATE_WINDOW."""
+        with self._lock:
+            if not self._recent:
+                return 0.0
+            elapsed = max(time.monotonic() - self._recent[0][0], 60.0)
+            return sum(count for _, count in self._recent) / elapsed * 60
+
+    def step(self) -> int:
+        with self.session_factory() as db:
+            try:
+                count = claim_and_classify(db, self.batch_size)
+            except requests.exceptions.RequestException as e:
+                print(f"Сервис ИИ недоступен, повтор через {self.idle_seconds:.0f} с: {e}")
+                self._record(0, error=True)
+                return 0
+            except Exception as e:
+                print(f"Ошибка при разметке пакета комментариев: {e}")
+                self._record(0, error=True)
+                return 0
+        self._record(count)
+        return count
+
+    def drain(self) -> int:
+        """Label pending comments on the calling thread until none are left (or a batch fails or labels nothing)."""
+        total = 0
+        while count := self.step():
+            total += count
+        return total
+
+    def _loop(self):
+        while not self.stopping.is_set():
+            if not self.step():
+                self.stopping.wait(self.idle_seconds)
+
+    def report(self) -> str:
+        with self.session_factory() as db:
+            stats = backlog_stats(db)
+        oldest = stats["oldest_pending_at"]
+        return (f"[{datetime.now()}] Очередь тональности: {stats['pending']} комментариев"
+                + (f" (самый старый с {oldest:%Y-%m-%d %H:%M})" if oldest else "") + "; "
+                f"скорость разметки: {self.drain_rate():.1f}/мин в этом процессе, "
+                f"{stats['labelled_per_minute']:.1f}/мин всего; размечено: {self.labelled}, ошибок: {self.errors}; "
+                f"кэш тональности: {sentiment_cache.hit_rate:.0%} попаданий; "
+                f"размечено словарём без модели: {lexicon_scorer.labelled}")
+
+    def run(self, report_seconds: float = REPORT_SECONDS):
+        threads = [threading.Thread(target=self._loop, name=f"sentiment-worker-{i}", daemon=True)
+                   for i in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        try:
+            while not self.stopping.wait(report_seconds):
+                try:
+                    print(self.report())
+                except Exception as e:
+                    print(f"Не удалось получить статистику очереди: {e}")
+        except KeyboardInterrupt:
+            print("\nПолучен сигнал прерывания. Завершение работы...")
+        finally:
+            self.stopping.set()
+            for thread in threads:
+                thread.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Разметка тональности сохранённых комментариев YouTube.")
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--once", action="store_true", help="разметить очередь и выйти")
+    parser.add_argument("--stats", action="store_true", help="показать размер очереди и выйти")
+    args = parser.parse_args(argv)
+
+    worker = SentimentWorker(threads=args.threads, batch_size=args.batch_size)
+    if args.stats:
+        print(worker.report())
+    elif args.once:
+        print(f"Размечено комментариев: {worker.drain()}")
+        print(worker.report())
+    else:
+        print(f"Разметка тональности: потоков {args.threads}, пакет {args.batch_size}. Для остановки нажмите Ctrl+C.")
+        worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Topic clusters of YouTube comments: hashed n-gram features and mini-batch k-means in NumPy.
+
+`topic` on a comment is only the video title; this job groups what commenters actually write about,
+across videos and channels. A comment becomes a sparse vector over TOPIC_FEATURES buckets: its word
+stems (first STEM_LENGTH letters, stop words dropped) and pairs of neighbouring stems, hashed with
+crc32 (stable across processes, unlike hash()), weighted 1 + log(tf) and scaled to unit length.
+Clusters are unit-length centroids compared by cosine similarity (spherical k-means):
+
+  - the first run fits TOPIC_CLUSTERS centroids on the newest TOPIC_FIT_SAMPLE comments
+    (k-means++ seeding, then TOPIC_FIT_EPOCHS passes of mini-batch updates);
+  - every run after that assigns only the comments that have no cluster yet (topic_cluster_id IS
+    NULL, served by a partial index), in batches of TOPIC_BATCH, and moves the centroids towards
+    them with the per-cluster learning rate of mini-batch k-means. Cluster ids never change, so
+    earlier assignments stay valid;
+  - --refit starts over: new centroids, and every comment is assigned again.
+
+Centroids and their top terms are stored in youtube_comment_topics (CommentTopic). Everything runs
+on the CPU with no network access. Run one job at a time, from cron for instance:
+
+    python -m news_monitor.topics
+    python -m news_monitor.topics --show
+    python -m benchmarks.topic_clustering --comments 1000000
+"""
+import argparse
+import os
+import re
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+from sqlalchemy import delete, func, select, text, update
+
+from news_monitor.lexicon import FILLER, NEGATION
+from news_monitor.models import TOPIC_PENDING_CONDITION, CommentTopic, YoutubeComment
+from news_monitor.sentiment_cache import normalize
+
+N_FEATURES = int(os.getenv("TOPIC_FEATURES", 2 ** 14))
+N_CLUSTERS = int(os.getenv("TOPIC_CLUSTERS", 50))
+FIT_SAMPLE = int(os.getenv("TOPIC_FIT_SAMPLE", 200000))
+FIT_EPOCHS = int(os.getenv("TOPIC_FIT_EPOCHS", 3))
+BATCH_SIZE = int(os.getenv("TOPIC_BATCH", 5000))
+SEED_SAMPLE = 20000  # comments k-means++ picks the first centroids from
+STEM_LENGTH = 6
+TOP_TERMS = 10
+NO_TOPIC = -1  # comments without a single usable word ("👍👍", "Ок")
+
+PENDING = text(TOPIC_PENDING_CONDITION)
+
+STOP_WORDS = FILLER | NEGATION | {
+    "что", "все", "уже", "еще", "когда", "где", "кто", "они", "она", "его", "ему", "для", "только", "там", "тут",
+    "вот", "нас", "наш", "наши", "нам", "мне", "меня", "мой", "если", "или", "чтобы", "который", "которые", "было",
+    "был", "была", "были", "будет", "есть", "даже", "тоже", "этот", "эти", "этого", "этом", "потом", "надо",
+    "можно", "сколько", "почему", "опять", "раз", "без", "под", "над", "при", "про", "после", "ничего", "никто",
+    "себя", "свои", "своих", "сейчас", "тогда", "всё", "ещё", "менен", "жана", "үчүн", "деп", "бул", "ушул", "дагы",
+}
+
+_WORD = re.compile(r"[^\W\d_]{3,}")
+
+
+class TopicModel:
+    def __init__(self, centroids=None, counts=None, n_clusters: int = N_CLUSTERS, n_features: int = N_FEATURES,
+                 seed: int = 0):
+        self.n_features = n_features if centroids is None else centroids.shape[0]
+        # (features x clusters): the rows of a comment's buckets are gathered in one go.
+        self.centroids = centroids if centroids is not None else np.zeros((self.n_features, 0), dtype=np.float32)
+        self.counts = counts if counts is not None else np.zeros(self.centroids.shape[1], dtype=np.int64)
+        self.n_clusters = n_clusters if centroids is None else centroids.shape[1]
+        self.terms = Counter()  # terms seen by this process, to name the buckets in top_terms()
+        self.rng = np.random.default_rng(seed)
+        self._buckets = {}
+
+    def bucket(self, term: str) -> int:
+        index = self._buckets.get(term)
+        if index is None:
+            if len(self._buckets) > 500000:
+                self._buckets.clear()
+            index = self._buckets[term] = zlib.crc32(term.encode()) % self.n_features
+        return index
+
+    @staticmethod
+    def terms_of(text: str) -> list:
+        stems = [word[:STEM_LENGTH] for word in _WORD.findall(normalize(text)) if word not in STOP_WORDS]
+        return stems + [f"{a} {b}" for a, b in zip(stems, stems[1:])]
+
+    def vectorize(self, texts, remember_terms: bool = False):
+        """Sparse rows (bucket indices, weights, row offsets) of unit length; a row may be empty."""
+        buckets, lengths = [], []
+        for text in texts:
+            terms = self.terms_of(text)
+            if remember_terms:
+                self.terms.update(terms)
+            buckets += [self.bucket(term) for term in terms]
+            lengths.append(len(terms))
+        if len(self.terms) > 1000000:
+            self.terms = Counter(dict(self.terms.most_common(200000)))
+        rows = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        # Sorting (row, bucket) keys both groups the entries by row and counts repeated terms.
+        keys, tf = np.unique(rows * self.n_features + np.array(buckets, dtype=np.int64), return_counts=True)
+        rows, indices = np.divmod(keys, self.n_features)
+        values = (1 + np.log(tf)).astype(np.float32)
+        values /= np.sqrt(np.bincount(rows, weights=values * values, minlength=len(lengths)))[rows].astype(np.float32)
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(lengths)), out=indptr[1:])
+        return indices, values, indptr
+
+    def similarities(self, indices, values, indptr):
+        """Cosine similarity of every row to every centroid; 0 for empty rows."""
+        sims = np.zeros((len(indptr) - 1, self.centroids.shape[1]), dtype=np.float32)
+        filled = np.flatnonzero(np.diff(indptr))
+        if len(filled):
+            # Empty rows own no entries, so the segments between the filled rows' offsets are exact.
+            sims[filled] = np.add.reduceat(self.centroids[indices] * values[:, None], indptr[filled], axis=0)
+        return sims
+
+    def _seed(self, indices, values, indptr):
+        """Greedy k-means++ over the rows: of a few rows drawn with probability 1 - similarity to the
+        centroids so far, the next centroid is the one that leaves the rows closest to a centroid."""
+        filled = np.flatnonzero(np.diff(indptr))
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        closest = np.zeros(len(indptr) - 1)
+        chosen = []
+        trials = 2 + int(np.log(max(self.n_clusters, 1)))
+        for _ in range(self.n_clusters):
+            weights = (1 - closest[filled]).clip(0)
+            if not weights.sum() > 1e-6:
+                break  # fewer distinct comments than clusters
+            best = None
+            for row in self.rng.choice(filled, size=trials, p=weights / weights.sum()):
+                centroid = np.zeros(self.n_features, dtype=np.float32)
+                centroid[indices[indptr[row]:indptr[row + 1]]] = values[indptr[row]:indptr[row + 1]]
+                candidate = np.maximum(closest, np.bincount(rows, weights=centroid[indices] * values,
+                                                            minlength=len(indptr) - 1))
+                if best is None or candidate.sum() > best[1].sum():
+                    best = centroid, candidate
+            chosen.append(best[0])
+            closest = best[1]
+        self.centroids = np.array(chosen, dtype=np.float32).reshape(-1, self.n_features).T.copy()
+        self.counts = np.zeros(self.centroids.shape[1], dtype=np.int64)
+
+    def _update(self, indices, values, indptr, labels):
+        """Mini-batch k-means step: every centroid moves to its rows at rate (rows in batch) / (rows so far)."""
+        n_clusters = self.centroids.shape[1]
+        assigned = labels >= 0
+        batch_counts = np.bincount(labels[assigned], minlength=n_clusters)
+        touched = np.flatnonzero(batch_counts)
+        if not len(touched):
+            return
+        entry_labels = np.repeat(labels, np.diff(indptr))
+        sums = np.bincount(indices * n_clusters + entry_labels, weights=values,
+                           minlength=self.n_features * n_clusters).reshape(self.n_features, n_clusters)
+        self.counts += batch_counts
+        rate = batch_counts[touched] / self.counts[touched]
+        moved = self.centroids[:, touched] * (1 - rate) + sums[:, touched] / self.counts[touched]
+        self.centroids[:, touched] = moved / np.maximum(np.linalg.norm(moved, axis=0), 1e-12)
+
+    def assign(self, texts, learn: bool = True) -> np.ndarray:
+        """Cluster id of every text (NO_TOPIC without usable words); learn=True also moves the centroids."""
+        indices, values, indptr = self.vectorize(texts, remember_terms=learn)
+        if not self.centroids.shape[1]:
+            return np.full(len(indptr) - 1, NO_TOPIC)
+        labels = self.similarities(indices, values, indptr).argmax(axis=1)
+        labels = np.where(np.diff(indptr) > 0, labels, NO_TOPIC)
+        if learn:
+            self._update(indices, values, indptr, labels)
+        return labels
+
+    def fit(self, texts, epochs: int = FIT_EPOCHS, batch_size: int = BATCH_SIZE):
+        texts = [texts[i] for i in self.rng.permutation(len(texts))]
+        batches = [self.vectorize(texts[start:start + batch_size], remember_terms=True)
+                   for start in range(0, len(texts), batch_size)]
+        self._seed(*self.vectorize(texts[:SEED_SAMPLE]))
+        if not self.centroids.shape[1]:
+            return self
+        for epoch in range(epochs):
+            for batch in self.rng.permutation(len(batches)):
+                indices, values, indptr = batches[batch]
+                labels = self.similarities(indices, values, indptr).argmax(axis=1)
+                self._update(indices, values, indptr, np.where(np.diff(indptr) > 0, labels, NO_TOPIC))
+        return self
+
+    def top_terms(self, n: int = TOP_TERMS) -> list:
+        """The n heaviest named buckets of every centroid; a bucket is named after its most frequent term."""
+        names = {}
+        for term, _ in self.terms.most_common():
+            names.setdefault(self.bucket(term), term)
+        result = []
+        for cluster in range(self.centroids.shape[1]):
+            order = np.argsort(-self.centroids[:, cluster])[:n * 4]
+            result.append([names[bucket] for bucket in order
+                           if bucket in names and self.centroids[bucket, cluster] > 0][:n])
+        return result
+
+    @classmethod
+    def load(cls, db):
+        """The stored model, or None before the first fit."""
+        rows = db.scalars(select(CommentTopic).order_by(CommentTopic.id)).all()
+        if not rows:
+            return None
+        centroids = np.stack([np.frombuffer(row.centroid, dtype=np.float32) for row in rows], axis=1)
+        if centroids.shape[0] != N_FEATURES:
+            raise ValueError(f"Модель тем построена для {centroids.shape[0]} признаков, а TOPIC_FEATURES={N_FEATURES}; "
+                             f"запустите с --refit.")
+        model = cls(centroids, np.array([row.comment_count for row in rows], dtype=np.int64))
+        model.terms.update(term for row in rows for term in (row.top_terms or "").split(", ") if term)
+        return model
+
+    def save(self, db):
+        for cluster, terms in enumerate(self.top_terms()):
+            db.merge(CommentTopic(id=cluster, centroid=np.ascontiguousarray(self.centroids[:, cluster]).tobytes(),
+                                  top_terms=", ".join(terms), comment_count=int(self.counts[cluster])))
+        db.execute(delete(CommentTopic).where(CommentTopic.id >= self.centroids.shape[1]))
+
+
+def fit_topics(db, sample_size: int = FIT_SAMPLE, n_clusters: int = N_CLUSTERS) -> TopicModel:
+    """Fit new clusters on the newest comments; every comment is then due to be assigned again."""
+    texts = db.scalars(select(YoutubeComment.comment_text).order_by(YoutubeComment.id.desc())
+                       .limit(sample_size)).all()
+    model = TopicModel(n_clusters=n_clusters).fit(texts)
+    model.save(db)
+    db.execute(update(YoutubeComment).where(YoutubeComment.topic_cluster_id.is_not(None))
+               .values(topic_cluster_id=None))
+    db.commit()
+    return model
+
+
+def assign_pending(db, model: TopicModel, batch_size: int = BATCH_SIZE) -> int:
+    """Assign comments without a cluster, oldest first, and store the moved centroids; returns how many."""
+    total = 0
+    while True:
+        rows = db.execute(select(YoutubeComment.id, YoutubeComment.comment_text).where(PENDING)
+                          .order_by(YoutubeComment.id).limit(batch_size)).all()
+        if not rows:
+            break
+        labels = model.assign([row.comment_text for row in rows])
+        db.execute(update(YoutubeComment), [{"id": row.id, "topic_cluster_id": int(label)}
+                                            for row, label in zip(rows, labels)])
+        db.commit()
+        total += len(rows)
+    if total:
+        model.save(db)
+        db.commit()
+    return total
+
+
+def run(db, refit: bool = False) -> int:
+    model = None if refit else TopicModel.load(db)
+    if model is None:
+        started = time.perf_counter()
+        model = fit_topics(db)
+        print(f"Построено тем: {model.centroids.shape[1]} за {time.perf_counter() - started:.1f} с.")
+    return assign_pending(db, model)
+
+
+def show(db):
+    counts = dict(db.execute(select(YoutubeComment.topic_cluster_id, func.count(YoutubeComment.id))
+                             .group_by(YoutubeComment.topic_cluster_id)).all())
+    for topic in db.scalars(select(CommentTopic).order_by(CommentTopic.id)):
+        print(f"{topic.id:>4} {counts.get(topic.id, 0):>8}  {topic.top_terms}")
+    print(f"Без темы: {counts.get(NO_TOPIC, 0)}, ещё не распределено: {counts.get(None, 0)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Темы комментариев YouTube (кластеризация).")
+    parser.add_argument("--refit", action="store_true", help="построить темы заново и распределить все комментарии")
+    parser.add_argument("--show", action="store_true", help="показать темы и число комментариев в них")
+    args = parser.parse_args(argv)
+
+    from news_monitor.database import SessionLocal
+    with SessionLocal() as db:
+        if args.show:
+            show(db)
+            return
+        started = time.perf_counter()
+        assigned = run(db, refit=args.refit)
+        print(f"Распределено комментариев по темам: {assigned} за {time.perf_counter() - started:.1f} с.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,80 @@
 import os
+import queue
+import threading
 import time
-from datetime import datetime, timezone
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 
-import requests
-import schedule
 from dotenv import load_dotenv
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from sqlalchemy import select
 
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from database import SessionLocal, get_db, Base, engine
-from models import YoutubeComment, CommentSentiment
+from migrations import migrate
+from news_monitor import http_cache
+from news_monitor.database import get_db, engine
+from news_monitor.models import YoutubeComment, VideoCrawlState
+from news_monitor.quota import QuotaExhausted, youtube_quota
 load_dotenv()
 
 API_KEY = os.getenv("YOUTUBE_API_KEY")
-CHANNEL_IDS = [
+DEFAULT_CHANNEL_IDS = [
     "UCMT_crm-eLZl3CNvNr-1lWQ",  # Ала Тоо
     "UCbj2FCkrX13P9fDnxnY0GGw",  # Апрель
-    "UCwlDbu6R30KrhDxq0ETTXPQ"  # Лимон KG
-    "UCNPxzbEkoNcydfLrRdTb-HA"  # Акипресс
-    "UCs_xNajKMU60fbeIhcxStoA"  # Азаттык
-
+    "UCwlDbu6R30KrhDxq0ETTXPQ",  # Лимон KG
+    "UCNPxzbEkoNcydfLrRdTb-HA",  # Акипресс
+    "UCs_xNajKMU60fbeIhcxStoA",  # Азаттык
 ]
-
-VIDEOS_PER_CHANNEL = 10
-MAX_COMMENTS_PER_VIDEO = 100
+# Comma-separated; the scheduler adds these to the youtube_channels table, where more can be added by hand.
+CHANNEL_IDS = [channel_id.strip() for channel_id in os.getenv("YOUTUBE_CHANNEL_IDS", "").split(",")
+               if channel_id.strip()] or DEFAULT_CHANNEL_IDS
+
+# Cap on uploads checked per channel and cycle; the playlist is paged past 50 if needed.
+VIDEOS_PER_CHANNEL = int(os.getenv("YOUTUBE_VIDEOS_PER_CHANNEL", 10))
+# Top-level threads. In incremental mode this only caps the first crawl of a video: later crawls read
+# down to the watermark however many comments came in, or the ones past the cap would never be read.
+MAX_COMMENTS_PER_VIDEO = int(os.getenv("YOUTUBE_MAX_COMMENTS_PER_VIDEO", 100))
+# Replies cost one comments.list call per 100 beyond the handful that come with their thread.
+FETCH_REPLIES = os.getenv("YOUTUBE_FETCH_REPLIES", "false").lower() in ("1", "true", "yes")
+# Comment pages (up to 100 comments each) fetched but not yet stored; fetch threads wait when it is full.
+PIPELINE_BUFFER_PAGES = int(os.getenv("YOUTUBE_PIPELINE_BUFFER_PAGES", 16))
+VIDEO_BATCH_SIZE = 50  # ids per videos.list call, the API maximum
+# "incremental": newest comments first, down to the per-video watermark (VideoCrawlState); videos whose
+# commentCount did not change are skipped and older videos are polled less and less often.
+# "full": the top MAX_COMMENTS_PER_VIDEO comments by relevance, every video, every cycle.
+CRAWL_MODE = os.getenv("YOUTUBE_CRAWL_MODE", "incremental")
+COMMIT_BATCH_SIZE = int(os.getenv("YOUTUBE_COMMIT_BATCH_SIZE", 500))
+MAX_POLL_INTERVAL = timedelta(hours=float(os.getenv("YOUTUBE_MAX_POLL_INTERVAL_HOURS", 24 * 7)))
 # --------------------
 
 YOUTUBE_API_SERVICE_NAME = "youtube"
 YOUTUBE_API_VERSION = "v3"
-AI_MODEL_ENDPOINT = "http://localhost:11434/api/generate"
-AI_MODEL_NAME = "gemma3:27b"  # или ваша модель
-SENTIMENT_CACHE = {}
+CHANNEL_PLAYLIST_CACHE = {}  # channel_id -> (uploads playlist id, channel title)
+RECENT_UPLOADS = {}  # channel_id -> [(video_id, published_at)] checked last cycle, newest first
 
-RUN_EVERY_MINUTES = 60
+RUN_EVERY_MINUTES = 60  # starting interval of a channel; news_monitor.scheduler adapts it per channel
+# Channels and videos are fetched in parallel; 1 gives the old one-request-at-a-time behaviour.
+FETCH_WORKERS = int(os.getenv("YOUTUBE_FETCH_WORKERS", 8))
 
 
 def create_db_tables():
     try:
-        print("Проверка и создание таблиц базы данных...")
-        Base.metadata.create_all(bind=engine)
-        print("Таблицы успешно проверены/созданы.")
+        print("Применение миграций базы данных...")
+        applied = migrate("youtube", engine)
+        print(f"Таблицы успешно проверены/созданы (новых миграций: {len(applied)}).")
     except Exception as e:
         print(f"Ошибка при создании таблиц: {e}")
         # exit(1)
 
 
 def get_youtube_service():
+    # discovery pulls in httplib2/google-auth; import it only when the monitor actually runs.
+    from googleapiclient.discovery import build
     try:
         service = build(YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, developerKey=API_KEY)
         return service
@@ -58,17 +83,83 @@ def get_youtube_service():
         return None
 
 
+_thread_local = threading.local()
+
+
+class RunUsage:
+    """Quota units and HTTP cache outcomes of one cycle. The scheduler runs several channel cycles at
+    once, so the process-wide counters of the limiter and the cache cannot be split between them."""
+
+    def __init__(self):
+        self.quota_spent = Counter()
+        self.http_cache = Counter()
+        self._lock = threading.Lock()
+
+    def charge(self, call_type: str, units: int):
+        with self._lock:
+            self.quota_spent[call_type] += units
+
+    def count(self, outcome: str):
+        with self._lock:
+            self.http_cache[outcome] += 1
+
+
+def start_fetch_thread(usage: RunUsage):
+    # Fetch threads belong to the pool of one cycle; execute() counts their calls for that cycle.
+    _thread_local.usage = usage
+    _thread_local.http = None
+
+
+def execute(request, call_type):
+    """Send an API request, charging its cost against the daily quota first.
+
+    httplib2.Http is not thread-safe, so every fetch thread sends through its own connection,
+    wrapped by news_monitor/http_cache.py; a response that is still fresh there costs no quota.
+    """
+    usage = getattr(_thread_local, "usage", None)
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = _thread_local.http = http_cache.build_http(run_counts=usage)
+    if not http_cache.is_fresh(http, request.uri, request.method):
+        units = youtube_quota.acquire(call_type)
+        if usage is not None:
+            usage.charge(call_type, units)
+    try:
+        return request.execute(http=http)
+    except HttpError as e:
+        if e.resp.status == 403 and "quotaExceeded" in str(e.content):
+            youtube_quota.exhaust()
+            raise QuotaExhausted("YouTube API вернул quotaExceeded") from e
+        raise
+
+
+def parse_youtube_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        print(f"    Не удалось распознать дату: {value}")
+        return None
+
+
 def get_channel_uploads_playlist_id(youtube, channel_id):
+    # The uploads playlist of a channel never changes: one channels.list per channel per process.
+    if channel_id in CHANNEL_PLAYLIST_CACHE:
+        return CHANNEL_PLAYLIST_CACHE[channel_id]
     try:
         request = youtube.channels().list(part="contentDetails,snippet", id=channel_id)
-        response = request.execute()
+        response = execute(request, "channels.list")
         if response["items"]:
             channel_title = response["items"][0]["snippet"]["title"]
             uploads_playlist_id = response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
+            CHANNEL_PLAYLIST_CACHE[channel_id] = uploads_playlist_id, channel_title
             return uploads_playlist_id, channel_title
         else:
             print(f"Канал с ID {channel_id} не найден.")
             return None, None
+    except QuotaExhausted:
+        raise
     except HttpError as e:
         print(f"Ошибка API при получении ID плейлиста для канала {channel_id}: {e}")
         return None, None
@@ -77,227 +168,472 @@ def get_channel_uploads_playlist_id(youtube, channel_id):
         return None, None
 
 
-def get_video_ids_from_playlist(youtube, playlist_id, channel_title, max_results=10):
-    video_ids = []
+def get_video_ids_from_playlist(youtube, playlist_id, channel_title, max_results=10, known_until=None):
+    """(video_id, published_at) of the newest uploads, newest first.
+
+    Pages through the playlist until `max_results` uploads or the first upload published no later
+    than `known_until` (the newest upload seen by the previous cycle).
+    """
+    uploads = []
+    next_page_token = None
     try:
-        request = youtube.playlistItems().list(part="contentDetails", playlistId=playlist_id,
-                                               maxResults=min(max_results, 50))
-        response = request.execute()
-        for item in response["items"]:
-            video_ids.append(item["contentDetails"]["videoId"])
-            if len(video_ids) >= max_results:
+        while len(uploads) < max_results:
+            request = youtube.playlistItems().list(part="contentDetails", playlistId=playlist_id,
+                                                   maxResults=min(max_results - len(uploads), 50),
+                                                   pageToken=next_page_token)
+            response = execute(request, "playlistItems.list")
+            for item in response["items"]:
+                published_at = parse_youtube_datetime(item["contentDetails"].get("videoPublishedAt"))
+                if known_until and published_at and published_at <= known_until:
+                    return uploads
+                uploads.append((item["contentDetails"]["videoId"], published_at))
+                if len(uploads) >= max_results:
+                    break
+            next_page_token = response.get("nextPageToken")
+            if not next_page_token:
                 break
-        return video_ids
+        return uploads
+    except QuotaExhausted:
+        raise
     except HttpError as e:
         print(f"Ошибка API при получении видео из плейлиста {playlist_id}: {e}")
-        return []
+        return uploads
     except Exception as e:
         print(f"Неожиданная ошибка при получении видео из плейлиста {playlist_id}: {e}")
-        return []
+        return uploads
 
 
-def get_video_details(youtube, video_id):
+def get_video_details(youtube, video_ids):
+    """videos.list for up to VIDEO_BATCH_SIZE ids in one call; missing videos are left out."""
     try:
-        request = youtube.videos().list(part="snippet", id=video_id)
-        response = request.execute()
-        if response["items"]:
-            return response["items"][0]
-        else:
-            print(f"Видео с ID {video_id} не найдено.")
-            return None
+        request = youtube.videos().list(part="snippet,statistics", id=",".join(video_ids),
+                                        maxResults=len(video_ids))
+        response = execute(request, "videos.list")
+        found = {item["id"] for item in response["items"]}
+        for video_id in video_ids:
+            if video_id not in found:
+                print(f"Видео с ID {video_id} не найдено.")
+        return response["items"]
+    except QuotaExhausted:
+        raise
     except HttpError as e:
-        print(f"Ошибка API при получении деталей видео {video_id}: {e}")
-        return None
+        print(f"Ошибка API при получении деталей видео {', '.join(video_ids)}: {e}")
+        return []
     except Exception as e:
-        print(f"Неожиданная ошибка при получении деталей видео {video_id}: {e}")
-        return None
+        print(f"Неожиданная ошибка при получении деталей видео {', '.join(video_ids)}: {e}")
+        return []
+
 
+def _comment_data(comment_id, comment_snippet, parent_comment_id=None):
+    return {
+        "youtube_comment_id": comment_id,
+        "author_username": comment_snippet["authorDisplayName"],
+        "comment_text": comment_snippet["textDisplay"],
+        "published_at": parse_youtube_datetime(comment_snippet.get("publishedAt")),
+        "parent_comment_id": parent_comment_id,
+    }
 
-def get_video_comments(youtube, video_id, video_title, max_results=20):
-    comments_data_list = []
+
+def iter_reply_pages(youtube, parent_comment_id):
+    next_page_token = None
+    while True:
+        request = youtube.comments().list(part="snippet", parentId=parent_comment_id, maxResults=100,
+                                          textFormat="plainText", pageToken=next_page_token)
+        response = execute(request, "comments.list")
+        yield [_comment_data(item["id"], item["snippet"], parent_comment_id) for item in response["items"]]
+        next_page_token = response.get("nextPageToken")
+        if not next_page_token:
+            return
+
+
+def iter_comment_pages(youtube, video_id, max_results=20, order="relevance", watermark=None, replies=False):
+    """Comments of a video, one API page at a time (at most 100 threads, or 100 replies, per page).
+
+    With order="time" and a (published_at, comment_id) watermark, reading stops at the first thread
+    that is not newer than the watermark. `max_results` None means no cap. With `replies`, each thread
+    is followed by its replies: the few that come inline with the thread, or all of them through
+    comments.list.
+    """
+    threads = 0
     next_page_token = None
+    while max_results is None or threads < max_results:
+        page_size = 100 if max_results is None else min(max_results - threads, 100)
+        request = youtube.commentThreads().list(
+            part="snippet,replies" if replies else "snippet", videoId=video_id,
+            maxResults=page_size,
+            textFormat="plainText", pageToken=next_page_token, order=order
+        )
+        response = execute(request, "commentThreads.list")
+        page, more_replies, reached_watermark = [], [], False
+        for item in response["items"][:page_size]:
+            comment = _comment_data(item["id"], item["snippet"]["topLevelComment"]["snippet"])
+            if watermark and (item["id"] == watermark[1] or (comment["published_at"] and watermark[0]
+                                                             and comment["published_at"] < watermark[0])):
+                reached_watermark = True
+                break
+            page.append(comment)
+            threads += 1
+            if replies:
+                inline = item.get("replies", {}).get("comments", [])
+                if item["snippet"].get("totalReplyCount", 0) > len(inline):
+                    more_replies.append(item["id"])
+                else:
+                    page += [_comment_data(reply["id"], reply["snippet"], item["id"]) for reply in inline]
+        yield page
+        for parent_comment_id in more_replies:
+            yield from iter_reply_pages(youtube, parent_comment_id)
+        next_page_token = response.get("nextPageToken")
+        if reached_watermark or not next_page_token:
+            return
+
+
+def stream_comments(youtube, video_details_response, watermark, emit):
+    """Fetch the comments of a video page by page, handing every page to emit(video, page).
+
+    Returns the newest top-level comment (None when there was no new one, or the comments are
+    disabled), or False if the comments could not be fetched; pages emitted before the error are kept.
+    """
+    video_id, video_title = video_details_response["id"], video_details_response["snippet"]["title"]
+    if CRAWL_MODE == "full":
+        pages = iter_comment_pages(youtube, video_id, MAX_COMMENTS_PER_VIDEO, replies=FETCH_REPLIES)
+    else:
+        pages = iter_comment_pages(youtube, video_id, MAX_COMMENTS_PER_VIDEO if watermark is None else None,
+                                   order="time", watermark=watermark, replies=FETCH_REPLIES)
+    newest = None
     try:
-        while True:
-            request = youtube.commentThreads().list(
-                part="snippet", videoId=video_id,
-                maxResults=min(max_results - len(comments_data_list), 100),
-                textFormat="plainText", pageToken=next_page_token, order="relevance"
-            )
-            response = request.execute()
-            for item in response["items"]:
-                comment_snippet = item["snippet"]["topLevelComment"]["snippet"]
-                published_at_str = comment_snippet.get("publishedAt")
-                published_at_dt = None
-                if published_at_str:
-                    try:
-                        published_at_dt = datetime.fromisoformat(published_at_str.replace("Z", "+00:00"))
-                    except ValueError:
-                        print(f"    Не удалось распознать дату комментария: {published_at_str}")
-
-                comments_data_list.append({
-                    "youtube_comment_id": item["id"],
-                    "author_username": comment_snippet["authorDisplayName"],
-                    "comment_text": comment_snippet["textDisplay"],
-                    "published_at": published_at_dt,
-                })
-                if len(comments_data_list) >= max_results: break
-            next_page_token = response.get("nextPageToken")
-            if not next_page_token or len(comments_data_list) >= max_results: break
-        return comments_data_list
+        for page in pages:
+            for comment in page:
+                if comment["parent_comment_id"] is None and comment["published_at"] and \
+                        (newest is None or comment["published_at"] > newest["published_at"]):
+                    newest = comment
+            if page:
+                emit(video_details_response, page)
+        return newest
+    except QuotaExhausted:
+        raise
     except HttpError as e:
         if e.resp.status == 403 and 'commentsDisabled' in str(e.content):
             print(f"  Комментарии для видео '{video_title}' (ID: {video_id}) отключены.")
+            return newest
         elif e.resp.status == 403:
             print(f"  Доступ к комментариям для видео '{video_title}' (ID: {video_id}) запрещен (403).")
         else:
             print(f"  Ошибка API при получении комментариев для видео '{video_title}' (ID: {video_id}): {e}")
-        return []
+        return False
+    except PipelineStopped:
+        raise
     except Exception as e:
         print(f"  Неожиданная ошибка при получении комментариев для видео '{video_title}' (ID: {video_id}): {e}")
-        return []
-
-
-def analyze_comment_sentiment_with_ai(comment_text: str):
-    stripped_text = comment_text.strip()
-    if not stripped_text: return CommentSentiment.NEUTRAL
-    if stripped_text in SENTIMENT_CACHE: return SENTIMENT_CACHE[stripped_text]
-
-    prompt = f"""Вы — эксперт по классификации эмоциональной окраски текста. Проанализируйте следующий комментарий с YouTube и определите его эмоциональный тон.
-Выберите одну метку из следующих категорий: ПОЗИТИВНЫЙ, НЕГАТИВНЫЙ, НЕЙТРАЛЬНЫЙ, РАЗОЧАРОВАННЫЙ, ЗЛОЙ, ВОСТОРЖЕННЫЙ, ГРУСТНЫЙ, БЛАГОДАРНЫЙ, НЕДОУМЕВАЮЩИЙ, САРКАСТИЧНЫЙ
-Комментарий: "{stripped_text}"
-Ответьте только меткой."""
-    try:
-        response = requests.post(AI_MODEL_ENDPOINT, json={"model": AI_MODEL_NAME, "prompt": prompt, "stream": False},
-                                 timeout=90)
-        if response.status_code == 200:
-            ai_response_raw = response.json().get("response", "").strip()
-            ai_response_value = ai_response_raw.upper()
-            sentiment_enum_val = CommentSentiment.UNKNOWN
-            try:
-                sentiment_enum_val = CommentSentiment(ai_response_value)
-            except ValueError:
-                print(f"    ИИ вернул неизвестный тег: '{ai_response_raw}'. Установлено НЕОПРЕДЕЛЕНО.")
-                sentiment_enum_val = CommentSentiment.UNKNOWN
-            SENTIMENT_CACHE[stripped_text] = sentiment_enum_val
-            return sentiment_enum_val
-        else:
-            print(f"    Ошибка от сервиса ИИ ({response.status_code}): {response.text}")
-            SENTIMENT_CACHE[stripped_text] = CommentSentiment.UNKNOWN
-            return CommentSentiment.UNKNOWN
-    except requests.exceptions.RequestException as e:
-        print(f"    Ошибка соединения с сервисом ИИ: {e}")
-    except Exception as e:
-        print(f"    Неожиданная ошибка во время анализа ИИ: {e}")
-    SENTIMENT_CACHE[stripped_text] = CommentSentiment.UNKNOWN  # Кэшируем ошибку как UNKNOWN
-    return CommentSentiment.UNKNOWN
-
-
-def process_new_youtube_data():
+        return False
+
+
+@dataclass
+class RunStats:
+    started_at: datetime = field(default_factory=datetime.now)
+    wall_seconds: float = 0.0
+    channels: int = 0
+    videos: int = 0
+    videos_skipped: int = 0
+    comments_fetched: int = 0  # replies included
+    replies_fetched: int = 0
+    new_comments: int = 0
+    comments_skipped: int = 0  # already stored
+    comments_failed: int = 0  # lost to a failed commit, fetched again next cycle
+    quota_spent: Counter = field(default_factory=Counter)
+    quota_exhausted: bool = False
+    http_cache: Counter = field(default_factory=Counter)  # see ResponseCache.counts
+
+    def report(self) -> str:
+        spent = ", ".join(f"{call_type}={units}" for call_type, units in sorted(self.quota_spent.items()))
+        return (f"Время цикла: {self.wall_seconds:.1f} с; каналов: {self.channels}, видео: {self.videos} "
+                f"(без изменений/не по расписанию: {self.videos_skipped}), "
+                f"получено комментариев: {self.comments_fetched} (ответов: {self.replies_fetched}), вставлено: {self.new_comments}, "
+                f"уже были в базе: {self.comments_skipped}"
+                + (f", не сохранено из-за ошибки: {self.comments_failed}" if self.comments_failed else "") + "; "
+                f"квота: {sum(self.quota_spent.values())} ед. ({spent or '-'}), "
+                f"осталось на сегодня: {youtube_quota.remaining}; "
+                f"из HTTP-кэша без запроса: {self.http_cache['fresh']}, не изменилось (304): {self.http_cache['not_modified']}"
+                + ("; цикл остановлен: квота исчерпана" if self.quota_exhausted else ""))
+
+
+def fetch_channel(youtube, channel_id):
+    uploads_playlist_id, channel_title = get_channel_uploads_playlist_id(youtube, channel_id)
+    if not uploads_playlist_id:
+        print(f"Не удалось получить плейлист для канала {channel_id}. Пропускаем.")
+        return channel_title, []
+    # Only uploads newer than last cycle's are read from the playlist; the rest of the window is known.
+    known = RECENT_UPLOADS.get(channel_id, [])
+    known_until = max((published_at for _, published_at in known if published_at), default=None)
+    new_uploads = get_video_ids_from_playlist(youtube, uploads_playlist_id, channel_title, VIDEOS_PER_CHANNEL,
+                                              known_until=known_until)
+    new_ids = {video_id for video_id, _ in new_uploads}
+    uploads = (new_uploads + [upload for upload in known if upload[0] not in new_ids])[:VIDEOS_PER_CHANNEL]
+    RECENT_UPLOADS[channel_id] = uploads
+    return channel_title, [video_id for video_id, _ in uploads]
+
+
+def _as_utc(value):
+    # SQLite hands timestamps back without tzinfo.
+    return value if value is None or value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def comment_count(video_details_response):
+    count = video_details_response.get("statistics", {}).get("commentCount")
+    return int(count) if count is not None else None
+
+
+def poll_interval(video_age: timedelta) -> timedelta:
+    """Every cycle during the first day, then once per cycle-length times the age in days."""
+    if video_age < timedelta(days=1):
+        return timedelta(0)
+    return min(MAX_POLL_INTERVAL, timedelta(minutes=RUN_EVERY_MINUTES) * (video_age / timedelta(days=1)))
+
+
+def crawl_due(state, video_details_response, now) -> bool:
+    if state is None or state.last_crawled_at is None:
+        return True
+    if state.comment_count is not None and state.comment_count == comment_count(video_details_response):
+        return False
+    published_at = parse_youtube_datetime(video_details_response["snippet"].get("publishedAt")) or now
+    # Half a cycle of slack, so a video due "every cycle" is not missed by a few seconds.
+    elapsed = now - _as_utc(state.last_crawled_at) + timedelta(minutes=RUN_EVERY_MINUTES) / 2
+    return elapsed >= poll_interval(now - published_at)
+
+
+def load_crawl_states(db, video_ids):
+    return {state.youtube_video_id: state for state in
+            db.query(VideoCrawlState).filter(VideoCrawlState.youtube_video_id.in_(video_ids))}
+
+
+def update_crawl_state(db, video_details_response, newest_comment, now):
+    # Looked up again: the session is emptied after every commit, so nothing is held across a cycle.
+    state = db.get(VideoCrawlState, video_details_response["id"])
+    if state is None:
+        state = VideoCrawlState(youtube_video_id=video_details_response["id"])
+        db.add(state)
+    snippet = video_details_response["snippet"]
+    state.youtube_channel_id = snippet.get("channelId")
+    state.video_published_at = parse_youtube_datetime(snippet.get("publishedAt"))
+    if newest_comment:
+        state.last_comment_published_at = newest_comment["published_at"]
+        state.last_comment_id = newest_comment["youtube_comment_id"]
+    state.comment_count = comment_count(video_details_response)
+    state.last_crawled_at = now
+
+
+def insert_ignoring_duplicates(db):
+    """INSERT ... ON CONFLICT (youtube_comment_id) DO NOTHING for the session's database."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(YoutubeComment.__table__).on_conflict_do_nothing(index_elements=["youtube_comment_id"])
+
+
+class PipelineStopped(Exception):
+    """The cycle was aborted while a fetch thread waited for room in the page buffer."""
+
+
+class CommentWriter:
+    """Stores the comments of one cycle: one IN query and one INSERT per page, a commit every
+    `batch_size` inserted rows (crawl state changes ride along in the same transaction). The session
+    is emptied after every commit, so it never holds more than one batch."""
+
+    def __init__(self, db, batch_size: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.inserted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.failed_videos = set()  # lost rows to a failed commit; their crawl state must not move
+        self._uncommitted = 0
+        self._batch_videos = set()
+
+    def add(self, video_details_response, comments_list) -> int:
+        video_id = video_details_response["id"]
+        video_title = video_details_response["snippet"]["title"]
+        by_id = {comment_data["youtube_comment_id"]: comment_data for comment_data in comments_list}
+        existing = set(self.db.scalars(select(YoutubeComment.youtube_comment_id)
+                                       .where(YoutubeComment.youtube_comment_id.in_(by_id))))
+        new_comments = [(comment_id, comment_data) for comment_id, comment_data in by_id.items()
+                        if comment_id not in existing]
+        rows = [{
+            "youtube_username": comment_data["author_username"],
+            "comment_text": comment_data["comment_text"],
+            "youtube_comment_id": comment_id,
+            "youtube_video_id": video_id,
+            "youtube_channel_id": video_details_response["snippet"]["channelId"],
+            "youtube_channel_title": video_details_response["snippet"]["channelTitle"],
+            "comment_published_at": comment_data["published_at"],
+            "topic": video_title,
+            "parent_comment_id": comment_data["parent_comment_id"],
+            "opinion_text": None,
+            "sentiment": None,  # pending: classified later by news_monitor.sentiment_worker
+        } for comment_id, comment_data in new_comments]
+
+        inserted = 0
+        if rows:
+            # ON CONFLICT covers a row another process inserted since the IN query.
+            stmt = insert_ignoring_duplicates(self.db).values(rows).returning(YoutubeComment.youtube_comment_id)
+            inserted = len(self.db.execute(stmt).all())
+            self._batch_videos.add(video_id)
+        self.skipped += len(comments_list) - inserted
+        self._uncommitted += inserted
+        if inserted:
+            print(f"    Для видео '{video_title[:50]}...' добавлено {inserted} новых комментариев.")
+        if self._uncommitted >= self.batch_size:
+            self.commit()
+        return inserted
+
+    def commit(self):
+        try:
+            self.db.commit()
+            self.db.expunge_all()
+            self.inserted += self._uncommitted
+            self._uncommitted = 0
+            self._batch_videos.clear()
+        except Exception as e_commit:
+            print(f"Ошибка при коммите пакета из {self._uncommitted} комментариев: {e_commit}")
+            self.rollback()
+
+    def rollback(self):
+        self.db.rollback()
+        self.failed += self._uncommitted
+        self._uncommitted = 0
+        self.failed_videos |= self._batch_videos
+        self._batch_videos.clear()
+
+
+def process_new_youtube_data(youtube=None, workers: int = FETCH_WORKERS, channel_ids=None) -> RunStats:
+    """One monitoring cycle over `channel_ids` (all of CHANNEL_IDS by default).
+
+    API calls run on `workers` threads: channels first, then video metadata in batched
+    videos.list calls, then the comments of each video. Comments stream back a page at a time
+    through a buffer of PIPELINE_BUFFER_PAGES pages and are stored on the calling thread, because the
+    session is not shared between threads; a fetch thread waits while the buffer is full, so memory
+    does not grow with the size of a video. Once the quota is spent no new calls are made, but
+    whatever was already fetched is still saved. Sentiment is left pending for the worker.
+    """
     print(f"[{datetime.now()}] Запуск задачи мониторинга YouTube...")
-    youtube = get_youtube_service()
+    stats = RunStats()
+    youtube = youtube or get_youtube_service()
     if not youtube:
         print(f"[{datetime.now()}] Не удалось инициализировать YouTube сервис. Пропуск цикла.")
-        return
+        return stats
 
+    started = time.monotonic()
+    usage = RunUsage()
     db_session_gen = get_db()
     db = next(db_session_gen)
-    processed_videos_count = 0
-    new_comments_count = 0
+    writer = CommentWriter(db, COMMIT_BATCH_SIZE)
 
     try:
-        for channel_id_to_monitor in CHANNEL_IDS:
-            uploads_playlist_id, current_channel_title_api = get_channel_uploads_playlist_id(youtube,
-                                                                                             channel_id_to_monitor)
-            if not uploads_playlist_id:
-                print(f"Не удалось получить плейлист для канала {channel_id_to_monitor}. Пропускаем.")
-                continue
-            print(f"Канал: '{current_channel_title_api}' (ID: {channel_id_to_monitor})")
-
-            video_ids = get_video_ids_from_playlist(youtube, uploads_playlist_id, current_channel_title_api,
-                                                    VIDEOS_PER_CHANNEL)
-            if not video_ids: continue
-
-            for i, video_id in enumerate(video_ids, 1):
-                video_details_response = get_video_details(youtube, video_id)
-                if not video_details_response: continue
-
-                processed_videos_count += 1
-                video_title = video_details_response["snippet"]["title"]
-                video_channel_id_api = video_details_response["snippet"]["channelId"]
-                video_channel_title_api = video_details_response["snippet"]["channelTitle"]
-                default_topic_for_video = video_title
-
-                comments_list = get_video_comments(youtube, video_id, video_title, MAX_COMMENTS_PER_VIDEO)
-                if not comments_list: continue
-
-                current_video_new_comments = 0
-                for comment_data in comments_list:
-                    existing_comment = db.query(YoutubeComment).filter_by(
-                        youtube_comment_id=comment_data["youtube_comment_id"]).first()
-                    if existing_comment: continue
-
-                    analyzed_sentiment = analyze_comment_sentiment_with_ai(comment_data["comment_text"])
-                    new_db_comment = YoutubeComment(
-                        youtube_username=comment_data["author_username"],
-                        comment_text=comment_data["comment_text"],
-                        youtube_comment_id=comment_data["youtube_comment_id"],
-                        youtube_video_id=video_id,
-                        youtube_channel_id=video_channel_id_api,
-                        youtube_channel_title=video_channel_title_api,
-                        comment_published_at=comment_data["published_at"],
-                        topic=default_topic_for_video,
-                        opinion_text=None,
-                        sentiment=analyzed_sentiment
-                    )
-                    db.add(new_db_comment)
-                    new_comments_count += 1
-                    current_video_new_comments += 1
-
-                if current_video_new_comments > 0:
-                    print(
-                        f"    Для видео '{video_title[:50]}...' добавлено {current_video_new_comments} новых комментариев.")
-
-                if current_video_new_comments > 0:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="youtube-fetch",
+                                initializer=start_fetch_thread, initargs=(usage,)) as pool:
+            # future -> (kind, payload): ("channel", channel_id), ("details", None) or ("comments", video)
+            pending = {}
+            # Finished futures and comment pages, in the order they happen. Only pages take a slot:
+            # a future's pages always come before the future itself.
+            events = queue.Queue()
+            page_slots = threading.Semaphore(PIPELINE_BUFFER_PAGES)
+            stopping = threading.Event()
+
+            def submit(kind, payload, fn, *args):
+                future = pool.submit(fn, *args)
+                pending[future] = (kind, payload)
+                future.add_done_callback(lambda f: events.put(("done", f)))
+
+            def emit(video_details_response, page):  # on a fetch thread
+                while not page_slots.acquire(timeout=1):
+                    if stopping.is_set():
+                        raise PipelineStopped()
+                events.put(("page", video_details_response, page))
+
+            for channel_id in (CHANNEL_IDS if channel_ids is None else channel_ids):
+                submit("channel", channel_id, fetch_channel, youtube, channel_id)
+            # Ids from all channels share videos.list calls of up to VIDEO_BATCH_SIZE.
+            video_ids, queued = [], set()
+            try:
+                while pending:
+                    event = events.get()
+                    if event[0] == "page":
+                        _, video_details_response, page = event
+                        try:
+                            stats.comments_fetched += len(page)
+                            stats.replies_fetched += sum(c["parent_comment_id"] is not None for c in page)
+                            writer.add(video_details_response, page)
+                        finally:
+                            page_slots.release()
+                        continue
+
+                    future = event[1]
+                    kind, payload = pending.pop(future)
                     try:
-                        db.commit()
-                    except Exception as e_commit:
-                        print(f"Ошибка при коммите для видео '{video_title[:50]}...': {e_commit}")
-                        db.rollback()
-
+                        result = future.result()
+                    except QuotaExhausted as e:
+                        if not stats.quota_exhausted:
+                            print(f"Остановка цикла: {e}")
+                        stats.quota_exhausted = True
+                        result = False  # nothing fetched, and for comments not a finished crawl either
+
+                    if kind == "comments":
+                        # None is a finished crawl with no new top-level comment: the state still records
+                        # the comment count and crawl time. False means it failed and is tried again next
+                        # cycle, and so is a video that lost a page to a failed commit: its watermark stays.
+                        if result is not False and CRAWL_MODE != "full" and payload["id"] not in writer.failed_videos:
+                            update_crawl_state(db, payload, result, datetime.now(timezone.utc))
+                    elif not result:
+                        pass
+                    elif kind == "channel":
+                        channel_title, channel_video_ids = result
+                        stats.channels += 1
+                        print(f"Канал: '{channel_title}' (ID: {payload}), видео к проверке: {len(channel_video_ids)}")
+                        video_ids += [video_id for video_id in channel_video_ids if video_id not in queued]
+                        queued.update(channel_video_ids)
+                    elif kind == "details":
+                        incremental = CRAWL_MODE != "full"
+                        states = load_crawl_states(db, [video["id"] for video in result]) if incremental else {}
+                        now = datetime.now(timezone.utc)
+                        for video_details_response in result:
+                            stats.videos += 1
+                            state = states.get(video_details_response["id"])
+                            if incremental and not crawl_due(state, video_details_response, now):
+                                stats.videos_skipped += 1
+                                continue
+                            watermark = (_as_utc(state.last_comment_published_at), state.last_comment_id) \
+                                if state else None
+                            submit("comments", video_details_response, stream_comments, youtube,
+                                   video_details_response, watermark, emit)
+
+                    channels_pending = any(kind == "channel" for kind, _ in pending.values())
+                    while len(video_ids) >= VIDEO_BATCH_SIZE or (video_ids and not channels_pending):
+                        batch, video_ids = video_ids[:VIDEO_BATCH_SIZE], video_ids[VIDEO_BATCH_SIZE:]
+                        submit("details", None, get_video_details, youtube, batch)
+            finally:
+                stopping.set()  # lets fetch threads waiting for a page slot give up
+
+        writer.commit()
         print(f"\n[{datetime.now()}] Задача мониторинга YouTube завершена.")
-        print(f"Обработано видео: {processed_videos_count}, Добавлено новых комментариев: {new_comments_count}")
 
     except Exception as e:
         print(f"Произошла глобальная ошибка в задаче мониторинга: {e}")
-        if db.is_active: db.rollback()
+        writer.rollback()
     finally:
         if db.is_active: db.close()
+        stats.new_comments, stats.comments_skipped = writer.inserted, writer.skipped
+        stats.comments_failed = writer.failed
+        stats.wall_seconds = time.monotonic() - started
+        stats.quota_spent = Counter(usage.quota_spent)
+        stats.http_cache = Counter(usage.http_cache)
+        print(stats.report())
+    return stats
 
 
 if __name__ == "__main__":
     if API_KEY == "AIzaSyDFVqojCYx50An" or API_KEY == "ВАШ_API_КЛЮЧ":
         print("ПОЖАЛУЙСТА, УКАЖИТЕ ВАШ ДЕЙСТВИТЕЛЬНЫЙ YouTube API_KEY В СКРИПТЕ.")
         exit(1)
-    if not CHANNEL_IDS:
-        print("Пожалуйста, укажите хотя бы один CHANNEL_ID в списке CHANNEL_IDS.")
-        exit(1)
-
-    create_db_tables()
-
-    print(f"Планировщик настроен на запуск задачи каждые {RUN_EVERY_MINUTES} минут.")
-    print("Первый запуск задачи мониторинга...")
-    process_new_youtube_data()
-
-    schedule.every(RUN_EVERY_MINUTES).minutes.do(process_new_youtube_data)
 
-    print("Скрипт запущен. Для остановки нажмите Ctrl+C.")
-    try:
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("\nПолучен сигнал прерывания. Завершение работы...")
-    except Exception as e:
-        print(f"Непредвиденная ошибка в основном цикле: {e}")
-    finally:
-        print("Скрипт остановлен.")
\ No newline at end of file
+    # Channels are scheduled one by one, and can be sharded across processes; see news_monitor/scheduler.py.
+    from news_monitor.scheduler import main
+    main()
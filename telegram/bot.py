@@ -1,5 +1,9 @@
+import asyncio
+import bisect
 import logging
 import os
+import time
+from collections import defaultdict
 from datetime import datetime
 
 import httpx
@@ -20,6 +24,28 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CENTRAL_API_URL = os.getenv("CENTRAL_API_URL", "http://localhost:8000/submit-issue/")
 CENTRAL_API_GET_ISSUES_URL = os.getenv("CENTRAL_API_GET_ISSUES_URL",
                                        "http://localhost:8000/issues/")
+CENTRAL_API_STATUS_URL = os.getenv("CENTRAL_API_STATUS_URL", "http://localhost:8000/issues/status/")
+# The API saves a complaint and answers at once; the analysis result is polled for (one batched request
+# for all waiting complaints every ANALYSIS_POLL_SECONDS) and sent to the chat when it is ready.
+# false: wait for the analysis inside the submit request, as before.
+ASYNC_SUBMIT = os.getenv("CENTRAL_API_ASYNC_SUBMIT", "true").lower() in ("1", "true", "yes")
+ANALYSIS_POLL_SECONDS = float(os.getenv("ANALYSIS_POLL_SECONDS", 3))
+ANALYSIS_WAIT_MINUTES = float(os.getenv("ANALYSIS_WAIT_MINUTES", 30))
+STATUS_BATCH = 100  # ids per /issues/status/ request
+# Complaints whose analysis has not been sent yet, kept on disk so a restart of the bot does not drop them.
+PENDING_ANALYSES_FILE = os.getenv("PENDING_ANALYSES_FILE", "pending_analyses.json")
+
+# One client for the whole bot (see post_init): connections to the central API are kept alive and
+# reused between messages instead of a new TCP connection per interaction.
+API_MAX_CONNECTIONS = int(os.getenv("CENTRAL_API_MAX_CONNECTIONS", 20))
+API_MAX_KEEPALIVE = int(os.getenv("CENTRAL_API_MAX_KEEPALIVE", 10))
+API_KEEPALIVE_SECONDS = float(os.getenv("CENTRAL_API_KEEPALIVE_SECONDS", 30))
+API_HTTP2 = os.getenv("CENTRAL_API_HTTP2", "false").lower() in ("1", "true", "yes")  # needs httpx[http2]
+# A synchronous submit waits for the LLM analysis; everything else is a plain query and should fail fast.
+SUBMIT_TIMEOUT = httpx.Timeout(float(os.getenv("CENTRAL_API_SUBMIT_TIMEOUT_SECONDS", 10 if ASYNC_SUBMIT else 70)),
+                               connect=5.0, pool=5.0)
+ISSUES_TIMEOUT = httpx.Timeout(float(os.getenv("CENTRAL_API_ISSUES_TIMEOUT_SECONDS", 5)), connect=2.0, pool=2.0)
+LATENCY_LOG_SECONDS = float(os.getenv("CENTRAL_API_LATENCY_LOG_SECONDS", 300))
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -30,8 +56,179 @@ CHOOSE_ACTION, GET_COMPLAINT = range(2)
 
 SUBMISSION_TYPE_KEY = "submission_type"
 COMPLAINT_KEYWORD_RU = "жалоба"
+API_CLIENT_KEY = "api_client"
+PENDING_ANALYSES_KEY = "pending_analyses"  # issue id -> {"chat_id", "source_user_id", "submitted_at" (time.time())}
+
+
+class LatencyHistogram:
+    """Call latencies per endpoint in fixed buckets, logged every LATENCY_LOG_SECONDS and on shutdown."""
+
+    BOUNDS_MS = [25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+    def __init__(self):
+        self.buckets = defaultdict(lambda: [0] * (len(self.BOUNDS_MS) + 1))
+        self.errors = defaultdict(int)
+        self.max_ms = defaultdict(float)
+
+    def observe(self, endpoint: str, seconds: float, error: bool = False):
+        ms = seconds * 1000
+        self.buckets[endpoint][bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.errors[endpoint] += error
+        self.max_ms[endpoint] = max(self.max_ms[endpoint], ms)
+
+    def percentile(self, endpoint: str, q: float) -> str:
+        counts = self.buckets[endpoint]
+        rank, seen = q * sum(counts), 0
+        for index, count in enumerate(counts):
+            seen += count
+            if count and seen >= rank:
+                return f"<={self.BOUNDS_MS[index]}ms" if index < len(self.BOUNDS_MS) else f">{self.BOUNDS_MS[-1]}ms"
+        return "-"
+
+    def summary(self) -> str:
+        lines = []
+        for endpoint, counts in sorted(self.buckets.items()):
+            spread = " ".join(f"{label}:{count}" for label, count in
+                              zip([f"<={bound}" for bound in self.BOUNDS_MS] + [f">{self.BOUNDS_MS[-1]}"], counts) if count)
+            lines.append(f"{endpoint}: n={sum(counts)} errors={self.errors[endpoint]} "
+                         f"p50 {self.percentile(endpoint, 0.5)} p95 {self.percentile(endpoint, 0.95)} "
+                         f"max {self.max_ms[endpoint]:.0f}ms [{spread}]")
+        return "\n".join(lines)
+
+
+api_latency = LatencyHistogram()
+
+
+async def call_api(bot_data: dict, endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a request through the shared client and record its latency under `endpoint`."""
+    client: httpx.AsyncClient = bot_data[API_CLIENT_KEY]
+    started = time.perf_counter()
+    error = True
+    try:
+        response = await client.request(method, url, **kwargs)
+        error = response.is_error
+        return response
+    finally:
+        api_latency.observe(endpoint, time.perf_counter() - started, error)
+
+
+async def log_latency_periodically():
+    while True:
+        await asyncio.sleep(LATENCY_LOG_SECONDS)
+        if api_latency.buckets:
+            logger.info("Central API latency:\n%s", api_latency.summary())
+
+
+def analysis_summary(api_status: str, llm_error, department, complaint_type) -> str:
+    if llm_error:
+        return f"\n\n⚠️ Не удалось полностью автоматически проанализировать жалобу. Причина: {llm_error[:200]}"
+    if department:
+        return f"\n\nАнализ: Ведомство - {department}, Тип - {complaint_type or 'не определен'}."
+    if api_status == "analysis_failed":
+        return "\n\nАнализ: Не удалось определить ответственное ведомство по тексту."
+    if api_status != "analyzed":
+        return "\nЖалоба принята, но автоматический анализ не был успешно завершен."
+    return ""
+
+
+def load_pending_analyses(path: str = PENDING_ANALYSES_FILE) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {int(issue_id): entry for issue_id, entry in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read pending analyses from {path}, starting without them: {e}")
+        return {}
+
+
+def save_pending_analyses(pending: dict, path: str = PENDING_ANALYSES_FILE) -> None:
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({str(issue_id): entry for issue_id, entry in pending.items()}, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logger.error(f"Could not save pending analyses to {path}: {e}")
+
+
+async def push_finished_analyses(application: Application) -> None:
+    """Send finished analyses from the API to the chats that are waiting for them."""
+    pending = application.bot_data[PENDING_ANALYSES_KEY]
+    waiting = list(pending)
+    for start in range(0, len(waiting), STATUS_BATCH):
+        batch = waiting[start:start + STATUS_BATCH]
+        params = {"ids": batch, "source_user_ids": [pending[issue_id]["source_user_id"] for issue_id in batch]}
+        response = await call_api(application.bot_data, "GET /issues/status/", "GET", CENTRAL_API_STATUS_URL,
+                                  params=params, timeout=ISSUES_TIMEOUT)
+        response.raise_for_status()
+        for item in response.json():
+            if item["status"] == "pending_analysis" or item["id"] not in pending:
+                continue
+            chat_id = pending.pop(item["id"])["chat_id"]
+            save_pending_analyses(pending)
+            text = f"Анализ жалобы #{item['id']} завершён (Статус: {item['status']})." + analysis_summary(
+                item["status"], item.get("llm_processing_error"), item.get("responsible_department"),
+                item.get("complaint_type"))
+            try:
+                await application.bot.send_message(chat_id, text)
+            except Exception as e:
+                logger.error(f"Could not send the analysis of issue {item['id']} to chat {chat_id}: {e}")
+
+    given_up = [issue_id for issue_id, entry in pending.items()
+                if time.time() - entry["submitted_at"] > ANALYSIS_WAIT_MINUTES * 60]
+    for issue_id in given_up:
+        chat_id = pending.pop(issue_id)["chat_id"]
+        save_pending_analyses(pending)
+        logger.warning(f"Analysis of issue {issue_id} not finished after {ANALYSIS_WAIT_MINUTES} minutes")
+        try:
+            await application.bot.send_message(
+                chat_id, f"Анализ жалобы #{issue_id} занимает больше времени, чем обычно. "
+                         f"Жалоба сохранена; статус можно посмотреть командой /my_submissions.")
+        except Exception as e:
+            logger.error(f"Could not notify chat {chat_id} about issue {issue_id}: {e}")
 
 
+async def poll_analyses_periodically(application: Application):
+    while True:
+        await asyncio.sleep(ANALYSIS_POLL_SECONDS)
+        if not application.bot_data[PENDING_ANALYSES_KEY]:
+            continue
+        try:
+            await push_finished_analyses(application)
+        except Exception as e:
+            logger.warning(f"Polling analysis statuses failed, retrying in {ANALYSIS_POLL_SECONDS}s: {e}")
+
+
+async def post_init(application: Application) -> None:
+    limits = httpx.Limits(max_connections=API_MAX_CONNECTIONS, max_keepalive_connections=API_MAX_KEEPALIVE,
+                          keepalive_expiry=API_KEEPALIVE_SECONDS)
+    try:
+        client = httpx.AsyncClient(limits=limits, http2=API_HTTP2, timeout=ISSUES_TIMEOUT)
+    except ImportError:
+        logger.warning("CENTRAL_API_HTTP2 is set but the h2 package is missing (pip install 'httpx[http2]'); "
+                       "using HTTP/1.1")
+        client = httpx.AsyncClient(limits=limits, timeout=ISSUES_TIMEOUT)
+    application.bot_data[API_CLIENT_KEY] = client
+    application.bot_data["latency_task"] = asyncio.create_task(log_latency_periodically())
+    application.bot_data[PENDING_ANALYSES_KEY] = load_pending_analyses()
+    if application.bot_data[PENDING_ANALYSES_KEY]:
+        logger.info(f"Waiting for {len(application.bot_data[PENDING_ANALYSES_KEY])} analyses from before the restart")
+    application.bot_data["analysis_poll_task"] = asyncio.create_task(poll_analyses_periodically(application))
+
+
+async def post_shutdown(application: Application) -> None:
+    for key in ("latency_task", "analysis_poll_task"):
+        task = application.bot_data.pop(key, None)
+        if task:
+            task.cancel()
+    pending = application.bot_data.get(PENDING_ANALYSES_KEY)
+    if pending:
+        logger.info(f"Shutting down with {len(pending)} analyses not yet delivered; they are sent after the restart")
+    client = application.bot_data.pop(API_CLIENT_KEY, None)
+    if client:
+        await client.aclose()
+    if api_latency.buckets:
+        logger.info("Central API latency:\n%s", api_latency.summary())
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -87,52 +284,52 @@ async def process_submission(update: Update, context: ContextTypes.DEFAULT_TYPE)
     api_response_message = ""
     saved_record_id = None
 
-    async with httpx.AsyncClient(timeout=70.0) as client:
-        try:
-            logger.info(f"Sending to API: {CENTRAL_API_URL} with payload: {payload}")
-            response = await client.post(CENTRAL_API_URL, json=payload)
-            response.raise_for_status()
-
-            api_data = response.json()
-            logger.info(f"API Response for user {user.id}: {api_data}")
-
-            saved_record_id = api_data.get("saved_record_id")
-            api_status = api_data.get("status", "unknown")
-            llm_error = api_data.get("llm_processing_error")
-            analysis_results = api_data.get("analysis")
-
+    try:
+        logger.info(f"Sending to API: {CENTRAL_API_URL} with payload: {payload}")
+        response = await call_api(context.bot_data, "POST /submit-issue/", "POST", CENTRAL_API_URL, json=payload,
+                                  params={"wait_for_analysis": str(not ASYNC_SUBMIT).lower()}, timeout=SUBMIT_TIMEOUT)
+        response.raise_for_status()
+
+        api_data = response.json()
+        logger.info(f"API Response for user {user.id}: {api_data}")
+
+        saved_record_id = api_data.get("saved_record_id")
+        api_status = api_data.get("status", "unknown")
+        llm_error = api_data.get("llm_processing_error")
+        analysis_results = api_data.get("analysis")
+
+        if api_status == "pending_analysis":
+            pending = context.bot_data[PENDING_ANALYSES_KEY]
+            pending[saved_record_id] = {"chat_id": update.effective_chat.id, "source_user_id": str(user.id),
+                                        "submitted_at": time.time()}
+            save_pending_analyses(pending)
+            api_response_message = (f"Спасибо! Ваша {COMPLAINT_KEYWORD_RU} принята (ID: #{saved_record_id}). "
+                                    f"Результат анализа пришлём сюда, как только он будет готов.")
+        else:
+            analysis_results = analysis_results or {}
             api_response_message = f"Спасибо! Ваша {COMPLAINT_KEYWORD_RU} принята (ID: #{saved_record_id}, Статус: {api_status})."
-
-            if llm_error:
-                api_response_message += f"\n\n⚠️ Не удалось полностью автоматически проанализировать жалобу. Причина: {llm_error[:200]}"
-            elif analysis_results and analysis_results.get("responsible_department"):
-                dept = analysis_results.get("responsible_department")
-                comp_type = analysis_results.get("complaint_type", "не определен")  # e.g. личная / общегражданская
-                api_response_message += f"\n\nАнализ: Ведомство - {dept}, Тип - {comp_type}."
-            elif api_status == "analysis_failed" and not llm_error:
-                api_response_message += "\n\nАнализ: Не удалось определить ответственное ведомство по тексту."
-            elif api_status != "analyzed":
-                api_response_message += "\nЖалоба принята, но автоматический анализ не был успешно завершен."
+            api_response_message += analysis_summary(api_status, llm_error, analysis_results.get("responsible_department"),
+                                                     analysis_results.get("complaint_type"))  # e.g. личная / общегражданская
 
 
-        except httpx.HTTPStatusError as e:
-            error_detail = "Неизвестная ошибка API."
-            try:
-                error_content = e.response.json()
-                error_detail = error_content.get("detail", {}).get("message", e.response.text[:200]) \
-                    if isinstance(error_content.get("detail"), dict) \
-                    else error_content.get("detail", e.response.text[:200])
-            except json.JSONDecodeError:
-                error_detail = e.response.text[:200]
-            logger.error(f"HTTPStatusError calling API for user {user.id}: {e.response.status_code} - {error_detail}",
-                         exc_info=True)
-            api_response_message = f"Ошибка при отправке данных в систему ({e.response.status_code}): {error_detail}"
-        except httpx.RequestError as e:
-            logger.error(f"RequestError calling API for user {user.id}: {str(e)}", exc_info=True)
-            api_response_message = f"Ошибка подключения к системе обработки заявок: {str(e)}"
-        except Exception as e:
-            logger.error(f"Unexpected error processing submission for user {user.id}: {e}", exc_info=True)
-            api_response_message = "Произошла непредвиденная ошибка. Пожалуйста, попробуйте позже."
+    except httpx.HTTPStatusError as e:
+        error_detail = "Неизвестная ошибка API."
+        try:
+            error_content = e.response.json()
+            error_detail = error_content.get("detail", {}).get("message", e.response.text[:200]) \
+                if isinstance(error_content.get("detail"), dict) \
+                else error_content.get("detail", e.response.text[:200])
+        except json.JSONDecodeError:
+            error_detail = e.response.text[:200]
+        logger.error(f"HTTPStatusError calling API for user {user.id}: {e.response.status_code} - {error_detail}",
+                     exc_info=True)
+        api_response_message = f"Ошибка при отправке данных в систему ({e.response.status_code}): {error_detail}"
+    except httpx.RequestError as e:
+        logger.error(f"RequestError calling API for user {user.id}: {str(e)}", exc_info=True)
+        api_response_message = f"Ошибка подключения к системе обработки заявок: {str(e)}"
+    except Exception as e:
+        logger.error(f"Unexpected error processing submission for user {user.id}: {e}", exc_info=True)
+        api_response_message = "Произошла непредвиденная ошибка. Пожалуйста, попробуйте позже."
 
     await update.message.reply_text(api_response_message)
 
@@ -157,84 +354,84 @@ async def my_submissions_command(update: Update, context: ContextTypes.DEFAULT_T
         "source_user_id": str(user.id)
     }
 
-    async with httpx.AsyncClient() as client:
-        try:
-            logger.info(
-                f"Fetching submissions for user {user.id} from {CENTRAL_API_GET_ISSUES_URL} with params {params}")
-            response = await client.get(CENTRAL_API_GET_ISSUES_URL, params=params)
-            response.raise_for_status()
-            submissions_list = response.json()
-
-            if not submissions_list:
-                await update.message.reply_text("У вас пока нет зарегистрированных жалоб.")
-                return
-
-            response_parts = []
-            current_message = "Ваши заявки:\n\n"
-            MAX_MESSAGE_LENGTH = 4096
-
-            for sub_data in submissions_list:
-                text_preview = (sub_data['original_complaint_text'][:75] + '...') if len(
-                    sub_data['original_complaint_text']) > 75 else sub_data['original_complaint_text']
-
-                entry = (
-                    f"<b>ID:</b> {sub_data['id']}\n"
-                    f"<b>Тип:</b> {sub_data.get('submission_type_by_user', 'жалоба')}\n"
-                    f"<b>Статус:</b> {sub_data['status']}\n"
-                    f"<b>Текст:</b> {text_preview}\n"
-                )
-
-                if sub_data.get('responsible_department'):
-                    entry += f"<b>Отв. ведомство (анализ):</b> {sub_data['responsible_department']}\n"
-                if sub_data.get('complaint_type'):
-                    entry += f"<b>Тип (анализ):</b> {sub_data['complaint_type']}\n"
-                if sub_data.get('complaint_category'):
-                    entry += f"<b>Категория (анализ):</b> {sub_data['complaint_category']}\n"
-                if sub_data.get('address_text'):
-                    entry += f"<b>Адрес (анализ):</b> {sub_data['address_text'][:50]}...\n"
-                if sub_data.get('severity_level'):
-                    entry += f"<b>Серьезность (анализ):</b> {sub_data['severity_level']}\n"
-                if sub_data.get('llm_processing_error'):
-                    entry += f"<b>Ошибка анализа:</b> {sub_data['llm_processing_error'][:70]}...\n"
-
-                created_at_str = 'N/A'
-                if sub_data.get('created_at'):
-                    try:
-                        dt_obj = datetime.fromisoformat(sub_data['created_at'].replace('Z', '+00:00'))
-                        created_at_str = dt_obj.strftime('%Y-%m-%d %H:%M')
-                    except ValueError:
-                        created_at_str = sub_data['created_at']
-
-                entry += f"<b>Дата:</b> {created_at_str}\n\n"
-
-                if len(current_message) + len(entry) > MAX_MESSAGE_LENGTH:
-                    response_parts.append(current_message)
-                    current_message = ""
-                current_message += entry
-
-            if current_message and current_message.strip() != "Ваши заявки:\n\n":
+    try:
+        logger.info(
+            f"Fetching submissions for user {user.id} from {CENTRAL_API_GET_ISSUES_URL} with params {params}")
+        response = await call_api(context.bot_data, "GET /issues/", "GET", CENTRAL_API_GET_ISSUES_URL, params=params,
+                                  timeout=ISSUES_TIMEOUT)
+        response.raise_for_status()
+        submissions_list = response.json()
+
+        if not submissions_list:
+            await update.message.reply_text("У вас пока нет зарегистрированных жалоб.")
+            return
+
+        response_parts = []
+        current_message = "Ваши заявки:\n\n"
+        MAX_MESSAGE_LENGTH = 4096
+
+        for sub_data in submissions_list:
+            text_preview = (sub_data['original_complaint_text'][:75] + '...') if len(
+                sub_data['original_complaint_text']) > 75 else sub_data['original_complaint_text']
+
+            entry = (
+                f"<b>ID:</b> {sub_data['id']}\n"
+                f"<b>Тип:</b> {sub_data.get('submission_type_by_user', 'жалоба')}\n"
+                f"<b>Статус:</b> {sub_data['status']}\n"
+                f"<b>Текст:</b> {text_preview}\n"
+            )
+
+            if sub_data.get('responsible_department'):
+                entry += f"<b>Отв. ведомство (анализ):</b> {sub_data['responsible_department']}\n"
+            if sub_data.get('complaint_type'):
+                entry += f"<b>Тип (анализ):</b> {sub_data['complaint_type']}\n"
+            if sub_data.get('complaint_category'):
+                entry += f"<b>Категория (анализ):</b> {sub_data['complaint_category']}\n"
+            if sub_data.get('address_text'):
+                entry += f"<b>Адрес (анализ):</b> {sub_data['address_text'][:50]}...\n"
+            if sub_data.get('severity_level'):
+                entry += f"<b>Серьезность (анализ):</b> {sub_data['severity_level']}\n"
+            if sub_data.get('llm_processing_error'):
+                entry += f"<b>Ошибка анализа:</b> {sub_data['llm_processing_error'][:70]}...\n"
+
+            created_at_str = 'N/A'
+            if sub_data.get('created_at'):
+                try:
+                    dt_obj = datetime.fromisoformat(sub_data['created_at'].replace('Z', '+00:00'))
+                    created_at_str = dt_obj.strftime('%Y-%m-%d %H:%M')
+                except ValueError:
+                    created_at_str = sub_data['created_at']
+
+            entry += f"<b>Дата:</b> {created_at_str}\n\n"
+
+            if len(current_message) + len(entry) > MAX_MESSAGE_LENGTH:
                 response_parts.append(current_message)
+                current_message = ""
+            current_message += entry
 
-            if not response_parts:
-                await update.message.reply_text("Не удалось сформировать список ваших заявок.")
-                return
+        if current_message and current_message.strip() != "Ваши заявки:\n\n":
+            response_parts.append(current_message)
 
-            for part in response_parts:
-                await update.message.reply_html(part)
+        if not response_parts:
+            await update.message.reply_text("Не удалось сформировать список ваших заявок.")
+            return
 
-            logger.info(f"User {user.id} viewed their submissions. Count: {len(submissions_list)}")
+        for part in response_parts:
+            await update.message.reply_html(part)
 
-        except httpx.HTTPStatusError as e:
-            logger.error(
-                f"HTTPStatusError fetching submissions for user {user.id}: {e.response.status_code} - {e.response.text[:200]}",
-                exc_info=True)
-            await update.message.reply_text("Произошла ошибка при загрузке ваших заявок (сервер вернул ошибку).")
-        except httpx.RequestError as e:
-            logger.error(f"RequestError fetching submissions for user {user.id}: {str(e)}", exc_info=True)
-            await update.message.reply_text("Произошла ошибка подключения при загрузке ваших заявок.")
-        except Exception as e:
-            logger.error(f"Unexpected error fetching submissions for user {user.id}: {e}", exc_info=True)
-            await update.message.reply_text("Произошла непредвиденная ошибка при загрузке ваших заявок.")
+        logger.info(f"User {user.id} viewed their submissions. Count: {len(submissions_list)}")
+
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            f"HTTPStatusError fetching submissions for user {user.id}: {e.response.status_code} - {e.response.text[:200]}",
+            exc_info=True)
+        await update.message.reply_text("Произошла ошибка при загрузке ваших заявок (сервер вернул ошибку).")
+    except httpx.RequestError as e:
+        logger.error(f"RequestError fetching submissions for user {user.id}: {str(e)}", exc_info=True)
+        await update.message.reply_text("Произошла ошибка подключения при загрузке ваших заявок.")
+    except Exception as e:
+        logger.error(f"Unexpected error fetching submissions for user {user.id}: {e}", exc_info=True)
+        await update.message.reply_text("Произошла непредвиденная ошибка при загрузке ваших заявок.")
 
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -277,7 +474,8 @@ def main() -> None:
         logger.error("CENTRAL_API_GET_ISSUES_URL не найден в .env файле. Бот не сможет получать список заявок.")
         return
 
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = (Application.builder().token(TELEGRAM_BOT_TOKEN)
+                   .post_init(post_init).post_shutdown(post_shutdown).build())
 
     keywords_regex = f"^({COMPLAINT_KEYWORD_RU})$"
 
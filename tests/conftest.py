@@ -1,3 +1,11 @@
+import os
+import tempfile
+import time
+
+os.environ.setdefault("RUN_MIGRATIONS_ON_STARTUP", "false")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("JWT_KEYS_DIR", tempfile.mkdtemp(prefix="kopuro-jwt-keys-"))
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -9,6 +17,13 @@ from auth.core.config import settings
 from auth.schemas import user_schemas
 from auth.db import crud
 from auth.core.security import get_password_hash
+from auth.core.user_cache import user_cache
+from auth.core import rate_limit
+from auth.core.revocation import revocation_list
+from auth.core import keys
+
+if not keys.key_names(settings.JWT_KEYS_DIR):
+    keys.generate_key(settings.JWT_KEYS_DIR)
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
@@ -31,6 +46,9 @@ app.dependency_overrides[get_db] = override_get_db
 @pytest.fixture(scope="function")
 def db_session():
     Base.metadata.create_all(bind=engine) # Create tables
+    user_cache.clear()
+    rate_limit.reset()
+    revocation_list.clear()
     db = TestingSessionLocal()
     try:
         yield db
@@ -41,6 +59,11 @@ def db_session():
 @pytest.fixture(scope="function")
 def client(db_session):
     with TestClient(app) as c:
+        # Warm-up runs in a thread; with StaticPool it would share the one SQLite connection
+        # with the fixtures below, so let it finish first.
+        deadline = time.monotonic() + 10
+        while app.state.warmup.status != "ready" and time.monotonic() < deadline:
+            time.sleep(0.01)
         yield c
 
 @pytest.fixture(scope="module")
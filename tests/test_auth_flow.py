@@ -1,5 +1,21 @@
+import asyncio
+import os
+import threading
+from datetime import datetime
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from jose import jwt
+from passlib.context import CryptContext
+from sqlalchemy import event
 from sqlalchemy.orm import Session
+from auth.core.config import settings
+from auth.core import keys
+from auth.core.revocation import revocation_list
+from auth.core.security import PasswordHasher
+from auth.core.token_verifier import RevocationList, TokenVerifier, InvalidToken
 from auth.schemas import user_schemas
 from auth.db import crud
 
@@ -116,3 +132,262 @@ def test_login_confirmed_worker(client: TestClient, db_session: Session, admin_a
     assert response.status_code == 200
     tokens = response.json()
     assert "access_token" in tokens
+
+
+def add_workers(db_session: Session, count: int):
+    return [crud.create_user(db_session, user_schemas.UserCreate(
+        email=f"staff{i}@test.com", full_name=f"Staff_{i}", password="testpassword123"), hashed_password="x")
+        for i in range(count)]
+
+
+def test_admin_users_keyset_pages_and_filters(client: TestClient, db_session: Session, admin_auth_headers):
+    add_workers(db_session, 5)
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "role": "worker"} | ({"cursor": cursor} if cursor else {})
+        page = client.get(API_PREFIX + "/admin/users", params=params, headers=admin_auth_headers).json()
+        assert page["total_estimate"] == 5
+        seen += [user["email"] for user in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"staff{i}@test.com" for i in range(5)]
+
+    page = client.get(API_PREFIX + "/admin/users", params={"q": "STAFF3"}, headers=admin_auth_headers).json()
+    assert [user["email"] for user in page["items"]] == ["staff3@test.com"]
+    # "_" is matched literally, not as a LIKE wildcard.
+    page = client.get(API_PREFIX + "/admin/users", params={"q": "staff_"}, headers=admin_auth_headers).json()
+    assert len(page["items"]) == 5
+    page = client.get(API_PREFIX + "/admin/users", params={"is_active": True}, headers=admin_auth_headers).json()
+    assert [user["role"] for user in page["items"]] == ["admin"]
+
+
+def test_admin_bulk_confirm_workers(client: TestClient, db_session: Session, admin_auth_headers, test_admin_user):
+    workers = add_workers(db_session, 3)
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, sql, *args: statements.append(sql.split()[0].upper()))
+    ids = [workers[0].id, workers[2].id, test_admin_user.id, 999]
+    response = client.post(API_PREFIX + "/admin/confirm-workers", json={"user_ids": ids}, headers=admin_auth_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert sorted(user["id"] for user in body["confirmed"]) == [workers[0].id, workers[2].id]
+    assert all(user["is_active"] and user["is_confirmed_by_admin"] for user in body["confirmed"])
+    assert body["skipped_ids"] == [test_admin_user.id, 999]
+    assert statements.count("UPDATE") == 1
+    assert client.post(API_PREFIX + "/admin/confirm-workers", json={"user_ids": []},
+                       headers=admin_auth_headers).status_code == 422
+
+
+def count_user_queries(db_session: Session):
+    queries = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, sql, *args: queries.append(sql) if "FROM users" in sql else None)
+    return queries
+
+
+def test_authenticated_requests_use_user_cache(client: TestClient, db_session: Session, admin_auth_headers):
+    client.get(API_PREFIX + "/auth/users/me", headers=admin_auth_headers)
+    queries = count_user_queries(db_session)
+    for _ in range(3):
+        assert client.get(API_PREFIX + "/auth/users/me", headers=admin_auth_headers).status_code == 200
+    assert queries == []
+
+
+def test_strict_mode_reads_user_every_time(client: TestClient, db_session: Session, admin_auth_headers, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_STRICT_MODE", True)
+    client.get(API_PREFIX + "/auth/users/me", headers=admin_auth_headers)
+    queries = count_user_queries(db_session)
+    client.get(API_PREFIX + "/auth/users/me", headers=admin_auth_headers)
+    assert len(queries) == 1
+
+
+def test_deactivation_revokes_issued_tokens(client: TestClient, admin_auth_headers, test_unconfirmed_worker,
+                                              test_worker_user_data):
+    client.patch(f"{API_PREFIX}/admin/confirm-worker/{test_unconfirmed_worker.id}", headers=admin_auth_headers)
+    response = client.post(API_PREFIX + "/auth/token", data={"username": test_worker_user_data["email"],
+                                                             "password": test_worker_user_data["password"]})
+    worker_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get(API_PREFIX + "/auth/users/me", headers=worker_headers).status_code == 200
+
+    response = client.patch(f"{API_PREFIX}/admin/deactivate-user/{test_unconfirmed_worker.id}",
+                            headers=admin_auth_headers)
+    assert response.status_code == 200
+    assert not response.json()["is_active"]
+    assert client.get(API_PREFIX + "/auth/users/me", headers=worker_headers).status_code == 401
+
+
+def test_login_rehashes_outdated_password_hash(client: TestClient, db_session: Session, test_admin_user,
+                                               test_admin_user_data):
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash(test_admin_user_data["password"])
+    crud.update_password_hash(db_session, test_admin_user, old_hash)
+
+    response = client.post(API_PREFIX + "/auth/token", data={"username": test_admin_user_data["email"],
+                                                             "password": test_admin_user_data["password"]})
+    assert response.status_code == 200
+    db_session.expire(test_admin_user)
+    assert test_admin_user.hashed_password != old_hash
+    assert test_admin_user.hashed_password.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+
+
+def test_login_burst_for_one_email_is_rejected_before_hashing(client: TestClient, test_admin_user,
+                                                              test_admin_user_data):
+    login_data = {"username": test_admin_user_data["email"], "password": "wrong-password"}
+    statuses = [client.post(API_PREFIX + "/auth/token", data=login_data).status_code
+                for _ in range(settings.LOGIN_EMAIL_BURST + 1)]
+    assert statuses[:-1] == [401] * settings.LOGIN_EMAIL_BURST
+    assert statuses[-1] == 429
+
+
+def test_password_hasher_rejects_when_queue_is_full():
+    hasher = PasswordHasher(workers=1, queue_size=0)
+    release = threading.Event()
+
+    async def scenario():
+        busy = asyncio.ensure_future(hasher.run(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as overloaded:
+            await hasher.run(len, "x")
+        release.set()
+        await busy
+        return overloaded.value.status_code, await hasher.run(len, "x")
+
+    assert asyncio.run(scenario()) == (503, 1)
+
+
+def login_tokens(client: TestClient, user_data):
+    response = client.post(API_PREFIX + "/auth/token", data={"username": user_data["email"],
+                                                             "password": user_data["password"]})
+    assert response.status_code == 200
+    return response.json()
+
+
+def bearer(tokens):
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def test_refresh_rotates_and_detects_reuse(client: TestClient, test_admin_user, test_admin_user_data):
+    first = login_tokens(client, test_admin_user_data)
+    response = client.post(API_PREFIX + "/auth/refresh", json={"refresh_token": first["refresh_token"]})
+    assert response.status_code == 200
+    second = response.json()
+    assert second["refresh_token"] != first["refresh_token"]
+    assert client.get(API_PREFIX + "/auth/users/me", headers=bearer(second)).status_code == 200
+
+    # Replaying the rotated token revokes the whole session, including the fresh access token.
+    response = client.post(API_PREFIX + "/auth/refresh", json={"refresh_token": first["refresh_token"]})
+    assert response.status_code == 401
+    assert client.get(API_PREFIX + "/auth/users/me", headers=bearer(second)).status_code == 401
+    assert client.post(API_PREFIX + "/auth/refresh",
+                       json={"refresh_token": second["refresh_token"]}).status_code == 401
+
+
+def test_double_refresh_is_detected_without_the_in_memory_list(client: TestClient, test_admin_user,
+                                                                test_admin_user_data):
+    first = login_tokens(client, test_admin_user_data)
+    second = client.post(API_PREFIX + "/auth/refresh", json={"refresh_token": first["refresh_token"]}).json()
+    revocation_list.clear()  # the same token replayed to a replica that has not synced yet
+
+    response = client.post(API_PREFIX + "/auth/refresh", json={"refresh_token": first["refresh_token"]})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Refresh token reuse detected"
+    assert client.get(API_PREFIX + "/auth/users/me", headers=bearer(second)).status_code == 401
+
+
+def test_logout_revokes_session_tokens(client: TestClient, db_session: Session, test_admin_user,
+                                       test_admin_user_data):
+    tokens = login_tokens(client, test_admin_user_data)
+    other_session = login_tokens(client, test_admin_user_data)
+    response = client.post(API_PREFIX + "/auth/logout", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 204
+    assert client.get(API_PREFIX + "/auth/users/me", headers=bearer(tokens)).status_code == 401
+    assert client.get(API_PREFIX + "/auth/users/me", headers=bearer(other_session)).status_code == 200
+
+    # Other services pick the revocation up from the feed on their next sync.
+    feed = client.get(API_PREFIX + "/auth/revocations").json()
+    elsewhere = RevocationList()
+    elsewhere.apply([(row["id"], datetime.fromisoformat(row["expires_at"]), datetime.fromisoformat(row["revoked_at"]))
+                     for row in feed["revoked"]])
+    assert elsewhere.is_claims_revoked(jwt.get_unverified_claims(tokens["access_token"]))
+    assert not elsewhere.is_claims_revoked(jwt.get_unverified_claims(other_session["access_token"]))
+
+
+def test_refresh_token_is_not_an_access_token(client: TestClient, test_admin_user, test_admin_user_data):
+    tokens = login_tokens(client, test_admin_user_data)
+    headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+    assert client.get(API_PREFIX + "/auth/users/me", headers=headers).status_code == 401
+    assert client.post(API_PREFIX + "/auth/refresh",
+                       json={"refresh_token": tokens["access_token"]}).status_code == 401
+
+
+def test_tokens_verify_against_published_jwks(client: TestClient, test_admin_user, test_admin_user_data):
+    response = client.get(API_PREFIX + "/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert "max-age" in response.headers["cache-control"]
+    jwks = response.json()
+    tokens = login_tokens(client, test_admin_user_data)
+    assert jwt.get_unverified_header(tokens["access_token"])["kid"] in {key["kid"] for key in jwks["keys"]}
+
+    verifier = TokenVerifier(lambda: jwks, RevocationList())
+    claims = verifier.decode(tokens["access_token"])
+    assert claims["sub"] == test_admin_user_data["email"]
+    assert claims["role"] == "admin"
+    with pytest.raises(InvalidToken):
+        verifier.decode(tokens["refresh_token"])
+    with pytest.raises(InvalidToken):
+        verifier.decode(tokens["access_token"][:-4] + "AAAA")
+
+
+def key_id(path):
+    with open(path, "rb") as fh:
+        return keys.public_jwk(serialization.load_pem_private_key(fh.read(), password=None))["kid"]
+
+
+def test_newest_key_signs_even_within_one_second(tmp_path):
+    legacy = keys.generate_key(str(tmp_path))
+    # A key named the old way (whole seconds, random suffix) in the same second as the next ones.
+    os.rename(legacy, tmp_path / f"{os.path.basename(legacy)[:15]}-ffffffff.pem")
+    generated = [keys.generate_key(str(tmp_path)) for _ in range(3)]
+    assert sorted(os.listdir(tmp_path))[-3:] == [os.path.basename(path) for path in generated]
+    assert keys.KeyRing(str(tmp_path)).signing_key[0] == key_id(generated[-1])
+
+
+def test_missing_key_fails_unless_generation_is_allowed(tmp_path):
+    with pytest.raises(RuntimeError, match="auth.core.keys generate"):
+        keys.KeyRing(str(tmp_path)).signing_key
+    assert keys.KeyRing(str(tmp_path), autogenerate=True).signing_key
+    assert len(keys.key_names(str(tmp_path))) == 1
+
+
+def test_rotate_deletes_keys_retired_before_the_refresh_lifetime(tmp_path, capsys):
+    for stamp in ("20200101T000000", "20200102T000000"):
+        os.rename(keys.generate_key(str(tmp_path)), tmp_path / f"{stamp}-aaaaaaaa.pem")
+    current = os.path.basename(keys.generate_key(str(tmp_path)))
+
+    keys.main(["rotate", "--dir", str(tmp_path)])
+    names = keys.key_names(str(tmp_path))
+    # The second key stopped signing only now: tokens it signed are still valid.
+    assert names[:2] == ["20200102T000000-aaaaaaaa.pem", current] and len(names) == 3
+    assert "removed" in capsys.readouterr().out
+
+
+def test_rotated_key_is_fetched_on_unknown_kid(client: TestClient, test_admin_user, test_admin_user_data):
+    fetches = []
+
+    def fetch_jwks():
+        fetches.append(1)
+        return client.get(API_PREFIX + "/.well-known/jwks.json").json()
+
+    verifier = TokenVerifier(fetch_jwks, RevocationList(), min_refresh_seconds=0)
+    old_tokens = login_tokens(client, test_admin_user_data)
+    verifier.decode(old_tokens["access_token"])
+
+    new_key = keys.generate_key(keys.keyring.directory)
+    keys.keyring.reload()
+    assert keys.keyring.signing_key[0] == key_id(new_key)
+    new_tokens = login_tokens(client, test_admin_user_data)
+    assert jwt.get_unverified_header(new_tokens["access_token"])["kid"] != \
+        jwt.get_unverified_header(old_tokens["access_token"])["kid"]
+    verifier.decode(new_tokens["access_token"])
+    verifier.decode(old_tokens["access_token"])
+    assert len(fetches) == 2
@@ -0,0 +1,95 @@
+import json
+import os
+
+import httplib2
+import pytest
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from news_monitor import http_cache, youtube_monitor
+from news_monitor.quota import QuotaLimiter
+
+
+class FakeTransport:
+    """The API behind httplib2: answers If-None-Match with 304 while the resource has not changed."""
+
+    def __init__(self):
+        self.requests = []  # (resource, headers)
+        self.version = 1
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        self.requests.append((http_cache.resource_of(uri), dict(headers or {})))
+        etag = f'"v{self.version}"'
+        if "missing" in uri:
+            return httplib2.Response({"status": "404"}), b'{"error": {"code": 404}}'
+        if (headers or {}).get("if-none-match") == etag:
+            return httplib2.Response({"status": "304", "etag": etag}), b""
+        body = {"etag": etag, "items": [{"id": f"item-{self.version}"}]}
+        return httplib2.Response({"status": "200", "etag": etag, "content-type": "application/json"}), \
+            json.dumps(body).encode()
+
+
+@pytest.fixture()
+def youtube():
+    return build("youtube", "v3", developerKey="SECRET-KEY")  # the discovery document ships with the client
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    cache = http_cache.ResponseCache(str(tmp_path / "http_cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def test_channels_are_reused_and_videos_revalidated(youtube, cache, monkeypatch):
+    transport = FakeTransport()
+    usage = youtube_monitor.RunUsage()
+    monkeypatch.setattr(youtube_monitor._thread_local, "http", http_cache.CachingHttp(transport, cache, usage),
+                        raising=False)
+    monkeypatch.setattr(youtube_monitor._thread_local, "usage", usage, raising=False)
+    quota = QuotaLimiter(daily_quota=100, reserve=0, units_per_second=1000, burst=1000)
+    monkeypatch.setattr(youtube_monitor, "youtube_quota", quota)
+
+    def channels():
+        return youtube_monitor.execute(youtube.channels().list(part="snippet", id="UC1"), "channels.list")
+
+    def videos():
+        return youtube_monitor.execute(youtube.videos().list(part="statistics", id="v1"), "videos.list")
+
+    assert channels() == channels()  # the second one never leaves the process...
+    assert quota.spent["channels.list"] == 1  # ...and costs nothing
+    assert videos()["items"] == videos()["items"] == [{"id": "item-1"}]
+    assert [resource for resource, _ in transport.requests] == ["channels", "videos", "videos"]
+    assert transport.requests[-1][1]["if-none-match"] == '"v1"'
+    assert quota.spent["videos.list"] == 2  # a 304 is still a call
+
+    transport.version = 2
+    assert videos()["items"] == [{"id": "item-2"}]
+    assert cache.snapshot() == {"fresh": 1, "not_modified": 1, "stored": 3}
+    assert usage.http_cache == cache.snapshot() and usage.quota_spent == quota.spent
+    key = http_cache.request_key("GET", youtube.videos().list(part="statistics", id="v1").uri)
+    assert "SECRET-KEY" not in key and cache.get(key)[3] == '"v2"'
+
+
+def test_replay_serves_recorded_responses_without_network(youtube, tmp_path, cache):
+    recordings = http_cache.Recordings(str(tmp_path / "recordings"))
+    transport = FakeTransport()
+    recorder = http_cache.RecordingHttp(http_cache.CachingHttp(transport, cache), recordings)
+    recorded = [youtube.commentThreads().list(part="snippet", videoId="v1").execute(http=recorder)]
+    transport.version = 2
+    recorded.append(youtube.commentThreads().list(part="snippet", videoId="v1").execute(http=recorder))
+    with pytest.raises(HttpError):
+        youtube.videos().list(part="snippet", id="missing").execute(http=recorder)
+    for name in os.listdir(recordings.directory):
+        assert "SECRET-KEY" not in (tmp_path / "recordings" / name).read_text()
+
+    replay = http_cache.ReplayHttp(http_cache.Recordings(recordings.directory))
+    other_key = build("youtube", "v3", developerKey="another-key")
+    replayed = [other_key.commentThreads().list(videoId="v1", part="snippet").execute(http=replay) for _ in range(3)]
+    assert replayed == recorded + recorded[-1:]  # in order, then the last one again
+    with pytest.raises(HttpError) as error:
+        other_key.videos().list(part="snippet", id="missing").execute(http=replay)
+    assert error.value.resp.status == 404
+    with pytest.raises(http_cache.RecordingNotFound):
+        other_key.channels().list(part="snippet", id="UC9").execute(http=replay)
+    assert len(transport.requests) == 3
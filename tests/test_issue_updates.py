@@ -0,0 +1,135 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from auth.core import token_verifier
+from llm_management.database import get_db
+from llm_management.llm_api import create_app
+from llm_management.models import ComplaintAnalysis, IssueStatus, SubmissionSource, UserSubmissionType
+from migrations import migrate
+
+
+@pytest.fixture()
+def issues_db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    migrate("complaints", engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        for status in (IssueStatus.NEW, IssueStatus.IN_PROGRESS, IssueStatus.RESOLVED, IssueStatus.IN_PROGRESS):
+            db.add(ComplaintAnalysis(original_complaint_text="Яма во дворе", source=SubmissionSource.TELEGRAM,
+                                     submission_type_by_user=UserSubmissionType.COMPLAINT, source_user_id="1",
+                                     responsible_department="Мэрия", status=status))
+        db.commit()
+    return engine, Session
+
+
+@pytest.fixture()
+def issues_client(issues_db):
+    engine, Session = issues_db
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[token_verifier.get_current_active_user] = lambda: None
+    return TestClient(app)
+
+
+def count_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, sql, *args: statements.append(sql.split()[0].upper()))
+    return statements
+
+
+def test_resolve_is_a_single_update(issues_client, issues_db):
+    statements = count_statements(issues_db[0])
+    response = issues_client.post("/issue/2/resolve", json={"resolution_details": "Яму заасфальтировали"})
+    assert response.status_code == 200
+    assert response.json()["status"] == IssueStatus.RESOLVED.value
+    assert response.json()["resolution_details"] == "Яму заасфальтировали"
+    assert statements == ["UPDATE"]
+
+
+def test_single_issue_preconditions(issues_client):
+    assert issues_client.post("/issue/3/resolve", json={"resolution_details": "Повторное решение"}).status_code == 400
+    assert issues_client.post("/issue/1/feedback", json={"user_feedback_on_resolution": "+"}).status_code == 400
+    assert issues_client.post("/issue/3/feedback", json={"user_feedback_on_resolution": "+"}).status_code == 200
+    assert issues_client.patch("/issue/999", json={"district": "Свердловский"}).status_code == 404
+    assert issues_client.patch("/issue/1", json={"district": "Свердловский"}).json()["district"] == "Свердловский"
+
+
+def test_bulk_update_by_ids_reports_each_id(issues_client, issues_db):
+    statements = count_statements(issues_db[0])
+    response = issues_client.post("/issues/bulk_update", json={
+        "ids": [1, 2, 3, 999], "from_statuses": ["new", "in_progress"], "status": "resolved"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["updated"] == 2
+    outcomes = {item["id"]: (item["outcome"], item["status"]) for item in body["results"]}
+    assert outcomes == {1: ("updated", "resolved"), 2: ("updated", "resolved"),
+                        3: ("precondition_failed", "resolved"), 999: ("not_found", None)}
+    assert statements == ["UPDATE", "SELECT"]
+
+
+def test_bulk_update_by_filter(issues_client):
+    response = issues_client.post("/issues/bulk_update", json={
+        "filter": {"status": "in_progress"}, "responsible_department": "Тазалык"})
+    assert response.json()["updated"] == 2
+    assert {item["id"] for item in response.json()["results"]} == {2, 4}
+    assert issues_client.post("/issues/bulk_update", json={
+        "filter": {}, "status": "resolved"}).status_code == 400
+    # The text would be dropped for any status but resolved.
+    assert issues_client.post("/issues/bulk_update", json={
+        "ids": [2], "status": "in_progress", "resolution_details": "Бригада выехала"}).status_code == 400
+
+
+def test_submit_without_waiting_acknowledges_then_analyses(issues_client, monkeypatch):
+    from llm_management import llm_api
+    analysed = []
+
+    def fake_analysis(text):
+        analysed.append(text)
+        return (llm_api.LLMAnalysisResult(responsible_department="Бишкекводоканал", complaint_type="Водоснабжение"),
+                None, IssueStatus.ANALYZED)
+
+    monkeypatch.setattr(llm_api, "analyze_complaint", fake_analysis)
+    response = issues_client.post("/submit-issue/", params={"wait_for_analysis": "false"}, json={
+        "text": "Нет воды третий день", "submission_type_by_user": "жалоба", "source": "telegram",
+        "source_user_id": "42"})
+    assert response.status_code == 202
+    assert response.json()["status"] == IssueStatus.PENDING_ANALYSIS.value
+    issue_id = response.json()["saved_record_id"]
+    assert analysed == ["Нет воды третий день"]  # the background task ran after the response
+
+    statuses = issues_client.get("/issues/status/", params={"ids": [issue_id, 1, 2, 999],
+                                                            "source_user_ids": ["42", "1", "42", "42"]}).json()
+    assert {item["id"]: item["status"] for item in statuses} == {issue_id: "analyzed", 1: "new"}  # 2 is not 42's
+    assert next(item for item in statuses if item["id"] == issue_id)["responsible_department"] == "Бишкекводоканал"
+    assert issues_client.get("/issues/status/", params={"ids": [issue_id]}).status_code == 422
+    assert issues_client.get("/issues/status/", params={"ids": list(range(101)),
+                                                        "source_user_ids": ["42"] * 101}).status_code == 400
+
+
+def test_pending_analyses_are_resumed(issues_client, issues_db, monkeypatch):
+    from llm_management import llm_api
+    _, Session = issues_db
+    with Session() as db:
+        db.add(ComplaintAnalysis(original_complaint_text="Не вывозят мусор", source=SubmissionSource.TELEGRAM,
+                                 submission_type_by_user=UserSubmissionType.COMPLAINT, source_user_id="7",
+                                 status=IssueStatus.PENDING_ANALYSIS))
+        db.commit()
+    monkeypatch.setattr(llm_api, "analyze_complaint",
+                        lambda text: (llm_api.LLMAnalysisResult(), "LLM вернул пустой ответ.", IssueStatus.ANALYSIS_FAILED))
+    monkeypatch.setattr(llm_api, "ANALYSIS_STALE_MINUTES", -1)
+    llm_api.resume_pending_analyses(issues_client.app)
+    with Session() as db:
+        issue = db.get(ComplaintAnalysis, 5)
+        assert issue.status == IssueStatus.ANALYSIS_FAILED and issue.llm_processing_error == "LLM вернул пустой ответ."
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, desc, event, func, or_, select, text
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.seed_data import COMMENT_COLUMNS, COMPLAINT_COLUMNS, SyntheticDataset
+from llm_management.models import ACTIVE_STATUS_CONDITION, ComplaintAnalysis, IssueStatus
+from migrations import COMPONENTS, load_component, migrate
+from news_monitor.models import YoutubeComment
+
+DATE_FROM = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+def _engine():
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+@pytest.fixture(scope="module")
+def complaints_engine():
+    engine = _engine()
+    migrate("complaints", engine)
+    rows = SyntheticDataset(seed=7).complaint_rows(0, 0, 5000, 5000)
+    with engine.begin() as conn:
+        conn.execute(ComplaintAnalysis.__table__.insert(), [dict(zip(COMPLAINT_COLUMNS, row)) for row in rows])
+        conn.execute(text("ANALYZE"))
+    return engine
+
+
+def explain(engine, statement):
+    def add_explain(conn, cursor, sql, parameters, context, executemany):
+        return "EXPLAIN QUERY PLAN " + sql, parameters
+
+    event.listen(engine, "before_cursor_execute", add_explain, retval=True)
+    try:
+        with engine.connect() as conn:
+            return " | ".join(row[-1] for row in conn.execute(statement).fetchall())
+    finally:
+        event.remove(engine, "before_cursor_execute", add_explain)
+
+
+def index_names(engine, table):
+    with engine.connect() as conn:
+        return set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+                                {"table": table}).scalars())
+
+
+def test_migrations_are_idempotent(complaints_engine):
+    assert migrate("complaints", complaints_engine) == []
+
+
+@pytest.mark.parametrize("component", sorted(COMPONENTS))
+def test_every_step_can_run_again_on_a_fresh_database(component):
+    # The baseline creates the current schema, so the later steps find their work already done.
+    engine = _engine()
+    migrate(component, engine)
+    with engine.connect() as conn:
+        for migration in load_component(component).MIGRATIONS[1:]:
+            migration.upgrade(conn)
+        conn.commit()
+
+
+def test_listing_sorted_by_created_at_uses_index(complaints_engine):
+    stmt = select(ComplaintAnalysis).order_by(desc(ComplaintAnalysis.created_at)).limit(20)
+    assert "ix_complaint_analyses_v2_created_at" in explain(complaints_engine, stmt)
+
+
+def test_status_filter_with_date_range_uses_composite(complaints_engine):
+    stmt = select(func.count(ComplaintAnalysis.id)).where(
+        ComplaintAnalysis.status == IssueStatus.RESOLVED, ComplaintAnalysis.created_at >= DATE_FROM)
+    plan = explain(complaints_engine, stmt)
+    assert "ix_complaint_analyses_v2_status_created_at (status=? AND created_at>?)" in plan
+
+
+def test_category_filter_with_date_range_uses_composite(complaints_engine):
+    stmt = select(func.count(ComplaintAnalysis.id)).where(
+        ComplaintAnalysis.complaint_category == "Здравоохранение", ComplaintAnalysis.created_at >= DATE_FROM)
+    plan = explain(complaints_engine, stmt)
+    assert "ix_complaint_analyses_v2_category_created_at (complaint_category=? AND created_at>?)" in plan
+
+
+def test_department_filter_with_date_range_uses_composite(complaints_engine):
+    stmt = select(func.count(ComplaintAnalysis.id)).where(
+        ComplaintAnalysis.responsible_department == "Тазалык", ComplaintAnalysis.created_at >= DATE_FROM)
+    plan = explain(complaints_engine, stmt)
+    assert "ix_complaint_analyses_v2_department_created_at (responsible_department=? AND created_at>?)" in plan
+
+
+def test_work_queue_uses_partial_index(complaints_engine):
+    stmt = select(ComplaintAnalysis).where(text(ACTIVE_STATUS_CONDITION)).order_by(
+        ComplaintAnalysis.created_at).limit(50)
+    plan = explain(complaints_engine, stmt)
+    assert "ix_complaint_analyses_v2_active_queue" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_issues_for_user_uses_expression_indexes(complaints_engine):
+    stmt = select(ComplaintAnalysis).where(or_(
+        func.lower(ComplaintAnalysis.source_user_id) == "400000001",
+        func.lower(ComplaintAnalysis.source_username) == "400000001",
+    ))
+    plan = explain(complaints_engine, stmt)
+    assert "ix_complaint_analyses_v2_lower_source_user_id" in plan
+    assert "ix_complaint_analyses_v2_lower_source_username" in plan
+
+
+def test_unused_complaint_indexes_are_gone(complaints_engine):
+    names = index_names(complaints_engine, ComplaintAnalysis.__tablename__)
+    for dropped in ("ix_complaint_analyses_v2_id", "ix_complaint_analyses_v2_complaint_subcategory",
+                    "ix_complaint_analyses_v2_complaint_type", "ix_complaint_analyses_v2_submission_type_by_user",
+                    "ix_complaint_analyses_v2_status"):
+        assert dropped not in names
+
+
+def test_youtube_comment_dedupe_uses_unique_index():
+    engine = _engine()
+    migrate("youtube", engine)
+    rows = SyntheticDataset(seed=7).comment_rows(0, 0, 2000, 2000)
+    with engine.begin() as conn:
+        conn.execute(YoutubeComment.__table__.insert(), [dict(zip(COMMENT_COLUMNS, row)) for row in rows])
+        conn.execute(text("ANALYZE"))
+
+    stmt = select(YoutubeComment).where(YoutubeComment.youtube_comment_id == "Ugz00070000000000000001")
+    assert "ix_youtube_comments_youtube_comment_id" in explain(engine, stmt)
+    names = index_names(engine, YoutubeComment.__tablename__)
+    assert not names & {"ix_youtube_comments_id", "ix_youtube_comments_topic",
+                        "ix_youtube_comments_youtube_channel_title"}
+
+    since = datetime.now(timezone.utc) - timedelta(minutes=15)
+    labelled = select(func.count(YoutubeComment.id)).where(YoutubeComment.sentiment_labelled_at >= since)
+    assert "ix_youtube_comments_sentiment_labelled_at" in explain(engine, labelled)
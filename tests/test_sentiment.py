@@ -0,0 +1,190 @@
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from migrations import migrate
+from news_monitor import lexicon, sentiment, sentiment_worker
+from news_monitor.models import CommentSentiment, SentimentRollup, YoutubeComment
+from news_monitor.sentiment_cache import SentimentCache, normalize
+
+
+@pytest.fixture()
+def model(monkeypatch, tmp_path):
+    """Fake Ollama: labels a batch by the first word of each comment, unless told to drop some."""
+    calls = {"batch": [], "single": []}
+    drop = set()
+
+    def generate(prompt, timeout, json_format=False):
+        if not json_format:
+            text = re.search(r'Комментарий: "(.*)"', prompt).group(1)
+            calls["single"].append(text)
+            return text.split()[0]
+        items = json.loads(re.search(r"Комментарии: (\[.*\])\n", prompt).group(1))
+        calls["batch"].append([item["text"] for item in items])
+        labels = [{"index": item["index"], "label": item["text"].split()[0]}
+                  for item in items if item["text"] not in drop]
+        return json.dumps({"labels": labels}, ensure_ascii=False)
+
+    monkeypatch.setattr(sentiment, "_generate", generate)
+    monkeypatch.setattr(lexicon, "LEXICON_ENABLED", False)  # every text reaches the fake model
+    monkeypatch.setattr(sentiment, "sentiment_cache", SentimentCache(str(tmp_path / "sentiment.sqlite3")))
+    calls["drop"] = drop
+    return calls
+
+
+def test_comments_are_classified_in_batches(model, monkeypatch):
+    monkeypatch.setattr(sentiment, "SENTIMENT_BATCH_MAX_ITEMS", 3)
+    texts = ["позитивный отлично", "злой ужас", "грустный жаль", "позитивный отлично", "  ", "нейтральный ок"]
+    labels = sentiment.classify_comments(texts)
+    assert labels == [CommentSentiment.POSITIVE, CommentSentiment.ANGRY, CommentSentiment.SAD,
+                      CommentSentiment.POSITIVE, CommentSentiment.NEUTRAL, CommentSentiment.NEUTRAL]
+    assert sorted(map(len, model["batch"])) == [1, 3]  # duplicates and blanks never reach the model
+    assert model["single"] == []
+
+    assert sentiment.classify_comments(["Злой,  УЖАС!!"]) == [CommentSentiment.ANGRY]
+    assert len(model["batch"]) == 2  # served from the cache
+
+
+def test_missing_or_invalid_labels_fall_back_to_single_calls(model):
+    model["drop"].add("грустный жаль")
+    labels = sentiment.classify_comments(["злой ужас", "грустный жаль", "непонятно что"])
+    assert labels == [CommentSentiment.ANGRY, CommentSentiment.SAD, CommentSentiment.UNKNOWN]
+    assert model["single"] == ["грустный жаль", "непонятно что"]
+
+
+def test_unreachable_model_fails_the_batch_without_single_calls(model, monkeypatch):
+    def unreachable(prompt, timeout, json_format=False):
+        model["batch" if json_format else "single"].append(prompt)
+        raise requests.exceptions.ConnectionError("connection refused")
+
+    monkeypatch.setattr(sentiment, "_generate", unreachable)
+    assert sentiment.classify_comments(["злой ужас", "грустный жаль"]) == [CommentSentiment.UNKNOWN] * 2
+    assert (len(model["batch"]), model["single"]) == (1, [])
+    assert sentiment.sentiment_cache.get(normalize("злой ужас")) == CommentSentiment.UNKNOWN  # for ERROR_TTL
+
+
+def test_lexicon_labels_formulaic_comments_locally(model, monkeypatch):
+    monkeypatch.setattr(lexicon, "LEXICON_ENABLED", True)
+    texts = ["Спасибо большое!", "ПОЗОР!!!", "👍👍🏻", "Рахмат сизге", "Урааа", "злой ужас", "не очень хорошо",
+             "хорошо, но дорого", "спасибо, помогли с решением вопроса"]
+    labels = sentiment.classify_comments(texts)
+    assert labels[:5] == [CommentSentiment.GRATEFUL, CommentSentiment.NEGATIVE, CommentSentiment.POSITIVE,
+                          CommentSentiment.GRATEFUL, CommentSentiment.EXCITED]
+    # Mixed labels, negation, contrast and mostly unknown words are left to the model.
+    assert sorted(model["batch"][0]) == sorted(texts[5:])
+
+
+def test_lexicon_agreement_report():
+    pairs = [("спасибо", CommentSentiment.GRATEFUL), ("позор", CommentSentiment.NEGATIVE),
+             ("позор", CommentSentiment.ANGRY), ("интересное мнение автора", CommentSentiment.NEUTRAL)]
+    report = lexicon.agreement_report(pairs, batch_size=3)
+    assert (report["total"], report["labelled"], report["agreed"]) == (4, 3, 2)
+    assert report["confusion"][CommentSentiment.ANGRY, CommentSentiment.NEGATIVE] == 1
+
+
+def test_batches_respect_token_budget():
+    texts = ["а" * 300, "б" * 300, "в" * 30, "г" * 900]
+    batches = list(sentiment.make_batches(texts, token_budget=250, max_items=10))
+    assert batches == [["а" * 300, "б" * 300, "в" * 30], ["г" * 900]]  # an oversized comment goes alone
+
+
+def test_normalized_keys():
+    assert normalize(" Молодцы!!! ") == normalize("МОЛОДЦЫ.") == normalize("молодцы")
+    assert normalize("Всё   плохо") == normalize("все плохо")
+    assert normalize("😡") == normalize("😡😡😡!") == normalize("😡 😡")
+    assert normalize("👍") != normalize("😡")
+    assert normalize("...") == ""
+
+
+def test_cache_is_persistent_bounded_and_expires_errors(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SentimentCache(path, max_entries=3)
+    cache.put_many([("a", CommentSentiment.POSITIVE), ("b", CommentSentiment.SAD)])
+    cache.put("err", CommentSentiment.UNKNOWN, ttl=-1)  # already expired
+    assert cache.get("err") is None
+    cache.get("a")  # recently used, survives pruning
+    cache.put_many([("c", CommentSentiment.ANGRY), ("d", CommentSentiment.NEUTRAL)])
+    cache.prune()
+    assert len(cache) == 3 and cache.get("b") is None
+    cache.close()
+
+    reopened = SentimentCache(path)
+    assert reopened.get_many(["a", "c", "zzz"]) == {"a": CommentSentiment.POSITIVE, "c": CommentSentiment.ANGRY}
+    assert (reopened.hits, reopened.misses) == (2, 1)
+
+
+@pytest.fixture()
+def comments_db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    migrate("youtube", engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all(YoutubeComment(youtube_username="user", youtube_comment_id=f"c{i}", comment_text=text)
+                   for i, text in enumerate(["позитивный да", "злой нет", "грустный увы", "нейтральный ок", "злой нет"]))
+        db.commit()
+    return Session
+
+
+def test_worker_drains_backlog_newest_first(model, comments_db):
+    worker = sentiment_worker.SentimentWorker(comments_db, threads=1, batch_size=2)
+    with comments_db() as db:
+        assert sentiment_worker.claim_and_classify(db, batch_size=2) == 2
+        labelled = db.query(YoutubeComment).filter(YoutubeComment.sentiment.is_not(None)).order_by(YoutubeComment.id)
+        assert [comment.youtube_comment_id for comment in labelled] == ["c3", "c4"]
+        assert sentiment_worker.backlog_stats(db)["pending"] == 3
+
+    assert worker.drain() == 3
+    with comments_db() as db:
+        stats = sentiment_worker.backlog_stats(db)
+        assert (stats["pending"], stats["oldest_pending_at"]) == (0, None)
+        assert stats["labelled_per_minute"] == 5 / 15
+        assert db.query(YoutubeComment).filter_by(youtube_comment_id="c2").one().sentiment == CommentSentiment.SAD
+        # Other bulk updates (the topic job) move updated_at, not the labelling rate.
+        db.add(YoutubeComment(youtube_username="user", youtube_comment_id="old", comment_text="давно размечен",
+                              sentiment=CommentSentiment.NEUTRAL))
+        db.execute(update(YoutubeComment).values(topic_cluster_id=-1))
+        db.commit()
+        assert sentiment_worker.backlog_stats(db)["labelled_per_minute"] == 5 / 15
+    assert worker.labelled == 3 and worker.drain_rate() > 0
+    assert "Очередь тональности: 0" in worker.report()
+
+
+def test_worker_retries_unknown_labels_with_backoff(model, comments_db, monkeypatch):
+    monkeypatch.setattr(sentiment_worker, "MAX_ATTEMPTS", 2)
+    with comments_db() as db:
+        db.add(YoutubeComment(youtube_username="user", youtube_comment_id="odd", comment_text="непонятно что"))
+        db.commit()
+        assert sentiment_worker.claim_and_classify(db, batch_size=10) == 5
+        odd = db.query(YoutubeComment).filter_by(youtube_comment_id="odd").one()
+        assert (odd.sentiment, odd.sentiment_attempts) == (None, 1)
+        assert db.query(SentimentRollup).filter_by(sentiment=CommentSentiment.UNKNOWN).count() == 0
+        assert sentiment_worker.claim_and_classify(db, batch_size=10) == 0  # backing off
+        assert model["single"] == ["непонятно что"]
+
+        odd.sentiment_retry_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+        db.commit()
+        # The UNKNOWN cached by the first attempt is not reused: the model is asked again.
+        assert sentiment_worker.claim_and_classify(db, batch_size=10) == 1
+        assert model["single"] == ["непонятно что"] * 2
+        db.refresh(odd)
+        assert odd.sentiment == CommentSentiment.UNKNOWN  # gave up after MAX_ATTEMPTS
+        assert sentiment_worker.backlog_stats(db)["pending"] == 0
+
+
+def test_worker_leaves_rows_pending_while_model_is_down(model, comments_db, monkeypatch):
+    def unreachable(prompt, timeout, json_format=False):
+        raise requests.exceptions.ConnectionError("connection refused")
+
+    monkeypatch.setattr(sentiment, "_generate", unreachable)
+    worker = sentiment_worker.SentimentWorker(comments_db, threads=1, batch_size=10)
+    assert worker.drain() == 0 and worker.errors == 1
+    assert len(sentiment.sentiment_cache) == 0  # nothing was cached as UNKNOWN
+    with comments_db() as db:
+        assert sentiment_worker.backlog_stats(db)["pending"] == 5
+
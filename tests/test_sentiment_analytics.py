@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from auth.core import token_verifier
+from benchmarks import seed_data
+from migrations import migrate
+from news_monitor import sentiment_worker
+from news_monitor.analytics_api import create_app
+from news_monitor.database import get_db
+from news_monitor.models import CommentSentiment, YoutubeComment
+from news_monitor.rollup import ROLLUP, rebuild_rollup
+
+COMMENTS = [  # channel, video, day of May 2025, first word -> label
+    ("UC1", "v1", 1, "ЗЛОЙ"), ("UC1", "v1", 1, "ЗЛОЙ"), ("UC1", "v1", 2, "ПОЗИТИВНЫЙ"),
+    ("UC1", "v2", 2, "НЕЙТРАЛЬНЫЙ"), ("UC1", "v2", 3, "НЕГАТИВНЫЙ"),
+    ("UC2", "v3", 3, "ПОЗИТИВНЫЙ"), ("UC2", "v3", 31, "ПОЗИТИВНЫЙ"),
+]
+
+
+@pytest.fixture()
+def analytics_db(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    migrate("youtube", engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        db.add_all(YoutubeComment(youtube_username="user", youtube_comment_id=f"c{i}", comment_text=f"{label} текст",
+                                  youtube_channel_id=channel, youtube_channel_title=f"Канал {channel}",
+                                  youtube_video_id=video, topic=f"Видео {video}",
+                                  comment_published_at=datetime(2025, 5, day, 12, tzinfo=timezone.utc))
+                   for i, (channel, video, day, label) in enumerate(COMMENTS))
+        db.commit()
+    monkeypatch.setattr(sentiment_worker, "classify_comments",
+                        lambda texts, fail_fast=False: [CommentSentiment(text.split()[0]) for text in texts])
+    sentiment_worker.SentimentWorker(Session, batch_size=3).drain()  # the rollup grows batch by batch
+    return engine, Session
+
+
+@pytest.fixture()
+def analytics_client(analytics_db):
+    engine, Session = analytics_db
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = create_app()
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[token_verifier.get_current_active_user] = lambda: None
+    return TestClient(app)
+
+
+def rollup_rows(engine):
+    with engine.connect() as conn:
+        return sorted(conn.execute(select(ROLLUP)).all())
+
+
+def test_incremental_rollup_matches_rebuild(analytics_db):
+    engine, _ = analytics_db
+    incremental = rollup_rows(engine)
+    assert sum(row.comment_count for row in incremental) == len(COMMENTS)
+    with engine.begin() as conn:
+        rebuild_rollup(conn)
+    assert rollup_rows(engine) == incremental
+
+
+def test_dashboard_reads_only_the_rollup(analytics_client, analytics_db):
+    statements = []
+    event.listen(analytics_db[0], "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+
+    by_channel = analytics_client.get("/youtube/stats/distribution", params={"group_by": "channel"}).json()
+    assert [(item["key"], item["title"], item["total"]) for item in by_channel] == \
+           [("UC1", "Канал UC1", 5), ("UC2", "Канал UC2", 2)]
+    assert by_channel[0]["by_sentiment"] == {"ЗЛОЙ": 2, "ПОЗИТИВНЫЙ": 1, "НЕЙТРАЛЬНЫЙ": 1, "НЕГАТИВНЫЙ": 1}
+
+    by_day = analytics_client.get("/youtube/stats/distribution", params={
+        "group_by": "day", "channel_id": "UC1", "date_from": "2025-05-02T00:00:00", "date_to": "2025-05-03"}).json()
+    assert [(item["key"], item["total"]) for item in by_day] == [("2025-05-02", 2), ("2025-05-03", 1)]
+
+    negative = analytics_client.get("/youtube/stats/top_negative_videos", params={"min_comments": 2}).json()
+    assert [(item["video_id"], item["negative"], item["total"]) for item in negative] == \
+           [("v1", 2, 3), ("v2", 1, 2), ("v3", 0, 2)]
+    assert negative[0]["negative_share"] == pytest.approx(0.6667)
+
+    timeline = analytics_client.get("/youtube/stats/timeline", params={
+        "group_by_period": "month", "sentiment": "ПОЗИТИВНЫЙ"}).json()
+    assert timeline == [{"period": "2025-05", "total": 3, "by_sentiment": {"ПОЗИТИВНЫЙ": 3}}]
+
+    assert statements and not any("youtube_comments" in sql for sql in statements)
+
+
+def test_seeded_comments_are_in_the_rollup(tmp_path):
+    url = f"sqlite:///{tmp_path / 'bench.db'}"
+    seed_data.main(["--database-url", url, "--complaints", "0", "--comments", "300", "--workers", "1"])
+    engine = create_engine(url)
+    assert sum(row.comment_count for row in rollup_rows(engine)) == 300
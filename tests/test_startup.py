@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+API_PREFIX = "/auth_service"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Our own modules only: framework imports (fastapi, sqlalchemy, pydantic) are paid by every worker anyway.
+OWN_PACKAGES = ("auth", "llm_management", "news_monitor", "migrations")
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 250))
+DEFERRED_MODULES = ("requests", "migrations", "llm_management.partitions", "googleapiclient.discovery")
+
+
+def import_profile(*modules, deferred=DEFERRED_MODULES):
+    # A closed port: importing must not need the database at all.
+    env = dict(os.environ, POSTGRES_SERVER="127.0.0.1", POSTGRES_PORT="1")
+    code = (f"import sys, {', '.join(modules)}\n"
+            f"print(','.join(m for m in {deferred!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    own_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if name.strip().split(".")[0] in OWN_PACKAGES:
+            own_us += int(self_us)
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return own_us / 1000, loaded
+
+
+def test_app_imports_are_side_effect_free_and_within_budget():
+    own_ms, loaded = import_profile("auth.main", "llm_management.llm_api")
+    assert loaded == []
+    assert own_ms < IMPORT_BUDGET_MS, f"own modules took {own_ms:.0f} ms to import"
+
+
+def test_llm_api_does_not_load_auth_database():
+    # Tokens are verified with the auth service's public keys, not by reading its users table.
+    _, loaded = import_profile("llm_management.llm_api", deferred=("auth.db", "auth.core.deps", "auth.core.config"))
+    assert loaded == []
+
+
+def test_ready_after_warmup(client: TestClient):
+    assert client.get(API_PREFIX + "/health").json() == {"status": "ok"}
+    deadline = time.monotonic() + 10
+    response = client.get(API_PREFIX + "/ready")
+    while response.status_code == 503 and time.monotonic() < deadline:
+        time.sleep(0.05)
+        response = client.get(API_PREFIX + "/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
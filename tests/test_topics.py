@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from migrations import migrate
+from news_monitor import topics
+from news_monitor.models import CommentTopic, YoutubeComment
+
+PROBLEMS = {
+    "water": ["Опять нет горячей воды в доме", "Горячей воды нет уже неделю", "Когда дадут горячей воды?"],
+    "roads": ["Ямы на дороге по Токтогула", "Ямы на дороге, колёса бьём", "Кто засыплет ямы на дороге?"],
+    "garbage": ["Мусор не вывозят месяц", "Мусор не вывозят, двор завален", "Почему мусор не вывозят?"],
+}
+
+
+def texts(copies):
+    return [text for _ in range(copies) for variants in PROBLEMS.values() for text in variants]
+
+
+@pytest.fixture()
+def topics_db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    migrate("youtube", engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def add_comments(Session, comment_texts, first_id=0):
+    with Session() as db:
+        db.add_all(YoutubeComment(youtube_username="user", youtube_comment_id=f"c{first_id + i}", comment_text=text)
+                   for i, text in enumerate(comment_texts))
+        db.commit()
+
+
+def test_clusters_follow_the_problem_not_the_wording():
+    model = topics.TopicModel(n_clusters=3).fit(texts(20), batch_size=16)
+    labels = model.assign([variants[0] for variants in PROBLEMS.values()] + ["👍👍👍", "Ок"], learn=False)
+    assert len(set(labels[:3])) == 3
+    assert list(labels[3:]) == [topics.NO_TOPIC, topics.NO_TOPIC]
+    # Every problem's variants land in the same cluster.
+    for variants in PROBLEMS.values():
+        assert len(set(model.assign(variants, learn=False))) == 1
+    named = {problem: model.top_terms()[model.assign([variants[0]], learn=False)[0]]
+             for problem, variants in PROBLEMS.items()}
+    assert "горяче" in named["water"] and "мусор" in named["garbage"]
+
+
+def test_job_assigns_only_new_comments_to_stored_clusters(topics_db):
+    Session = topics_db
+    add_comments(Session, texts(10) + ["🔥"])
+    with Session() as db:
+        assert topics.assign_pending(db, topics.fit_topics(db, n_clusters=3), batch_size=20) == 91
+        first = dict(db.execute(select(YoutubeComment.id, YoutubeComment.topic_cluster_id)).all())
+        stored = {topic.id: topic for topic in db.scalars(select(CommentTopic))}
+    assert len(stored) == 3 and all(topic.top_terms for topic in stored.values())
+    assert first[91] == topics.NO_TOPIC and None not in first.values()
+
+    add_comments(Session, ["Опять нет горячей воды", "Мусор снова не вывезли"], first_id=100)
+    with Session() as db:
+        model = topics.TopicModel.load(db)
+        before = model.centroids.copy()
+        assert topics.run(db) == 2  # the clusters are loaded, not fitted again
+        assigned = dict(db.execute(select(YoutubeComment.id, YoutubeComment.topic_cluster_id)).all())
+        after = topics.TopicModel.load(db)
+    assert {key: assigned[key] for key in first} == first
+    assert assigned[92] == first[1] and assigned[93] == first[7]  # "горячей воды", "мусор" clusters
+    assert not np.allclose(before, after.centroids)  # the centroids learned from the new comments
+    assert after.counts.sum() == model.counts.sum() + 2
@@ -0,0 +1,395 @@
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlencode
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from migrations import migrate
+from news_monitor import scheduler, youtube_monitor
+from news_monitor.models import MonitoredChannel, VideoCrawlState, YoutubeComment
+from news_monitor.quota import QuotaExhausted, QuotaLimiter
+
+CHANNELS = {"UC1": ["v3", "v2", "v1"], "UC2": ["v5", "v4"]}
+EPOCH = datetime(2025, 5, 1)
+
+
+class FakeRequest:
+    method = "GET"
+
+    def __init__(self, api, response, params):
+        self.api, self.response = api, response
+        self.uri = f"https://youtube.googleapis.com/youtube/v3/fake?{urlencode(sorted(params.items()))}"
+
+    def execute(self, http=None):
+        with self.api.lock:
+            self.api.calls += 1
+            self.api.in_flight += 1
+            self.api.max_in_flight = max(self.api.max_in_flight, self.api.in_flight)
+        time.sleep(0.02)
+        with self.api.lock:
+            self.api.in_flight -= 1
+        return self.response
+
+
+class FakeResource:
+    def __init__(self, api, respond):
+        self.api, self.respond = api, respond
+
+    def list(self, **params):
+        return FakeRequest(self.api, self.respond(**params), params)
+
+
+class FakeYoutube:
+    """Just enough of the discovery client for one monitoring cycle."""
+
+    def __init__(self, channels):
+        self.videos_by_playlist = {f"PL{channel_id}": videos for channel_id, videos in channels.items()}
+        self.channel_of = {video: channel_id for channel_id, videos in channels.items() for video in videos}
+        self.comment_ids = {video: [f"{video}-c{i}" for i in (1, 0)] for video in self.channel_of}  # newest first
+        self.replies = {}  # comment id -> reply ids
+        self.published = {}
+        self.lock = threading.Lock()
+        self.calls = self.in_flight = self.max_in_flight = self.comment_pages = 0
+
+    def channels(self):
+        return FakeResource(self, lambda id, **_: {"items": [{
+            "snippet": {"title": f"Канал {id}"}, "contentDetails": {"relatedPlaylists": {"uploads": f"PL{id}"}}}]})
+
+    def playlistItems(self):
+        def respond(playlistId, maxResults, pageToken=None, **_):
+            # Newest upload first; video "vN" of a channel was published N hours after the epoch below.
+            videos = self.videos_by_playlist[playlistId]
+            start = int(pageToken or 0)
+            page = videos[start:start + maxResults]
+            response = {"items": [{"contentDetails": {
+                "videoId": video,
+                "videoPublishedAt": f"{EPOCH + timedelta(hours=int(video[1:])):%Y-%m-%dT%H:%M:%SZ}"}}
+                for video in page]}
+            if start + maxResults < len(videos):
+                response["nextPageToken"] = str(start + maxResults)
+            return response
+        return FakeResource(self, respond)
+
+    def videos(self):
+        now = datetime.now(timezone.utc)
+        return FakeResource(self, lambda id, **_: {"items": [{"id": video, "snippet": {
+            "title": f"Видео {video}", "channelId": self.channel_of[video], "channelTitle": "Канал",
+            "publishedAt": f"{self.published.get(video, now - timedelta(hours=1)):%Y-%m-%dT%H:%M:%SZ}"},
+            "statistics": {"commentCount": str(len(self.comment_ids[video]))}}
+            for video in id.split(",") if video in self.channel_of]})
+
+    def commentThreads(self):
+        def respond(videoId, maxResults, part, pageToken=None, **_):
+            self.comment_pages += 1
+            start = int(pageToken or 0)
+            comments = self.comment_ids[videoId]
+            items = []
+            for comment_id in comments[start:start + maxResults]:
+                replies = self.replies.get(comment_id, [])
+                item = {"id": comment_id, "snippet": {"totalReplyCount": len(replies),
+                                                      "topLevelComment": {"snippet": self.snippet(comment_id)}}}
+                if "replies" in part and replies:
+                    item["replies"] = {"comments": [{"id": reply, "snippet": self.snippet(reply)}
+                                                    for reply in replies[:5]]}
+                items.append(item)
+            response = {"items": items}
+            if start + maxResults < len(comments):
+                response["nextPageToken"] = str(start + maxResults)
+            return response
+        return FakeResource(self, respond)
+
+    def comments(self):
+        def respond(parentId, maxResults, pageToken=None, **_):
+            self.comment_pages += 1
+            start = int(pageToken or 0)
+            replies = self.replies[parentId]
+            response = {"items": [{"id": reply, "snippet": self.snippet(reply)}
+                                  for reply in replies[start:start + maxResults]]}
+            if start + maxResults < len(replies):
+                response["nextPageToken"] = str(start + maxResults)
+            return response
+        return FakeResource(self, respond)
+
+    @staticmethod
+    def snippet(comment_id):
+        minutes = int(comment_id.split("-c")[1].split("-")[0])
+        return {"authorDisplayName": "user", "textDisplay": f"Комментарий {comment_id}",
+                "publishedAt": f"{EPOCH + timedelta(minutes=minutes):%Y-%m-%dT%H:%M:%SZ}"}
+
+    def add_comment(self, video):
+        self.comment_ids[video].insert(0, f"{video}-c{len(self.comment_ids[video])}")
+
+
+@pytest.fixture()
+def monitor(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    migrate("youtube", engine)
+    Session = sessionmaker(bind=engine)
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(youtube_monitor, "get_db", get_db)
+    monkeypatch.setattr(youtube_monitor, "CHANNEL_PLAYLIST_CACHE", {})
+    monkeypatch.setattr(youtube_monitor, "RECENT_UPLOADS", {})
+    monkeypatch.setattr(youtube_monitor, "CHANNEL_IDS", list(CHANNELS))
+    monkeypatch.setattr(youtube_monitor, "youtube_quota", QuotaLimiter(daily_quota=1000, reserve=0,
+                                                                       units_per_second=1000, burst=1000))
+    return Session
+
+
+def test_cycle_fans_out_and_reports(monitor):
+    api = FakeYoutube(CHANNELS)
+    stats = youtube_monitor.process_new_youtube_data(api, workers=4)
+    assert (stats.channels, stats.videos, stats.comments_fetched, stats.new_comments) == (2, 5, 10, 10)
+    assert api.max_in_flight > 1
+    assert stats.quota_spent == {"channels.list": 2, "playlistItems.list": 2, "videos.list": 1,
+                                 "commentThreads.list": 5}
+    assert not stats.quota_exhausted
+    with monitor() as db:
+        assert db.query(YoutubeComment).count() == 10
+
+    # Second cycle: playlist ids are cached, nothing new was uploaded and no comment counts changed.
+    stats = youtube_monitor.process_new_youtube_data(api, workers=4)
+    assert (stats.new_comments, stats.videos_skipped) == (0, 5)
+    assert stats.quota_spent == {"playlistItems.list": 2, "videos.list": 1}
+
+
+def test_run_reports_only_its_own_quota(monitor):
+    api = FakeYoutube({"UC1": ["v1"]})
+    channels = api.channels
+
+    def channels_while_another_cycle_spends():
+        youtube_monitor.youtube_quota.acquire("search.list")  # a channel cycle running alongside
+        return channels()
+
+    api.channels = channels_while_another_cycle_spends
+    stats = youtube_monitor.process_new_youtube_data(api, workers=2, channel_ids=["UC1"])
+    assert stats.quota_spent == {"channels.list": 1, "playlistItems.list": 1, "videos.list": 1,
+                                 "commentThreads.list": 1}
+    assert youtube_monitor.youtube_quota.spent["search.list"] == 100
+
+
+def test_incremental_crawl_reads_only_new_comments(monitor):
+    api = FakeYoutube(CHANNELS)
+    api.published["v1"] = datetime.now(timezone.utc) - timedelta(days=10)
+    youtube_monitor.process_new_youtube_data(api, workers=4)
+
+    api.add_comment("v3")
+    api.add_comment("v1")
+    stats = youtube_monitor.process_new_youtube_data(api, workers=4)
+    # v3 is read down to its watermark; v1 is ten days old and was crawled just now.
+    assert (stats.comments_fetched, stats.new_comments, stats.videos_skipped) == (1, 1, 4)
+    assert stats.quota_spent["commentThreads.list"] == 1
+    with monitor() as db:
+        state = db.get(VideoCrawlState, "v3")
+        assert (state.last_comment_id, state.comment_count) == ("v3-c2", 3)
+        db.get(VideoCrawlState, "v1").last_crawled_at = datetime.now(timezone.utc) - timedelta(hours=10)
+        db.commit()
+
+    stats = youtube_monitor.process_new_youtube_data(api, workers=4)
+    assert (stats.comments_fetched, stats.new_comments) == (1, 1)
+
+
+def test_incremental_crawl_reads_past_the_cap_down_to_the_watermark(monitor, monkeypatch):
+    monkeypatch.setattr(youtube_monitor, "CHANNEL_IDS", ["UC1"])
+    monkeypatch.setattr(youtube_monitor, "MAX_COMMENTS_PER_VIDEO", 2)
+    api = FakeYoutube({"UC1": ["v1"]})
+    api.comment_ids["v1"] = [f"v1-c{i}" for i in range(3, -1, -1)]
+    assert youtube_monitor.process_new_youtube_data(api, workers=2).new_comments == 2  # the first crawl is capped
+
+    for _ in range(5):
+        api.add_comment("v1")
+    stats = youtube_monitor.process_new_youtube_data(api, workers=2)
+    assert (stats.comments_fetched, stats.new_comments) == (5, 5)
+    with monitor() as db:
+        assert db.get(VideoCrawlState, "v1").last_comment_id == "v1-c8"
+
+
+def test_video_without_new_comments_still_gets_its_crawl_state(monitor, monkeypatch):
+    monkeypatch.setattr(youtube_monitor, "CHANNEL_IDS", ["UC1"])
+    api = FakeYoutube({"UC1": ["v2", "v1"]})
+    api.comment_ids["v2"] = []
+    api.published["v1"] = datetime.now(timezone.utc) - timedelta(days=10)
+    youtube_monitor.process_new_youtube_data(api, workers=2)
+    with monitor() as db:
+        state = db.get(VideoCrawlState, "v2")
+        assert (state.comment_count, state.last_comment_id) == (0, None)
+        # v1 only lost a comment: crawled, nothing new, but the state follows the count.
+        db.get(VideoCrawlState, "v1").last_crawled_at = datetime.now(timezone.utc) - timedelta(days=1)
+        db.commit()
+    api.comment_ids["v1"].pop(0)
+
+    stats = youtube_monitor.process_new_youtube_data(api, workers=2)
+    assert (stats.videos_skipped, stats.quota_spent["commentThreads.list"], stats.new_comments) == (1, 1, 0)
+    with monitor() as db:
+        state = db.get(VideoCrawlState, "v1")
+        assert (state.comment_count, state.last_comment_id) == (1, "v1-c1")
+
+    stats = youtube_monitor.process_new_youtube_data(api, workers=2)
+    assert stats.videos_skipped == 2 and "commentThreads.list" not in stats.quota_spent
+
+
+def test_crawl_state_waits_for_every_page_of_the_video(monitor, monkeypatch):
+    monkeypatch.setattr(youtube_monitor, "CHANNEL_IDS", ["UC1"])
+    monkeypatch.setattr(youtube_monitor, "MAX_COMMENTS_PER_VIDEO", 1000)
+    monkeypatch.setattr(youtube_monitor, "COMMIT_BATCH_SIZE", 100)
+    api = FakeYoutube({"UC1": ["v1"]})
+    api.comment_ids["v1"] = [f"v1-c{i}" for i in range(249, -1, -1)]  # three pages, three commits
+    commits = []
+
+    def first_commit_fails(conn):
+        commits.append(1)
+        if len(commits) == 1:
+            raise RuntimeError("диск переполнен")
+
+    event.listen(monitor.kw["bind"], "commit", first_commit_fails)
+    stats = youtube_monitor.process_new_youtube_data(api, workers=1)
+    assert (stats.new_comments, stats.comments_failed) == (150, 100)
+    with monitor() as db:
+        assert db.get(VideoCrawlState, "v1") is None  # so the lost page is fetched again
+
+    stats = youtube_monitor.process_new_youtube_data(api, workers=1)
+    assert (stats.new_comments, stats.comments_failed) == (100, 0)
+    with monitor() as db:
+        assert db.query(YoutubeComment).count() == 250
+        assert db.get(VideoCrawlState, "v1").last_comment_id == "v1-c249"
+
+
+def test_playlist_paging_stops_at_cap_and_known_uploads(monitor, monkeypatch):
+    videos = [f"v{n}" for n in range(120, 0, -1)]
+    api = FakeYoutube({"UC1": videos})
+    monkeypatch.setattr(youtube_monitor, "CHANNEL_IDS", ["UC1"])
+    monkeypatch.setattr(youtube_monitor, "VIDEOS_PER_CHANNEL", 60)
+    stats = youtube_monitor.process_new_youtube_data(api, workers=4)
+    assert stats.videos == 60
+    assert stats.quota_spent["playlistItems.list"] == 2
+    assert stats.quota_spent["videos.list"] == 2
+    assert youtube_monitor.RECENT_UPLOADS["UC1"][0][0] == "v120"
+
+    # Two new uploads: the first page ends at the newest known one, the window slides by two.
+    api.videos_by_playlist["PLUC1"] = ["v122", "v121"] + videos
+    api.channel_of.update({"v121": "UC1", "v122": "UC1"})
+    stats = youtube_monitor.process_new_youtube_data(api, workers=4)
+    assert stats.quota_spent["playlistItems.list"] == 1
+    assert [video for video, _ in youtube_monitor.RECENT_UPLOADS["UC1"][:3]] == ["v122", "v121", "v120"]
+    assert len(youtube_monitor.RECENT_UPLOADS["UC1"]) == 60
+
+
+def test_comments_are_stored_with_set_based_statements(monitor, monkeypatch):
+    monkeypatch.setattr(youtube_monitor, "CRAWL_MODE", "full")
+    monkeypatch.setattr(youtube_monitor, "COMMIT_BATCH_SIZE", 4)
+    api = FakeYoutube(CHANNELS)
+    with monitor() as db:
+        db.add(YoutubeComment(youtube_username="user", comment_text="старый", youtube_comment_id="v1-c0"))
+        db.commit()
+
+    statements = []
+    engine = monitor.kw["bind"]
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, sql, *args: statements.append(sql.split()[0].upper()))
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+    stats = youtube_monitor.process_new_youtube_data(api, workers=1)  # one worker: a fixed arrival order
+    assert (stats.new_comments, stats.comments_skipped) == (9, 1)
+    assert statements.count("SELECT") == 5 and statements.count("INSERT") == 5
+    assert len(commits) == 2  # after 2+2 rows and after 1+2+2 rows; nothing is left for the end
+    with monitor() as db:
+        # Stored without waiting for the model; the sentiment worker labels them later.
+        assert db.query(YoutubeComment).filter(YoutubeComment.sentiment.is_(None)).count() == 10
+
+
+def test_comments_stream_through_a_bounded_buffer_with_replies(monitor, monkeypatch):
+    monkeypatch.setattr(youtube_monitor, "CHANNEL_IDS", ["UC1"])
+    monkeypatch.setattr(youtube_monitor, "FETCH_REPLIES", True)
+    monkeypatch.setattr(youtube_monitor, "MAX_COMMENTS_PER_VIDEO", 1000)
+    monkeypatch.setattr(youtube_monitor, "PIPELINE_BUFFER_PAGES", 1)
+    monkeypatch.setattr(youtube_monitor, "COMMIT_BATCH_SIZE", 100)
+    api = FakeYoutube({"UC1": ["v1"]})
+    api.comment_ids["v1"] = [f"v1-c{i}" for i in range(349, -1, -1)]
+    api.replies["v1-c349"] = [f"v1-c349-r{i}" for i in range(120)]  # more than come inline: comments.list
+    api.replies["v1-c348"] = ["v1-c348-r0", "v1-c348-r1"]
+
+    outstanding, add = [], youtube_monitor.CommentWriter.add
+
+    def add_page(writer, video, page):
+        outstanding.append(api.comment_pages - len(outstanding))  # pages fetched but not yet stored
+        assert len(writer.db.identity_map) <= 1  # at most the crawl state of the video
+        return add(writer, video, page)
+
+    monkeypatch.setattr(youtube_monitor.CommentWriter, "add", add_page)
+    stats = youtube_monitor.process_new_youtube_data(api, workers=1)
+    assert (stats.comments_fetched, stats.replies_fetched, stats.new_comments) == (472, 122, 472)
+    assert stats.quota_spent["commentThreads.list"] == 4 and stats.quota_spent["comments.list"] == 2
+    assert len(outstanding) == 6 and max(outstanding) <= 2  # the buffered page and the one in hand
+    with monitor() as db:
+        reply = db.query(YoutubeComment).filter_by(youtube_comment_id="v1-c348-r1").one()
+        assert reply.parent_comment_id == "v1-c348"
+        assert db.get(VideoCrawlState, "v1").last_comment_id == "v1-c349"
+
+
+def test_cycle_stops_before_quota_runs_out(monitor, monkeypatch):
+    monkeypatch.setattr(youtube_monitor, "youtube_quota", QuotaLimiter(daily_quota=8, reserve=2,
+                                                                       units_per_second=1000, burst=1000))
+    api = FakeYoutube(CHANNELS)
+    stats = youtube_monitor.process_new_youtube_data(api, workers=4)
+    assert stats.quota_exhausted
+    assert api.calls == sum(stats.quota_spent.values()) == 6
+    assert youtube_monitor.youtube_quota.remaining == 0
+    with monitor() as db:
+        assert db.query(YoutubeComment).count() == stats.new_comments
+
+
+def test_scheduler_runs_due_channels_and_adapts_intervals(monitor, monkeypatch):
+    monkeypatch.setattr(scheduler, "JITTER", 0)
+    monkeypatch.setattr(scheduler, "BUSY_NEW_COMMENTS", 5)
+    jobs = scheduler.ChannelScheduler(monitor, jobs=1, youtube=FakeYoutube(CHANNELS))
+    with monitor() as db:
+        assert scheduler.sync_channels(db, ["UC1", "UC2", "UC1"]) == 2
+        assert scheduler.sync_channels(db, ["UC1", "UC2"]) == 0
+
+    assert jobs.run_pending() == 2
+    assert jobs.run_pending() == 0  # neither is due again yet
+    with monitor() as db:
+        uc1, uc2 = db.get(MonitoredChannel, "UC1"), db.get(MonitoredChannel, "UC2")
+        assert (uc1.last_new_comments, uc1.interval_minutes, uc1.title) == (6, 30, "Канал UC1")  # busy: twice as often
+        assert (uc2.last_new_comments, uc2.interval_minutes) == (4, 60)
+        uc2.next_run_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+        db.commit()
+
+    assert jobs.run_pending() == 1
+    with monitor() as db:
+        assert db.get(MonitoredChannel, "UC2").interval_minutes == 120  # nothing new: half as often
+
+
+def test_channels_are_split_between_shards(monitor):
+    channel_ids = [f"UC{n:03}" for n in range(100)]
+    with monitor() as db:
+        scheduler.sync_channels(db, channel_ids)
+        now = datetime.now(timezone.utc)
+        shards = [scheduler.due_channels(db, now, shard_index=i, shard_count=3) for i in range(3)]
+    assert sorted(sum(shards, [])) == channel_ids
+    assert all(20 < len(shard) < 45 for shard in shards)
+
+
+def test_quota_limiter_budget_resets_daily():
+    today = [date(2025, 5, 1)]
+    limiter = QuotaLimiter(daily_quota=150, reserve=0, units_per_second=1000, burst=1000, today=lambda: today[0])
+    limiter.acquire("search.list")
+    with pytest.raises(QuotaExhausted):
+        limiter.acquire("search.list")
+    with pytest.raises(QuotaExhausted):
+        limiter.acquire("videos.list")  # closed for the rest of the day
+    today[0] = date(2025, 5, 2)
+    limiter.acquire("videos.list")
+    assert limiter.snapshot() == {"videos.list": 1}
+    limiter.exhaust()
+    assert limiter.remaining == 0